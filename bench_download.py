@@ -0,0 +1,452 @@
+"""Banc d'essai de download_all, hors ligne.
+
+Un serveur HTTP local joue le role de YouTube : playlists et videos
+synthetiques, latence, debit par connexion et erreurs 429 / "Sign in"
+configurables. Un extracteur de test (BenchIE) branche le vrai pipeline
+dessus et chaque combinaison parallele x fragments est mesuree : items/s,
+videos/s, Mo/s, temps jusqu'au premier octet, pic de RSS et de threads.
+
+    python bench_download.py --playlists 4 --videos 10 --size 2 --parallel 1,3,5 --fragments 1,4
+
+Les fragments ne changent le debit que si aria2c est installe (connexions
+par fichier) : les medias sont servis en HTTP simple, avec Range.
+
+--startup mesure le demarrage dans des processus neufs (import du module,
+premier affichage de la fenetre par "python download_playlist.py",
+chargement de yt-dlp) et echoue si l'import depasse --budget, charge yt-dlp
+d'emblee ou si le lancement execute le module deux fois :
+
+    python bench_download.py --startup --runs 5 --budget 0.5
+"""
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import ExtractorError
+
+import download_playlist as dp
+
+try:
+    import psutil
+except ImportError:  # RSS lu dans /proc a la place
+    psutil = None
+
+
+CHUNK = 64 * 1024
+
+
+# --- Serveur ---
+
+class BenchServer:
+    """Faux YouTube local. /bench/playlist/<id> et /bench/video/<id> rendent
+    du JSON, /bench/media/<id>.mp4 des octets (Range accepte)."""
+
+    def __init__(self, playlists, videos, size, latency=0.0, bandwidth=0.0,
+                 error_rate=0.0, signin_rate=0.0, seed=0):
+        self.playlists = {f"p{p}": [f"p{p}v{v}" for v in range(videos)] for p in range(playlists)}
+        self.size = int(size)
+        self.latency = latency
+        self.bandwidth = bandwidth  # octets/s par connexion, 0 = illimite
+        self.error_rate = error_rate
+        self.signin_rate = signin_rate
+        self._random = random.Random(seed)
+        self._block = random.Random(seed).randbytes(CHUNK)
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(_BenchHandler, self))
+        self._httpd.daemon_threads = True
+        self.reset()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.bytes_sent = 0
+            self.requests = 0
+            self.errors = 0
+            self.first_byte = None
+
+    def playlist_urls(self):
+        return [f"{self.base_url}/bench/playlist/{pid}" for pid in self.playlists]
+
+    def inject_error(self):
+        """Code d'erreur a renvoyer pour une requete de metadonnees, ou None."""
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            if roll < self.error_rate:
+                self.errors += 1
+                return 429
+            if roll < self.error_rate + self.signin_rate:
+                self.errors += 1
+                return 403
+        return None
+
+    def sent(self, count):
+        with self._lock:
+            if self.first_byte is None:
+                self.first_byte = time.monotonic()
+            self.bytes_sent += count
+
+
+class _BenchHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, bench, *args, **kwargs):
+        self.bench = bench
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        bench = self.bench
+        if bench.latency:
+            time.sleep(bench.latency)
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "bench":
+            return self._send_json(404, {"error": "not found"})
+        kind, item_id = parts[1], parts[2]
+        if kind == "media":
+            return self._send_media()
+        status = bench.inject_error()
+        if status == 429:
+            return self._send_json(429, {"error": "Too Many Requests"})
+        if status == 403:
+            return self._send_json(403, {"error": "Sign in to confirm you're not a bot"})
+        if kind == "playlist" and item_id in bench.playlists:
+            return self._send_json(200, {"id": item_id, "title": f"Playlist {item_id}",
+                                         "videos": bench.playlists[item_id]})
+        if kind == "video":
+            return self._send_json(200, {"id": item_id, "title": f"Video {item_id}",
+                                         "size": bench.size})
+        self._send_json(404, {"error": "not found"})
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_media(self):
+        bench = self.bench
+        start, end = 0, bench.size - 1
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            first, _, last = byte_range[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), end) if last else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{bench.size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        remaining = end - start + 1
+        try:
+            while remaining > 0:
+                chunk = bench._block[:min(CHUNK, remaining)]
+                self.wfile.write(chunk)
+                bench.sent(len(chunk))
+                remaining -= len(chunk)
+                if bench.bandwidth:
+                    time.sleep(len(chunk) / bench.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+# --- Extracteur ---
+
+class BenchIE(InfoExtractor):
+    IE_NAME = "bench"
+    _VALID_URL = r"https?://127\.0\.0\.1:\d+/bench/(?P<kind>playlist|video)/(?P<id>[^/?#]+)"
+
+    def _real_extract(self, url):
+        kind, item_id = self._match_valid_url(url).group("kind", "id")
+        base = url.split("/bench/")[0]
+        try:
+            data = self._download_json(url, item_id)
+        except ExtractorError as e:
+            # Meme message que YouTube : le pipeline le traite en rate-limit
+            if getattr(e.cause, "status", None) == 403:
+                raise ExtractorError("Sign in to confirm you're not a bot", expected=True)
+            raise
+        if kind == "playlist":
+            entries = [self.url_result(f"{base}/bench/video/{vid}", BenchIE, vid, f"Video {vid}")
+                       for vid in data["videos"]]
+            return self.playlist_result(entries, item_id, data["title"])
+        return {
+            "id": item_id,
+            "title": data["title"],
+            "formats": [{
+                "format_id": "bench",
+                "url": f"{base}/bench/media/{item_id}.mp4",
+                "ext": "mp4",
+                "protocol": "http",
+                "filesize": data["size"],
+                "height": 720,
+                "vcodec": "avc1",
+                "acodec": "mp4a",
+            }],
+        }
+
+
+class BenchPool(dp.YdlPool):
+    """YdlPool dont les sessions essaient BenchIE avant les extracteurs de
+    yt-dlp (installe a la place de dp.YDL_POOL le temps du banc)."""
+
+    def _create(self, params, job, kwargs):
+        ydl = super()._create(params, job, dict(kwargs, auto_init=False))
+        ydl.add_info_extractor(BenchIE())
+        ydl.add_default_info_extractors()
+        return ydl
+
+
+# --- Mesures ---
+
+def _rss_bytes():
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class Sampler:
+    """Releve le pic de RSS et de threads pendant une mesure."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, _rss_bytes())
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_config(server, parallel, fragments, args):
+    """Une mesure de download_all sur toutes les playlists du serveur."""
+    server.reset()
+    # Limiteur neuf a chaque mesure, pause courte apres une erreur
+    dp.RATE_LIMITER = dp.RateLimiter(rate=args.rate, max_rate=args.rate,
+                                     burst=max(dp.RATE_BURST, int(args.rate)))
+    dp.RETRY_WAIT = args.cooldown
+    output_dir = tempfile.mkdtemp(prefix="bench_")
+
+    def log(msg, replace_last=False, key=None):
+        if args.verbose and not replace_last:
+            print(msg)
+
+    try:
+        metrics_start = dp.METRICS.snapshot()
+        with Sampler() as sampler:
+            start = time.monotonic()
+            ok, fail, _ = dp.download_all(
+                server.playlist_urls(), output_dir, "file", "", dp.QUALITIES["720p (HD)"],
+                False, "mp3", fragments, parallel, {}, None, log, lambda: None,
+                stop_event=dp.StopSignal(), cache_refresh="all")
+            elapsed = time.monotonic() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    videos = len(server.playlists) * len(next(iter(server.playlists.values()), []))
+    return {
+        "parallel": parallel,
+        "fragments": fragments,
+        "seconds": round(elapsed, 3),
+        "items_per_s": round(ok / elapsed, 3),
+        "videos_per_s": round(videos / elapsed, 3) if not fail else None,
+        "mb_per_s": round(server.bytes_sent / elapsed / 1e6, 3),
+        "ttfb_s": round(server.first_byte - start, 3) if server.first_byte else None,
+        "peak_rss_mb": round(sampler.peak_rss / 1e6, 1),
+        "peak_threads": sampler.peak_threads,
+        "ok": ok,
+        "failed": fail,
+        "requests": server.requests,
+        "injected_errors": server.errors,
+        "phases": {phase: round(seconds, 3)
+                   for phase, seconds in dp.METRICS.phase_times(metrics_start).items()},
+    }
+
+
+# --- Demarrage ---
+
+# Execute dans un processus neuf. Sans argument : import du module. Avec
+# "gui" : lancement reel ("python download_playlist.py", module execute en
+# __main__ puis fenetre ouverte par main()), mainloop remplacee par la mesure
+STARTUP_SCRIPT = r"""
+import json, runpy, sys, time
+result = {}
+start = time.perf_counter()
+if "gui" in sys.argv:
+    import tkinter
+
+    def first_paint(app, n=0):
+        app.update()
+        result["first_paint_s"] = time.perf_counter() - start
+        app.destroy()
+
+    tkinter.Misc.mainloop = first_paint
+    sys.argv = ["download_playlist.py"]
+    result["first_paint_s"] = None
+    try:
+        runpy.run_path("download_playlist.py", run_name="__main__")
+    except SystemExit:
+        pass
+    except Exception:
+        pass
+    dp = sys.modules["download_playlist"]
+    # download_gui doit reprendre le module lance, pas en executer une copie
+    result["copies"] = 1 if dp.__name__ == "__main__" else 2
+else:
+    import download_playlist as dp
+    result["import_s"] = time.perf_counter() - start
+    result["eager"] = [m for m in ("yt_dlp", "asyncio", "tkinter", "opentelemetry")
+                       if m in sys.modules]
+    start = time.perf_counter()
+    dp.preload().join()
+    result["preload_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    dp.limited_ydl({"quiet": True}).close()
+    result["ydl_s"] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+STARTUP_METRICS = [("import_s", "import"), ("first_paint_s", "fenetre"),
+                   ("preload_s", "yt-dlp pret"), ("ydl_s", "YoutubeDL")]
+
+
+def run_startup(args):
+    """Mediane de --runs demarrages. Retourne le code de sortie."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(args.runs):
+        run = {}
+        for mode in ([], ["gui"]):
+            out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, *mode], cwd=here,
+                                 capture_output=True, text=True, check=True).stdout
+            run.update(json.loads(out.strip().splitlines()[-1]))
+        runs.append(run)
+    result = {"runs": args.runs, "eager": sorted({m for r in runs for m in r["eager"]}),
+              "copies": max(r["copies"] for r in runs)}
+    for key, label in STARTUP_METRICS:
+        values = [r[key] for r in runs if r.get(key) is not None]
+        result[key] = round(statistics.median(values), 4) if values else None
+        shown = f"{result[key] * 1000:.1f} ms" if values else "-"
+        print(f"{label:>12} : {shown}")
+    if result["eager"]:
+        print(f"{'a l import':>12} : {', '.join(result['eager'])}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if result["copies"] > 1:
+        print(f"{'module':>12} : execute {result['copies']} fois au lancement")
+    failed = "yt_dlp" in result["eager"] or result["import_s"] > args.budget or result["copies"] > 1
+    if failed:
+        print(f"ECHEC : import au-dela de {args.budget}s, yt-dlp charge a l'import "
+              f"ou module execute deux fois")
+    return 1 if failed else 0
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne de download_all.")
+    parser.add_argument("--playlists", type=int, default=3)
+    parser.add_argument("--videos", type=int, default=10, help="videos par playlist")
+    parser.add_argument("--size", type=float, default=1.0, metavar="MO", help="taille d'une video")
+    parser.add_argument("--latency", type=float, default=0.02, metavar="SECONDES",
+                        help="latence de chaque reponse")
+    parser.add_argument("--bandwidth", type=float, default=0.0, metavar="MO/S",
+                        help="debit par connexion (0 = illimite)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part de reponses 429")
+    parser.add_argument("--signin-rate", type=float, default=0.0, help='part de reponses "Sign in"')
+    parser.add_argument("--parallel", type=_int_list, default=[1, 3], metavar="N,N")
+    parser.add_argument("--fragments", type=_int_list, default=[4], metavar="N,N")
+    parser.add_argument("--rate", type=float, default=50.0, help="requetes/s du limiteur")
+    parser.add_argument("--cooldown", type=float, default=1.0, metavar="SECONDES",
+                        help="pause du limiteur apres une erreur")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FICHIER", help="ecrire les resultats en JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="afficher le log du pipeline")
+    parser.add_argument("--startup", action="store_true",
+                        help="mesurer le demarrage au lieu du telechargement")
+    parser.add_argument("--runs", type=int, default=5, help="demarrages mesures (--startup)")
+    parser.add_argument("--budget", type=float, default=0.5, metavar="SECONDES",
+                        help="duree d'import maximale (--startup)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.startup:
+        return run_startup(args)
+    server = BenchServer(args.playlists, args.videos, args.size * 1e6, args.latency,
+                         args.bandwidth * 1e6, args.error_rate, args.signin_rate, args.seed).start()
+    pool, dp.YDL_POOL = dp.YDL_POOL, BenchPool()
+    results = []
+    try:
+        print(f"{'parallele':>9} {'fragments':>9} {'items/s':>8} {'videos/s':>8} {'Mo/s':>8} "
+              f"{'TTFB (s)':>8} {'RSS (Mo)':>8} {'threads':>7} {'echecs':>6}")
+        for parallel in args.parallel:
+            for fragments in args.fragments:
+                r = run_config(server, parallel, fragments, args)
+                results.append(r)
+                print(f"{parallel:>9} {fragments:>9} {r['items_per_s']:>8} {r['videos_per_s'] or '-':>8} "
+                      f"{r['mb_per_s']:>8} {r['ttfb_s'] or '-':>8} {r['peak_rss_mb']:>8} "
+                      f"{r['peak_threads']:>7} {r['failed']:>6}")
+    finally:
+        dp.YDL_POOL.close_idle()
+        dp.YDL_POOL = pool
+        server.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
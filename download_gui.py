@@ -0,0 +1,834 @@
+import functools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, scrolledtext, filedialog
+
+from download_playlist import (
+    AUDIO_FORMATS, BROWSERS, DISK, DISK_MARGIN, MODES, PROGRESS, QUALITIES, STAGE_LABELS, SUBTITLE_LANGS,
+    ChannelScanner, JobQueue, MetadataCache, StopSignal, build_cookie_opts, build_subtitle_opts,
+    download_all, fetch_channel_all_videos, fetch_channel_playlists, format_eta, format_speed, load_registry,
+    preload,
+)
+
+
+# --- Interface graphique ---
+
+BG = "#1e1e2e"
+SURFACE = "#2a2a3d"
+COOKIE_BG = "#252538"
+ACCENT = "#7c3aed"
+ACCENT_HOVER = "#6d28d9"
+TEXT_COLOR = "#e2e8f0"
+MUTED = "#94a3b8"
+GREEN = "#22c55e"
+ORANGE = "#f59e0b"
+BLUE = "#3b82f6"
+
+LOG_FLUSH_MS = 100
+# Le texte affiche ne garde que les dernieres lignes ; le journal complet est
+# dans LOG_FILE (dossier de destination), en rotation
+LOG_MAX_LINES = 500
+LOG_FILE = ".download.log"
+LOG_FILE_BYTES = 2 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Tableau des taches : lignes affichees, liens en attente listes (les
+# suivants sont resumes en une ligne) et rafraichissement
+JOB_VIEW_ROWS = 12
+JOB_VIEW_WAITING = 200
+JOB_VIEW_REFRESH_MS = 250
+
+
+class JobView(ttk.Frame):
+    """Tableau des items en file ou en cours et de leurs videos actives.
+    Fenetre de JOB_VIEW_ROWS lignes sur le modele : le Treeview ne contient
+    jamais plus de lignes que ca, reutilisees d'un rafraichissement a l'autre,
+    et seules les cellules modifiees sont reecrites. Le cout d'un
+    rafraichissement ne depend pas de la taille du lot. Un clic selectionne
+    un lien (self.selected), qui reste selectionne si sa ligne se deplace."""
+
+    COLUMNS = (("state", "Etat", 130), ("progress", "Avancement", 90),
+               ("speed", "Debit", 90), ("eta", "Reste", 60))
+
+    def __init__(self, parent, rows=JOB_VIEW_ROWS):
+        super().__init__(parent)
+        self.rows = rows
+        self.tree = ttk.Treeview(self, columns=[c for c, _, _ in self.COLUMNS], height=rows,
+                                 show="tree headings", selectmode="none")
+        self.tree.heading("#0", text="Item / video", anchor="w")
+        self.tree.column("#0", width=280, stretch=True)
+        for column, title, width in self.COLUMNS:
+            self.tree.heading(column, text=title, anchor="w")
+            self.tree.column(column, width=width, stretch=False)
+        self.tree.tag_configure("item", foreground=TEXT_COLOR)
+        self.tree.tag_configure("job", foreground=MUTED)
+        self.tree.tag_configure("selected", background=ACCENT)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-1>", self._on_click)
+        self._model = []   # [(tag, texte, valeurs, url)] : toutes les lignes
+        self._shown = []   # lignes affichees, pour ne reecrire que les differences
+        self._offset = 0
+        self.selected = None
+
+    def update_model(self, items, jobs, queue=None):
+        """items : ItemProgress en file ou en cours ; jobs : ProgressEvent des
+        videos actives, affichees sous leur item ; queue : JobQueue dont les
+        liens pas encore sondes suivent."""
+        by_item = {}
+        for event in jobs:
+            by_item.setdefault(event.item, []).append(event)
+        model = []
+        for item in items:
+            active = by_item.pop(item.item, [])
+            progress = f"{item.done}/{item.total}" + (f" ({item.failed} ech.)" if item.failed else "")
+            speed = sum(e.speed or 0 for e in active if e.stage == "downloading")
+            state = "en cours" if active else "en attente"
+            if queue and queue.state(item.url) == "paused":
+                state = "en pause"
+            model.append(("item", f"{item.item} {item.title}",
+                          (state, progress, format_speed(speed), ""), item.url))
+            model.extend(self._job_row(e) for e in active)
+        # Videos dont l'item n'est pas encore (ou plus) dans la liste
+        for active in by_item.values():
+            model.extend(self._job_row(e) for e in active)
+        if queue:
+            waiting = queue.waiting(JOB_VIEW_WAITING)
+            for url, state, priority, quality in waiting:
+                model.append(("item", url, ("en pause" if state == "paused" else "en file",
+                                            quality or "", "", ""), url))
+            counts = queue.counts()
+            more = counts["pending"] + counts["paused"] - len(waiting)
+            if more > 0:
+                model.append(("job", f"    ... {more} autre(s) lien(s) en file", ("", "", "", ""), None))
+        self._model = model
+        self._render()
+
+    @staticmethod
+    def _job_row(event):
+        name = event.job[len(event.item or ""):].strip() or event.job
+        if event.stage == "downloading":
+            values = ("telechargement", event.amount().strip(), format_speed(event.speed), format_eta(event.eta))
+        else:
+            values = (STAGE_LABELS.get(event.stage, event.stage), "", "", "")
+        return "job", f"    {name}  {event.video_id or ''}", values, None
+
+    def _render(self):
+        self._offset = max(0, min(self._offset, len(self._model) - self.rows))
+        window = [(tag, text, values, url and url == self.selected)
+                  for tag, text, values, url in self._model[self._offset:self._offset + self.rows]]
+        for row, line in enumerate(window):
+            tag, text, values, selected = line
+            tags = (tag, "selected") if selected else (tag,)
+            if row >= len(self._shown):
+                self.tree.insert("", "end", iid=f"r{row}", text=text, values=values, tags=tags)
+                self._shown.append(line)
+            elif self._shown[row] != line:
+                self.tree.item(f"r{row}", text=text, values=values, tags=tags)
+                self._shown[row] = line
+        while len(self._shown) > len(window):
+            self._shown.pop()
+            self.tree.delete(f"r{len(self._shown)}")
+        if self._model:
+            self.scrollbar.set(self._offset / len(self._model),
+                               (self._offset + len(window)) / len(self._model))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self._offset = int(float(amount) * len(self._model))
+        else:
+            self._offset += int(amount) * (self.rows if unit == "pages" else 1)
+        self._render()
+
+    def _on_click(self, event):
+        row = self.tree.identify_row(event.y)
+        if row:
+            index = self._offset + int(row[1:])
+            if index < len(self._model):
+                self.selected = self._model[index][3]
+                self._render()
+
+    def _on_wheel(self, event):
+        self._on_scroll("scroll", -1 * (event.delta // 120) * 3)
+        return "break"
+
+    def clear(self):
+        self._model = []
+        self._offset = 0
+        self.selected = None
+        self._render()
+
+
+class App(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("YouTube Downloader")
+        self.geometry("750x820")
+        self.configure(bg=BG)
+        self.resizable(True, True)
+        self.minsize(600, 700)
+
+        self.output_dir = tk.StringVar(value="")
+        self.scratch_dir = tk.StringVar(value="")
+        self.min_free_var = tk.StringVar(value=f"{DISK_MARGIN / 1e9:g}")
+        self.cookie_mode = tk.StringVar(value="file")
+        self.browser_var = tk.StringVar(value="chrome")
+        self.cookie_file = tk.StringVar(value="")
+        self.quality_var = tk.StringVar(value="1080p (Full HD)")
+        self.audio_fmt_var = tk.StringVar(value="mp3")
+        self.fragments_var = tk.StringVar(value="4")
+        self.parallel_var = tk.StringVar(value="3")
+        self.auto_tune_var = tk.BooleanVar(value=False)
+        self.max_rate_var = tk.StringVar(value="")
+        self.muxed_var = tk.BooleanVar(value=False)
+        self.mode_var = tk.StringVar(value="Video(s)")
+        self.subs_var = tk.BooleanVar(value=False)
+        self.sub_lang_var = tk.StringVar(value="fr")
+        self.sync_var = tk.BooleanVar(value=False)
+        self.range_start_var = tk.StringVar(value="")
+        self.range_end_var = tk.StringVar(value="")
+        self.channel_url = tk.StringVar(value="")
+        self.downloading = False
+        self.fetching = False
+        self.stop_event = StopSignal()
+        self.job_queue = None  # JobQueue du lot en cours (modes Video(s) / Playlist(s))
+        self.item_quality_var = tk.StringVar(value="1080p (Full HD)")
+        self._log_queue = queue.SimpleQueue()
+        self._file_log = logging.getLogger("ytpd.gui")
+        self._file_log.setLevel(logging.INFO)
+        self._file_log.propagate = False
+
+        self._setup_styles()
+        self._build_ui()
+        self._on_mode_change()
+        self.after(LOG_FLUSH_MS, self._flush_log)
+        self.after(JOB_VIEW_REFRESH_MS, self._refresh_jobs)
+        # yt-dlp et les outils se chargent une fois la fenetre affichee
+        self.after_idle(preload)
+
+    def _setup_styles(self):
+        style = ttk.Style(self)
+        style.theme_use("clam")
+        style.configure("TFrame", background=BG)
+        style.configure("TLabel", background=BG, foreground=TEXT_COLOR, font=("Segoe UI", 10))
+        style.configure("Title.TLabel", background=BG, foreground=TEXT_COLOR, font=("Segoe UI", 16, "bold"))
+        style.configure("Muted.TLabel", background=BG, foreground=MUTED, font=("Segoe UI", 9))
+        style.configure("Accent.TButton", background=ACCENT, foreground="white",
+                         font=("Segoe UI", 11, "bold"), padding=(20, 10))
+        style.map("Accent.TButton", background=[("active", ACCENT_HOVER), ("disabled", "#4a4a5e")])
+        style.configure("Dir.TButton", background=SURFACE, foreground=TEXT_COLOR,
+                         font=("Segoe UI", 9), padding=(10, 5))
+        style.map("Dir.TButton", background=[("active", "#3a3a4d")])
+        style.configure("Channel.TButton", background="#1e3a5f", foreground=TEXT_COLOR,
+                         font=("Segoe UI", 9), padding=(10, 5))
+        style.map("Channel.TButton", background=[("active", "#254a6f"), ("disabled", "#4a4a5e")])
+        style.configure("Stop.TButton", background="#dc2626", foreground="white",
+                         font=("Segoe UI", 11, "bold"), padding=(20, 10))
+        style.map("Stop.TButton", background=[("active", "#b91c1c"), ("disabled", "#4a4a5e")])
+        style.configure("Mode.TRadiobutton", background=BG, foreground=TEXT_COLOR, font=("Segoe UI", 10))
+        style.map("Mode.TRadiobutton", background=[("active", BG)])
+        style.configure("Treeview", background=SURFACE, fieldbackground=SURFACE, foreground=TEXT_COLOR,
+                        font=("Consolas", 9), borderwidth=0)
+        style.configure("Treeview.Heading", background=COOKIE_BG, foreground=MUTED, font=("Segoe UI", 9))
+
+    def _build_ui(self):
+        # Canvas scrollable pour les petits ecrans
+        canvas = tk.Canvas(self, bg=BG, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        canvas.pack(side="left", fill="both", expand=True)
+
+        main = ttk.Frame(canvas, padding=20)
+        canvas.create_window((0, 0), window=main, anchor="nw")
+
+        main.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.bind_all("<MouseWheel>", lambda e: canvas.yview_scroll(-1 * (e.delta // 120), "units"))
+
+        # Titre
+        ttk.Label(main, text="YouTube Downloader", style="Title.TLabel").pack(pady=(0, 5))
+        ttk.Label(main, text="Telecharge des videos, playlists ou chaines completes",
+                  style="Muted.TLabel").pack()
+
+        # === MODE DE TELECHARGEMENT ===
+        ttk.Label(main, text="Mode :").pack(anchor="w", pady=(14, 5))
+        mode_frame = ttk.Frame(main)
+        mode_frame.pack(fill="x")
+        for m in MODES:
+            ttk.Radiobutton(mode_frame, text=m, variable=self.mode_var, value=m,
+                            style="Mode.TRadiobutton", command=self._on_mode_change).pack(side="left", padx=(0, 20))
+
+        # === CHAINE (visible seulement en mode Chaine/Playlist) ===
+        self.channel_frame = tk.Frame(main, bg="#1a1a2e", bd=0, highlightthickness=1,
+                                      highlightbackground="#3a3a5e")
+        channel_pad = tk.Frame(self.channel_frame, bg="#1a1a2e")
+        channel_pad.pack(fill="x", padx=10, pady=8)
+
+        tk.Label(channel_pad, text="Lien de la chaine :", bg="#1a1a2e", fg=ORANGE,
+                 font=("Segoe UI", 10, "bold")).pack(anchor="w")
+
+        channel_row = tk.Frame(channel_pad, bg="#1a1a2e")
+        channel_row.pack(fill="x", pady=(5, 0))
+
+        self.channel_entry = tk.Entry(channel_row, textvariable=self.channel_url, bg=SURFACE, fg=TEXT_COLOR,
+                                      insertbackground=TEXT_COLOR, font=("Consolas", 10), bd=0,
+                                      selectbackground=ACCENT)
+        self.channel_entry.pack(side="left", fill="x", expand=True, ipady=5, padx=(0, 8))
+
+        self.fetch_btn = ttk.Button(channel_row, text="Recuperer les playlists", style="Channel.TButton",
+                                    command=self._fetch_channel)
+        self.fetch_btn.pack(side="right")
+
+        # === ZONE DE LIENS ===
+        self.links_label = ttk.Label(main, text="Liens :")
+        input_frame = tk.Frame(main, bg=SURFACE, bd=0, highlightthickness=1, highlightbackground="#3a3a5e")
+        self.input_frame_ref = input_frame
+        self.input_text = tk.Text(input_frame, height=5, bg=SURFACE, fg=TEXT_COLOR, insertbackground=TEXT_COLOR,
+                                  font=("Consolas", 10), bd=0, padx=10, pady=10,
+                                  selectbackground=ACCENT, wrap="word")
+        self.input_text.pack(fill="x")
+
+        self.link_count_label = tk.Label(main, text="0 lien(s)", bg=BG, fg=MUTED, font=("Segoe UI", 9))
+        self.input_text.bind("<KeyRelease>", self._update_link_count)
+
+        # === QUALITE + VITESSE ===
+        settings_frame = ttk.Frame(main)
+        self.settings_frame_ref = settings_frame
+
+        ttk.Label(settings_frame, text="Qualite :").pack(side="left")
+        self.quality_combo = ttk.Combobox(settings_frame, textvariable=self.quality_var,
+                                          values=list(QUALITIES.keys()), state="readonly", width=20)
+        self.quality_combo.pack(side="left", padx=(8, 0))
+        self.quality_combo.bind("<<ComboboxSelected>>", self._on_quality_change)
+
+        # Format audio (visible seulement si Audio uniquement)
+        self.audio_fmt_label = ttk.Label(settings_frame, text="  Format :")
+        self.audio_fmt_combo = ttk.Combobox(settings_frame, textvariable=self.audio_fmt_var,
+                                            values=AUDIO_FORMATS, state="readonly", width=6)
+
+        ttk.Label(settings_frame, text="  Parallele :").pack(side="left", padx=(12, 0))
+        ttk.Spinbox(settings_frame, from_=1, to=10, textvariable=self.parallel_var,
+                    width=3, font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
+
+        ttk.Label(settings_frame, text="  Fragments :").pack(side="left", padx=(12, 0))
+        ttk.Spinbox(settings_frame, from_=1, to=16, textvariable=self.fragments_var,
+                    width=3, font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
+
+        tk.Checkbutton(settings_frame, text="Auto", variable=self.auto_tune_var,
+                       bg=BG, fg=TEXT_COLOR, selectcolor="#3a3a5e", activebackground=BG,
+                       activeforeground=TEXT_COLOR, font=("Segoe UI", 10)).pack(side="left", padx=(12, 0))
+
+        ttk.Label(settings_frame, text="  Max (Mbps) :").pack(side="left", padx=(8, 0))
+        ttk.Entry(settings_frame, textvariable=self.max_rate_var, width=5,
+                  font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
+
+        # === SOUS-TITRES ===
+        self.subs_frame = ttk.Frame(main)
+        tk.Checkbutton(self.subs_frame, text="Telecharger les sous-titres", variable=self.subs_var,
+                       bg=BG, fg=TEXT_COLOR, selectcolor="#3a3a5e", activebackground=BG,
+                       activeforeground=TEXT_COLOR, font=("Segoe UI", 10)).pack(side="left")
+        ttk.Label(self.subs_frame, text="  Langue :").pack(side="left")
+        ttk.Combobox(self.subs_frame, textvariable=self.sub_lang_var,
+                     values=SUBTITLE_LANGS, state="readonly", width=5).pack(side="left", padx=(4, 0))
+        tk.Checkbutton(self.subs_frame, text="Sans fusion si meme qualite", variable=self.muxed_var,
+                       bg=BG, fg=TEXT_COLOR, selectcolor="#3a3a5e", activebackground=BG,
+                       activeforeground=TEXT_COLOR, font=("Segoe UI", 10)).pack(side="left", padx=(16, 0))
+
+        # === SYNCHRO INCREMENTALE (playlists / chaine) ===
+        self.sync_frame = ttk.Frame(main)
+        tk.Checkbutton(self.sync_frame, text="Synchro incrementale (nouvelles videos seulement)",
+                       variable=self.sync_var, bg=BG, fg=TEXT_COLOR, selectcolor="#3a3a5e",
+                       activebackground=BG, activeforeground=TEXT_COLOR,
+                       font=("Segoe UI", 10)).pack(side="left")
+
+        # === PLAGE DE VIDEOS (playlist uniquement) ===
+        self.range_frame = ttk.Frame(main)
+        ttk.Label(self.range_frame, text="Plage de videos :").pack(side="left")
+        ttk.Label(self.range_frame, text="  De :").pack(side="left", padx=(8, 0))
+        ttk.Entry(self.range_frame, textvariable=self.range_start_var, width=5,
+                  font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
+        ttk.Label(self.range_frame, text="  A :").pack(side="left", padx=(8, 0))
+        ttk.Entry(self.range_frame, textvariable=self.range_end_var, width=5,
+                  font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
+        ttk.Label(self.range_frame, text="  (vide = tout)", style="Muted.TLabel").pack(side="left", padx=(8, 0))
+
+        # === COOKIES ===
+        ttk.Label(main, text="Authentification YouTube :").pack(anchor="w", pady=(10, 5))
+        cookie_frame = tk.Frame(main, bg=COOKIE_BG, bd=0, highlightthickness=1, highlightbackground="#3a3a5e")
+        cookie_frame.pack(fill="x")
+        cookie_pad = tk.Frame(cookie_frame, bg=COOKIE_BG)
+        cookie_pad.pack(fill="x", padx=12, pady=8)
+
+        row1 = tk.Frame(cookie_pad, bg=COOKIE_BG)
+        row1.pack(fill="x", pady=(0, 3))
+        tk.Radiobutton(row1, text="Fichier cookies.txt (recommande)", variable=self.cookie_mode,
+                       value="file", bg=COOKIE_BG, fg=TEXT_COLOR, selectcolor="#3a3a5e",
+                       activebackground=COOKIE_BG, activeforeground=TEXT_COLOR,
+                       font=("Segoe UI", 10), command=self._update_cookie_ui).pack(side="left")
+        self.cookie_file_btn = ttk.Button(row1, text="Choisir le fichier", style="Dir.TButton",
+                                          command=self._pick_cookie_file)
+        self.cookie_file_btn.pack(side="right")
+
+        self.cookie_file_label = tk.Label(cookie_pad, text="  Aucun fichier selectionne",
+                                          bg=COOKIE_BG, fg=MUTED, font=("Segoe UI", 9))
+        self.cookie_file_label.pack(anchor="w", pady=(0, 6))
+
+        row2 = tk.Frame(cookie_pad, bg=COOKIE_BG)
+        row2.pack(fill="x", pady=(0, 3))
+        tk.Radiobutton(row2, text="Depuis le navigateur", variable=self.cookie_mode,
+                       value="browser", bg=COOKIE_BG, fg=TEXT_COLOR, selectcolor="#3a3a5e",
+                       activebackground=COOKIE_BG, activeforeground=TEXT_COLOR,
+                       font=("Segoe UI", 10), command=self._update_cookie_ui).pack(side="left")
+        self.browser_combo = ttk.Combobox(row2, textvariable=self.browser_var,
+                                          values=BROWSERS, state="disabled", width=10)
+        self.browser_combo.pack(side="right")
+        tk.Label(cookie_pad, text="  Fermer le navigateur avant de lancer !",
+                 bg=COOKIE_BG, fg=MUTED, font=("Segoe UI", 9)).pack(anchor="w")
+
+        # === DOSSIER ===
+        dir_frame = ttk.Frame(main)
+        dir_frame.pack(fill="x", pady=(10, 0))
+        ttk.Label(dir_frame, text="Dossier de destination :").pack(side="left")
+        ttk.Button(dir_frame, text="Choisir un dossier", style="Dir.TButton",
+                   command=self._pick_dir).pack(side="right")
+        self.dir_label = ttk.Label(main, text="Dossier courant (par defaut)", style="Muted.TLabel")
+        self.dir_label.pack(anchor="w", pady=(3, 0))
+
+        # Dossier de travail (.part, fichiers avant fusion) et espace laisse libre
+        disk_frame = ttk.Frame(main)
+        disk_frame.pack(fill="x", pady=(6, 0))
+        ttk.Label(disk_frame, text="Dossier de travail :").pack(side="left")
+        self.scratch_label = ttk.Label(disk_frame, text="aucun", style="Muted.TLabel")
+        self.scratch_label.pack(side="left", padx=(6, 0))
+        ttk.Entry(disk_frame, textvariable=self.min_free_var, width=5,
+                  font=("Segoe UI", 10)).pack(side="right")
+        ttk.Label(disk_frame, text="  Espace libre min (Go) :").pack(side="right")
+        ttk.Button(disk_frame, text="Choisir", style="Dir.TButton",
+                   command=self._pick_scratch_dir).pack(side="right", padx=(0, 8))
+
+        # === BOUTONS ===
+        btn_frame = ttk.Frame(main)
+        btn_frame.pack(pady=12)
+        self.btn = ttk.Button(btn_frame, text="Telecharger", style="Accent.TButton", command=self._start)
+        self.btn.pack(side="left", padx=(0, 8))
+        self.stop_btn = ttk.Button(btn_frame, text="Arreter", style="Stop.TButton", command=self._stop)
+        self.stop_btn.pack(side="left")
+        self.stop_btn.config(state="disabled")
+
+        # === TACHES ===
+        ttk.Label(main, text="Progression :").pack(anchor="w", pady=(0, 5))
+        self.jobs_view = JobView(main)
+        self.jobs_view.pack(fill="x")
+
+        # Actions sur le lien selectionne, pendant le telechargement
+        queue_frame = ttk.Frame(main)
+        queue_frame.pack(fill="x", pady=(4, 8))
+        ttk.Button(queue_frame, text="Prioritaire", style="Dir.TButton",
+                   command=lambda: self._queue_action("top")).pack(side="left")
+        ttk.Button(queue_frame, text="Pause / Reprendre", style="Dir.TButton",
+                   command=lambda: self._queue_action("pause")).pack(side="left", padx=(6, 0))
+        ttk.Button(queue_frame, text="Annuler", style="Dir.TButton",
+                   command=lambda: self._queue_action("cancel")).pack(side="left", padx=(6, 0))
+        ttk.Button(queue_frame, text="Appliquer", style="Dir.TButton",
+                   command=lambda: self._queue_action("quality")).pack(side="right")
+        ttk.Combobox(queue_frame, textvariable=self.item_quality_var, values=list(QUALITIES.keys()),
+                     state="readonly", width=16).pack(side="right", padx=(0, 6))
+        ttk.Label(queue_frame, text="Qualite du lien :").pack(side="right", padx=(0, 6))
+
+        # === CONSOLE ===
+        ttk.Label(main, text="Journal :").pack(anchor="w", pady=(0, 5))
+        log_frame = tk.Frame(main, bg=SURFACE, bd=0, highlightthickness=1, highlightbackground="#3a3a5e")
+        log_frame.pack(fill="both", expand=True)
+        self.log = scrolledtext.ScrolledText(log_frame, bg=SURFACE, fg="#a0f0a0", font=("Consolas", 9),
+                                             bd=0, padx=10, pady=10, state="disabled",
+                                             insertbackground=TEXT_COLOR, wrap="word", height=10)
+        self.log.pack(fill="both", expand=True)
+
+        # Sauvegarder la ref du main frame pour le placement dynamique
+        self.main_frame = main
+
+    def _on_mode_change(self):
+        mode = self.mode_var.get()
+
+        # Cacher tout
+        self.channel_frame.pack_forget()
+        self.links_label.pack_forget()
+        self.input_frame_ref.pack_forget()
+        self.link_count_label.pack_forget()
+        self.settings_frame_ref.pack_forget()
+        self.subs_frame.pack_forget()
+        self.sync_frame.pack_forget()
+        self.range_frame.pack_forget()
+
+        if mode == "Chaine complete":
+            self.channel_frame.pack(in_=self.main_frame, fill="x", pady=(10, 0), after=self._get_mode_frame())
+            self.fetch_btn.config(text="Tout telecharger")
+        elif mode == "Playlist(s)":
+            self.channel_frame.pack(in_=self.main_frame, fill="x", pady=(10, 0), after=self._get_mode_frame())
+            self.fetch_btn.config(text="Recuperer les playlists")
+            self.links_label.pack(in_=self.main_frame, anchor="w", pady=(10, 5), after=self.channel_frame)
+            self.input_frame_ref.pack(in_=self.main_frame, fill="x", after=self.links_label)
+            self.link_count_label.pack(in_=self.main_frame, anchor="e", after=self.input_frame_ref)
+            self.links_label.config(text="Liens des playlists (un par ligne) :")
+            # Plage
+            self.range_frame.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.link_count_label)
+            # Settings apres range
+            self.settings_frame_ref.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.range_frame)
+        else:
+            # Video(s)
+            self.links_label.pack(in_=self.main_frame, anchor="w", pady=(10, 5), after=self._get_mode_frame())
+            self.input_frame_ref.pack(in_=self.main_frame, fill="x", after=self.links_label)
+            self.link_count_label.pack(in_=self.main_frame, anchor="e", after=self.input_frame_ref)
+            self.links_label.config(text="Liens des videos (un par ligne) :")
+            self.settings_frame_ref.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.link_count_label)
+
+        if mode != "Chaine complete":
+            # Sous-titres apres settings
+            last = self.settings_frame_ref
+            self.subs_frame.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=last)
+
+        if mode == "Chaine complete":
+            self.settings_frame_ref.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.channel_frame)
+            self.subs_frame.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.settings_frame_ref)
+
+        if mode != "Video(s)":
+            self.sync_frame.pack(in_=self.main_frame, fill="x", pady=(4, 0), after=self.subs_frame)
+
+    def _get_mode_frame(self):
+        """Retourne le widget frame du mode radio pour le placement."""
+        for w in self.main_frame.winfo_children():
+            if isinstance(w, ttk.Frame):
+                for child in w.winfo_children():
+                    if isinstance(child, ttk.Radiobutton):
+                        return w
+        return self.main_frame.winfo_children()[1]
+
+    def _on_quality_change(self, event=None):
+        is_audio = "Audio" in self.quality_var.get()
+        if is_audio:
+            self.audio_fmt_label.pack(in_=self.settings_frame_ref, side="left", padx=(12, 0),
+                                      after=self.quality_combo)
+            self.audio_fmt_combo.pack(in_=self.settings_frame_ref, side="left", padx=(4, 0),
+                                      after=self.audio_fmt_label)
+        else:
+            self.audio_fmt_label.pack_forget()
+            self.audio_fmt_combo.pack_forget()
+
+    def _update_link_count(self, event=None):
+        raw = self.input_text.get("1.0", "end").strip()
+        count = len([u for u in raw.splitlines() if u.strip()])
+        self.link_count_label.config(text=f"{count} lien(s)")
+
+    def _get_cookie_opts(self):
+        mode = self.cookie_mode.get()
+        if mode == "file":
+            return build_cookie_opts("file", self.cookie_file.get())
+        else:
+            return build_cookie_opts("browser", self.browser_var.get())
+
+    def _fetch_channel(self):
+        if self.fetching:
+            return
+        url = self.channel_url.get().strip()
+        if not url:
+            self._log("Colle le lien de la chaine YouTube d'abord.")
+            return
+
+        cookie_opts = self._get_cookie_opts()
+        mode = self.mode_var.get()
+        self.fetching = True
+        self.fetch_btn.config(state="disabled")
+
+        if mode == "Chaine complete":
+            # Pas besoin de fetcher, on lance le telechargement directement
+            self._log("Chaine complete selectionnee — le lien sera utilise directement.")
+            video_url = fetch_channel_all_videos(url, cookie_opts, self._log)
+            self.input_text.delete("1.0", "end")
+            self.input_text.insert("1.0", video_url)
+            self._update_link_count()
+            self.fetching = False
+            self.fetch_btn.config(state="normal")
+            return
+
+        self._log("Scan de la chaine en cours...")
+
+        def _do_fetch():
+            try:
+                cache = MetadataCache(self.output_dir.get() or None)
+                try:
+                    urls = fetch_channel_playlists(url, cookie_opts, self._log, cache=cache)
+                finally:
+                    cache.close()
+                if urls:
+                    def _fill():
+                        self.input_text.delete("1.0", "end")
+                        self.input_text.insert("1.0", "\n".join(urls))
+                        self._update_link_count()
+                        self._log(f"\n  {len(urls)} liens ajoutes dans la zone de texte.")
+                    self.after(0, _fill)
+            except Exception as e:
+                self._log(f"  ERREUR : {e}")
+            finally:
+                self.after(0, lambda: (
+                    self.fetch_btn.config(state="normal"),
+                    setattr(self, "fetching", False),
+                ))
+
+        threading.Thread(target=_do_fetch, daemon=True).start()
+
+    def _update_cookie_ui(self):
+        if self.cookie_mode.get() == "file":
+            self.cookie_file_btn.config(state="normal")
+            self.browser_combo.config(state="disabled")
+        else:
+            self.cookie_file_btn.config(state="disabled")
+            self.browser_combo.config(state="readonly")
+
+    def _pick_cookie_file(self):
+        f = filedialog.askopenfilename(filetypes=[("Cookies TXT", "*.txt"), ("Tous", "*.*")])
+        if f:
+            self.cookie_file.set(f)
+            self.cookie_file_label.config(text=f"  {os.path.basename(f)}", fg=GREEN)
+
+    def _pick_dir(self):
+        d = filedialog.askdirectory()
+        if d:
+            self.output_dir.set(d)
+            short = d if len(d) < 55 else "..." + d[-52:]
+            self.dir_label.config(text=short)
+
+    def _pick_scratch_dir(self):
+        d = filedialog.askdirectory()
+        self.scratch_dir.set(d or "")
+        short = d if len(d) < 40 else "..." + d[-37:]
+        self.scratch_label.config(text=short or "aucun")
+
+    def _log(self, msg, replace_last=False, key=None):
+        """Thread-safe. La progression des videos s'affiche dans le tableau des
+        taches : replace_last et key ne sont gardes que pour la signature
+        commune des log_func."""
+        self._log_queue.put(msg)
+        if self._file_log.handlers:
+            self._file_log.info(msg.strip("\n"))
+
+    def _open_log_file(self, output_dir):
+        """Journal complet du lot dans LOG_FILE, en rotation."""
+        for handler in list(self._file_log.handlers):
+            self._file_log.removeHandler(handler)
+            handler.close()
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(output_dir or ".", LOG_FILE), maxBytes=LOG_FILE_BYTES,
+                backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        except OSError as e:
+            self._log(f"Journal fichier indisponible : {e}")
+            return
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self._file_log.addHandler(handler)
+
+    def _refresh_jobs(self):
+        """Tableau des taches a JOB_VIEW_REFRESH_MS, d'apres PROGRESS."""
+        try:
+            self.jobs_view.update_model(PROGRESS.items(), PROGRESS.snapshot(), self.job_queue)
+        finally:
+            self.after(JOB_VIEW_REFRESH_MS, self._refresh_jobs)
+
+    def _flush_log(self):
+        """Vide la file des messages a intervalle fixe ; le texte est borne a
+        LOG_MAX_LINES lignes."""
+        try:
+            self._write_log_batch()
+        finally:
+            self.after(LOG_FLUSH_MS, self._flush_log)
+
+    def _write_log_batch(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not lines:
+            return
+
+        self.log.config(state="normal")
+        self.log.insert("end", "".join(msg + "\n" for msg in lines[-LOG_MAX_LINES:]))
+        # Scrollback borne : retirer les plus vieilles lignes
+        excess = int(self.log.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+        if excess > 0:
+            self.log.delete("1.0", f"{excess + 1}.0")
+        self.log.see("end")
+        self.log.config(state="disabled")
+
+    def _queue_action(self, action):
+        """Priorite, pause, annulation ou qualite du lien selectionne."""
+        queue, url = self.job_queue, self.jobs_view.selected
+        if not (queue and url):
+            return
+        if action == "top":
+            queue.set_priority(url, queue.top_priority())
+        elif action == "pause":
+            if queue.state(url) == "paused":
+                queue.resume(url)
+            else:
+                queue.pause(url)
+        elif action == "cancel":
+            queue.cancel(url)
+            self._log(f"  Annule : {url}")
+        elif action == "quality":
+            queue.set_quality(url, self.item_quality_var.get())
+            self._log(f"  Qualite {self.item_quality_var.get()} : {url}")
+
+    def _add_to_queue(self):
+        """Liens de la zone de texte ajoutes au lot en cours."""
+        raw = self.input_text.get("1.0", "end").strip()
+        added = sum(self.job_queue.add(u.strip()) for u in raw.splitlines() if u.strip())
+        self._log(f"  {added} lien(s) ajoute(s) a la file.")
+
+    def _stop(self):
+        if self.downloading:
+            self.stop_event.set()
+            self.stop_btn.config(state="disabled")
+            self._log("\n  Arret demande... les telechargements en cours vont se terminer.")
+
+    def _on_done(self):
+        self.after(0, lambda: (
+            self.btn.config(text="Telecharger", state="normal"),
+            self.stop_btn.config(state="disabled"),
+            setattr(self, "downloading", False),
+            self.job_queue and self.job_queue.close(),
+            setattr(self, "job_queue", None),
+        ))
+
+    def _start(self):
+        if self.downloading:
+            if self.job_queue:
+                self._add_to_queue()
+            return
+
+        mode = self.mode_var.get()
+
+        # Recuperer les URLs
+        if mode == "Chaine complete":
+            # Le scan se fait dans le thread de telechargement
+            channel = self.channel_url.get().strip()
+            if not channel:
+                self._log("Colle le lien de la chaine YouTube d'abord.")
+                return
+        else:
+            raw = self.input_text.get("1.0", "end").strip()
+            urls = [u.strip() for u in raw.splitlines() if u.strip()]
+            if not urls:
+                self._log("Aucun lien fourni.")
+                return
+
+        # Cookies
+        cookie_mode = self.cookie_mode.get()
+        if cookie_mode == "file":
+            cookie_value = self.cookie_file.get()
+            if not cookie_value or not os.path.isfile(cookie_value):
+                self._log("Selectionne un fichier cookies.txt d'abord !")
+                return
+        else:
+            cookie_value = self.browser_var.get()
+
+        # Options
+        quality_key = self.quality_var.get()
+        quality_fmt = QUALITIES.get(quality_key, QUALITIES["1080p (Full HD)"])
+        is_audio = "Audio" in quality_key
+        audio_fmt = self.audio_fmt_var.get() if is_audio else "mp3"
+        fragments = max(1, int(self.fragments_var.get() or 4))
+        parallel = max(1, int(self.parallel_var.get() or 3))
+
+        sub_opts = build_subtitle_opts(self.subs_var.get(), self.sub_lang_var.get())
+        incremental = self.sync_var.get() and mode != "Video(s)"
+        try:
+            max_rate = float(self.max_rate_var.get().strip() or 0) * 1e6 / 8 or None
+        except ValueError:
+            max_rate = None
+        try:
+            DISK.margin = float(self.min_free_var.get().strip().replace(",", ".") or 0) * 1e9
+        except ValueError:
+            DISK.margin = DISK_MARGIN
+        scratch_dir = self.scratch_dir.get() or None
+        if scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+        tune = {"incremental": incremental, "auto_tune": self.auto_tune_var.get(), "max_rate": max_rate,
+                "prefer_muxed": self.muxed_var.get(), "scratch_dir": scratch_dir}
+
+        # Plage
+        playlist_range = None
+        if mode == "Playlist(s)":
+            start = self.range_start_var.get().strip()
+            end = self.range_end_var.get().strip()
+            if start or end:
+                playlist_range = (int(start) if start.isdigit() else None,
+                                  int(end) if end.isdigit() else None)
+
+        self.downloading = True
+        self.stop_event.clear()
+        out = self.output_dir.get() or None
+        if mode == "Chaine complete":
+            self.btn.config(text="Telechargement en cours...", state="disabled")
+        else:
+            # Lot modifiable : liens ajoutes, priorites, pauses pendant le telechargement
+            self.job_queue = JobQueue(out, stop_event=self.stop_event)
+            resumed = self.job_queue.waiting(sum(self.job_queue.counts().values()))
+            for u in urls:
+                self.job_queue.add(u)
+            self.btn.config(text="Ajouter a la file")
+        self.stop_btn.config(state="normal")
+        self.log.config(state="normal")
+        self.log.delete("1.0", "end")
+        self.log.config(state="disabled")
+        self.jobs_view.clear()
+        self._open_log_file(out)
+        if mode == "Chaine complete":
+            self._log(f"Mode : {mode} | {channel} | {quality_key}")
+        else:
+            self._log(f"Mode : {mode} | {len(urls)} lien(s) | {quality_key}")
+            if resumed:
+                self._log(f"  {len(resumed)} lien(s) repris de la file precedente :")
+                for url, state, _priority, _quality in resumed:
+                    self._log(f"    {url}" + (" (en pause)" if state == "paused" else ""))
+
+        def _run(download):
+            # download_all ne rappelle pas on_done s'il leve une exception :
+            # l'interface est liberee ici dans tous les cas
+            try:
+                download()
+            except Exception as e:
+                self._log(f"  ERREUR : {e}")
+            finally:
+                self._on_done()
+
+        if mode == "Chaine complete":
+            # Onglets (/videos, /shorts, /streams) et playlists scannes en
+            # parallele, telecharges au fur et a mesure
+            def _channel_download():
+                cache = MetadataCache(out)
+                try:
+                    scanner = ChannelScanner(channel, build_cookie_opts(cookie_mode, cookie_value),
+                                             self._log, cache=cache, stop_event=self.stop_event,
+                                             registry=load_registry(out) if incremental else None)
+                    download_all(scanner, out, cookie_mode, cookie_value, quality_fmt,
+                                 is_audio, audio_fmt, fragments, parallel, sub_opts, playlist_range,
+                                 self._log, lambda: None, self.stop_event, **tune)
+                finally:
+                    cache.close()
+
+            t = threading.Thread(target=_run, args=(_channel_download,), daemon=True)
+        else:
+            t = threading.Thread(target=_run, daemon=True, args=(functools.partial(
+                download_all, self.job_queue, out, cookie_mode, cookie_value, quality_fmt, is_audio,
+                audio_fmt, fragments, parallel, sub_opts, playlist_range,
+                self._log, lambda: None, self.stop_event, **tune),))
+        t.start()
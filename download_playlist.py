@@ -1,15 +1,31 @@
+# asyncio, http.server, yt_dlp et tkinter sont importes par les fonctions qui
+# s'en servent : l'import du module (et l'affichage de la fenetre) reste rapide
+import argparse
+import collections
+import contextlib
+import functools
+import glob
+import heapq
+import itertools
 import json
+import multiprocessing
 import os
+import pickle
+import queue
 import re
 import shutil
+import signal
+import sqlite3
+import sys
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
-import tkinter as tk
-from tkinter import ttk, scrolledtext, filedialog
 
-import yt_dlp
+try:
+    import fcntl
+except ImportError:  # Windows : pas de reflink
+    fcntl = None
 
 
 # --- Config ---
@@ -31,8 +47,72 @@ AUDIO_FORMATS = ["mp3", "wav", "flac", "aac"]
 
 SUBTITLE_LANGS = ["fr", "en", "es", "de", "pt", "ar", "zh", "ja", "ko", "it", "ru"]
 
-NODE_PATH = shutil.which("node")
-ARIA2C_PATH = shutil.which("aria2c")
+# Outils externes cherches par preload() ou a la premiere utilisation
+TOOLS = ("node", "aria2c")
+
+
+# --- Chargement ---
+
+# yt-dlp (des centaines d'extracteurs) et les outils externes ne sont pas
+# charges a l'import : preload() les prepare en arriere-plan pendant que la
+# fenetre s'affiche, sinon ils le sont a la premiere utilisation.
+_load_lock = threading.RLock()
+_tools_lock = threading.Lock()
+_tool_paths = {}
+_default_ies = None
+_ydl_class = None
+_preload_thread = None
+
+
+def _yt_dlp():
+    import yt_dlp
+    return yt_dlp
+
+
+def tool_path(name):
+    """Chemin d'un outil externe (None s'il n'est pas installe), cherche une
+    seule fois par processus."""
+    with _tools_lock:
+        if name not in _tool_paths:
+            _tool_paths[name] = shutil.which(name)
+        return _tool_paths[name]
+
+
+def default_extractors():
+    """{ie_key: classe} des extracteurs actives par defaut, dans l'ordre de
+    yt-dlp. Resolu une fois par processus au lieu d'une fois par YoutubeDL."""
+    global _default_ies
+    with _load_lock:
+        if _default_ies is None:
+            from yt_dlp.extractor import gen_extractor_classes
+            all_ies = {ie.IE_NAME.lower(): ie for ie in gen_extractor_classes()}
+            _default_ies = {ie.ie_key(): ie for ie in all_ies.values() if ie._ENABLED}
+        return _default_ies
+
+
+def preload():
+    """Charge yt-dlp, les extracteurs et les outils externes dans un thread.
+    Retourne le thread (join() pour attendre la fin)."""
+    global _preload_thread
+    with _load_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_preload, name="preload", daemon=True)
+            _preload_thread.start()
+        return _preload_thread
+
+
+def _preload():
+    for name in TOOLS:
+        tool_path(name)
+    default_extractors()
+    _limited_ydl_class()
+
+
+def __getattr__(name):
+    # download_playlist.LimitedYoutubeDL : classe construite a la demande
+    if name == "LimitedYoutubeDL":
+        return _limited_ydl_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Logique ---
@@ -43,25 +123,282 @@ def clean_folder_name(name):
     return name if name else "download"
 
 
+class JsonlJournal:
+    """Journal JSON-lines en ajout seul. Chaque enregistrement est ecrit en une
+    seule ligne (O(1)), sous verrou pour les threads et en mode append pour
+    les autres processus. Une derniere ligne tronquee (crash) est ignoree."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def replay(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    @property
+    def old_path(self):
+        return self.path + ".old"
+
+    def rotate(self):
+        """Renomme le journal courant et retourne son nouveau chemin (ou None) :
+        les ecritures suivantes repartent dans un journal vide. Un .old laisse
+        par une compaction interrompue (crash) est garde : le journal courant
+        y est ajoute a la suite, rien n'est perdu."""
+        with self._lock:
+            old = self.old_path
+            if not os.path.isfile(self.path):
+                return old if os.path.isfile(old) else None
+            if not os.path.isfile(old):
+                os.replace(self.path, old)
+                return old
+            with open(self.path, "rb") as src, open(old, "ab+") as dst:
+                # Derniere ligne tronquee : les ajouts repartent sur une ligne neuve
+                if dst.tell():
+                    dst.seek(-1, os.SEEK_END)
+                    if dst.read(1) != b"\n":
+                        dst.write(b"\n")
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.path)
+            return old
+
+
+# --- Mesures ---
+
+METRICS_PREFIX = "ytpd"
+METRICS_WRITE_INTERVAL = 15
+
+# Libelles des phases dans le resume de fin de lot
+PHASES = {
+    "extract": "extraction",
+    "limiter_wait": "attente limiteur",
+    "cooldown": "pauses rate-limit",
+    "resolve": "choix du format",
+    "disk_wait": "attente espace disque",
+    "download": "telechargement",
+    "postprocess_wait": "attente post-traitement",
+    "postprocess": "post-traitement",
+}
+
+
+class Metrics:
+    """Compteurs, jauges et durees par phase (extraction, attente du limiteur,
+    telechargement, post-traitement...), partages par tous les threads.
+    Export au format texte Prometheus ; chaque duree mesuree peut aussi etre
+    ecrite comme span (JSON lines et/ou OpenTelemetry)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(float)  # (nom, labels) -> valeur
+        self._gauges = collections.defaultdict(float)
+        self._trace = None
+        self._tracer = None
+
+    def configure(self, trace_path=None, otel=False):
+        """trace_path : fichier JSON lines des spans. otel : spans envoyes au
+        TracerProvider OpenTelemetry configure (ignore s'il n'est pas installe).
+        Retourne False si otel est demande sans OpenTelemetry."""
+        self._trace = JsonlJournal(trace_path) if trace_path else None
+        self._tracer = None
+        if otel:
+            # Export des spans optionnel (opentelemetry-instrument configure le
+            # provider) : importe seulement s'il est demande
+            try:
+                from opentelemetry import trace as otel_trace
+            except ImportError:
+                return False
+            self._tracer = otel_trace.get_tracer("youtube-playlist-downloader")
+        return True
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[name, tuple(sorted(labels.items()))] += value
+
+    def gauge(self, name, delta, **labels):
+        """Ajoute delta a une jauge (taille de file, taches actives...)."""
+        with self._lock:
+            self._gauges[name, tuple(sorted(labels.items()))] += delta
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[name, tuple(sorted(labels.items()))] = value
+
+    def observe(self, phase, seconds, **attrs):
+        """Duree d'une phase terminee a l'instant ; attrs (tag, url, id...)
+        ne sont gardes que dans les spans."""
+        with self._lock:
+            self._counters["phase_seconds_total", (("phase", phase),)] += seconds
+            self._counters["phase_total", (("phase", phase),)] += 1
+        if not (self._trace or self._tracer):
+            return
+        end = time.time()
+        attrs = {k: v for k, v in attrs.items() if v is not None}
+        if self._trace:
+            self._trace.append(dict(attrs, span=phase, start=round(end - seconds, 6),
+                                    duration=round(seconds, 6)))
+        if self._tracer:
+            span = self._tracer.start_span(phase, start_time=int((end - seconds) * 1e9),
+                                           attributes={k: v if isinstance(v, (str, bool, int, float))
+                                                       else str(v) for k, v in attrs.items()})
+            span.end(end_time=int(end * 1e9))
+
+    @contextlib.contextmanager
+    def span(self, phase, **attrs):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.monotonic() - start, **attrs)
+
+    def on_progress(self, event):
+        """Abonne de PROGRESS : octets des fichiers termines."""
+        if event.stage == "finished":
+            self.inc("bytes_total", event.total or event.downloaded or 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def phase_times(self, since=None):
+        """{phase: secondes} cumulees depuis un snapshot()."""
+        now = self.snapshot()
+        since = since or {}
+        return {labels[0][1]: value - since.get((name, labels), 0)
+                for (name, labels), value in now.items() if name == "phase_seconds_total"}
+
+    def phase_summary(self, since=None):
+        """Temps cumule par phase, du plus long au plus court."""
+        times = self.phase_times(since)
+        times = sorted(((times.get(phase, 0), label) for phase, label in PHASES.items()),
+                       reverse=True)
+        return ", ".join(f"{label} {seconds:.1f}s" for seconds, label in times if seconds >= 0.05)
+
+    def prometheus(self):
+        """Exposition au format texte Prometheus."""
+        with self._lock:
+            series = [("counter", k, v) for k, v in sorted(self._counters.items())]
+            series += [("gauge", k, v) for k, v in sorted(self._gauges.items())]
+        lines = []
+        typed = set()
+        for kind, (name, labels), value in series:
+            name = f"{METRICS_PREFIX}_{name}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}" if labels else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Ecrit l'exposition dans un fichier (collecteur textfile de
+        node_exporter), remplace d'un coup pour ne jamais etre lu a moitie."""
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Sert /metrics en HTTP dans un thread. Retourne le serveur."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+
+
 REGISTRY_FILE = ".playlists_done.json"
+REGISTRY_JOURNAL_FILE = ".playlists_done.jsonl"
+REGISTRY_COMPACT_LINES = 1000
 
 
 def _registry_path(output_dir):
     return os.path.join(output_dir or ".", REGISTRY_FILE)
 
 
+class PlaylistRegistry(dict):
+    """Registre des playlists telechargees : snapshot JSON compact et journal
+    JSON-lines des ajouts. Partage entre threads, un ajout ne reecrit pas le
+    fichier entier."""
+
+    def __init__(self, output_dir):
+        super().__init__()
+        self.output_dir = output_dir
+        self._journal = JsonlJournal(os.path.join(output_dir or ".", REGISTRY_JOURNAL_FILE))
+        self._lock = threading.Lock()
+
+        path = _registry_path(output_dir)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.update(json.load(f))
+        # Un .old restant vient d'une compaction interrompue : rejoue avant le
+        # journal courant, puis integre au snapshot
+        leftover = os.path.isfile(self._journal.old_path)
+        lines = 0
+        for journal in (JsonlJournal(self._journal.old_path), self._journal):
+            for entry in journal.replay():
+                self[entry["id"]] = entry["record"]
+                lines += 1
+        if leftover or lines >= REGISTRY_COMPACT_LINES:
+            self.compact()
+
+    def record(self, pid, record):
+        with self._lock:
+            self[pid] = record
+            self._journal.append({"id": pid, "record": record})
+
+    def compact(self):
+        """Reecrit le snapshot avec tout le journal puis repart d'un journal vide."""
+        with self._lock:
+            old = self._journal.rotate()
+            if old:
+                # Ajouts d'autres processus arrives depuis le chargement
+                for entry in JsonlJournal(old).replay():
+                    self[entry["id"]] = entry["record"]
+            save_registry(self.output_dir, self)
+            if old:
+                os.remove(old)
+
+
 def load_registry(output_dir):
-    path = _registry_path(output_dir)
-    if os.path.isfile(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    return PlaylistRegistry(output_dir)
 
 
 def save_registry(output_dir, registry):
+    """Ecrit le snapshot complet de facon atomique (fichier temporaire + rename)."""
     path = _registry_path(output_dir)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(registry, f, indent=2, ensure_ascii=False)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
 
 
 def extract_playlist_id(url):
@@ -73,44 +410,784 @@ def extract_playlist_id(url):
     return None
 
 
+def extract_video_id(url):
+    """Extrait l'ID d'une video YouTube (watch, youtu.be, shorts) sans requete reseau."""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.endswith("youtu.be"):
+        return parsed.path.strip("/").split("/")[0] or None
+    if "youtube" not in host:
+        return None
+    qs = parse_qs(parsed.query)
+    if parsed.path == "/watch" and "v" in qs:
+        return qs["v"][0]
+    match = re.match(r"/(?:shorts|live|embed)/([\w-]+)", parsed.path)
+    return match.group(1) if match else None
+
+
+ARCHIVE_FILE = ".downloaded.txt"
+
+
+class DownloadArchive:
+    """Archive des videos telechargees (.downloaded.txt), chargee une seule fois
+    par processus et passee directement a chaque YoutubeDL (download_archive
+    accepte un objet type set). Les ajouts sont serialises par un verrou ; les
+    lignes ajoutees par un autre processus sont relues a la demande."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = set()
+        self._offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Lit les lignes ajoutees au fichier depuis le dernier passage."""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            if size < self._offset:
+                # Fichier remplace ou tronque : relecture complete
+                self._ids.clear()
+                self._offset = 0
+            if size == self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            # Ne consommer que des lignes completes
+            end = data.rfind(b"\n") + 1
+            self._ids.update(line.strip() for line in data[:end].decode("utf-8").splitlines() if line.strip())
+            self._offset += end
+
+    def __contains__(self, archive_id):
+        return archive_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def add(self, archive_id):
+        with self._lock:
+            if archive_id in self._ids:
+                return
+            self._ids.add(archive_id)
+            with open(self.path, "ab") as f:
+                before = f.tell()
+                f.write((archive_id + "\n").encode("utf-8"))
+                # Si un autre processus a ecrit entre-temps, refresh() relira
+                if before == self._offset:
+                    self._offset = f.tell()
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def get_download_archive(output_dir):
+    """Archive globale du dossier de destination, partagee par tout le processus."""
+    path = os.path.abspath(os.path.join(output_dir or ".", ARCHIVE_FILE))
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is None:
+            archive = _archives[path] = DownloadArchive(path)
+            return archive
+    archive.refresh()
+    return archive
+
+
+STORE_DIR = ".store"
+# Intermediaires yt-dlp/aria2c a ne pas lier : .part, .ytdl, .aria2, temp.mp4,
+# fragments (.part-Frag3) et formats avant fusion (<id>.f137.mp4)
+STORE_PARTIAL = re.compile(r"((^|\.)(part|ytdl|temp|aria2)(-Frag\d*)?(\.|$))|(^f\d[^.]*\.)")
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    """Copie par reference (btrfs, xfs...) : aucun bloc duplique."""
+    with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def _link_file(src, dst):
+    """Lien physique, sinon reflink, sinon lien symbolique, sinon copie."""
+    try:
+        os.link(src, dst)
+        return
+    except FileExistsError:
+        return
+    except OSError:
+        pass
+    if fcntl:
+        try:
+            _reflink(src, dst)
+            return
+        except FileExistsError:
+            return
+        except OSError:
+            pass
+    try:
+        os.symlink(os.path.relpath(src, os.path.dirname(dst)), dst)
+        return
+    except FileExistsError:
+        return
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+
+
+class ContentStore:
+    """Stockage unique des videos dans .store/<id>.<ext> (et sous-titres
+    <id>.<langue>.srt). Chaque dossier de playlist recoit un lien sous son
+    nom numerote : une video partagee n'est telechargee et stockee qu'une fois."""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir or ".", STORE_DIR)
+
+    def outtmpl(self):
+        return os.path.join(self.path, "%(id)s.%(ext)s")
+
+    def ydl_opts(self, scratch_dir=None):
+        """outtmpl (et paths) yt-dlp. Avec scratch_dir, les .part, fragments et
+        fichiers avant fusion y sont ecrits ; seul le fichier final arrive
+        dans le store (voir add_scratch_move)."""
+        if not scratch_dir:
+            return {"outtmpl": self.outtmpl()}
+        return {"outtmpl": "%(id)s.%(ext)s", "paths": {"home": self.path, "temp": scratch_dir}}
+
+    def files(self, video_id):
+        """Fichiers finaux d'une video : [(suffixe, chemin)]."""
+        prefix = os.path.join(glob.escape(self.path), glob.escape(video_id))
+        found = []
+        for path in glob.glob(prefix + ".*"):
+            suffix = os.path.basename(path)[len(video_id) + 1:]
+            if not STORE_PARTIAL.search(suffix):
+                found.append((suffix, path))
+        return found
+
+    def link(self, video_id, dest_stem):
+        """Lie les fichiers de la video sous dest_stem.<suffixe>. Retourne le
+        nombre de fichiers lies (0 si la video n'est pas dans le store)."""
+        files = self.files(video_id) if video_id else []
+        for suffix, src in files:
+            dst = f"{dest_stem}.{suffix}"
+            if not os.path.lexists(dst):
+                os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+                _link_file(src, dst)
+        return len(files)
+
+
+# Espace laisse libre sur chaque disque, et intervalle des verifications
+# quand une video attend de la place
+DISK_MARGIN = 512 * 1024 * 1024
+DISK_CHECK_INTERVAL = 5
+# Taille supposee d'un format qui n'annonce ni taille ni debit : 10 Mbps sur
+# sa duree, ou DISK_FALLBACK_SIZE sans duree (estimation prudente)
+DISK_FALLBACK_RATE = 10e6 / 8
+DISK_FALLBACK_SIZE = 2 * 1024 * 1024 * 1024
+
+
+def _existing_dir(path):
+    """path, ou son plus proche parent existant (dossier pas encore cree)."""
+    path = os.path.abspath(path)
+    while not os.path.isdir(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def estimate_size(info):
+    """Taille d'une video une fois ses formats choisis, en octets : filesize,
+    sinon filesize_approx, sinon debit (tbr) x duree, sinon une estimation
+    prudente (DISK_FALLBACK_RATE / DISK_FALLBACK_SIZE)."""
+    duration = info.get("duration")
+    total = 0
+    for f in info.get("requested_formats") or [info]:
+        size = f.get("filesize") or f.get("filesize_approx")
+        if not size and f.get("tbr") and duration:
+            size = f["tbr"] * 1000 / 8 * duration
+        if not size:
+            size = duration * DISK_FALLBACK_RATE if duration else DISK_FALLBACK_SIZE
+        total += size
+    return int(total)
+
+
+class DiskSpace:
+    """Admission des videos selon l'espace libre : chaque video reserve sa
+    taille estimee (fois deux si elle est fusionnee ou convertie : morceaux
+    + fichier final) sur chaque disque touche avant d'ecrire le moindre octet,
+    et la libere apres son post-traitement. L'espace deja ecrit par les
+    videos en cours reste compte dans leur reservation : l'estimation est
+    prudente. Une video attend tant que d'autres reservations peuvent se
+    liberer, et echoue proprement (sans .part) sinon."""
+
+    def __init__(self, margin=DISK_MARGIN):
+        self.margin = margin
+        self._cond = threading.Condition()
+        self._reserved = collections.Counter()  # st_dev -> octets reserves
+
+    def _needs(self, needs):
+        by_dev, paths = collections.Counter(), {}
+        for path, size in needs.items():
+            path = _existing_dir(path)
+            dev = os.stat(path).st_dev
+            by_dev[dev] += size
+            paths[dev] = path
+        return by_dev, paths
+
+    def reserve(self, needs, stop_event=None, on_wait=None):
+        """needs : {dossier: octets}. Retourne la reservation (a passer a
+        release), ou None si l'espace manque meme sans autre reservation."""
+        by_dev, paths = self._needs(needs)
+        waiting = False
+        with self._cond:
+            while True:
+                short = [dev for dev, size in by_dev.items()
+                         if shutil.disk_usage(paths[dev]).free - self._reserved[dev] - self.margin < size]
+                if not short:
+                    self._reserved.update(by_dev)
+                    return by_dev
+                if not any(self._reserved[dev] for dev in short) or \
+                        (stop_event and stop_event.is_set()):
+                    return None
+                if on_wait and not waiting:
+                    on_wait()
+                waiting = True
+                self._cond.wait(DISK_CHECK_INTERVAL)
+
+    def release(self, reservation):
+        with self._cond:
+            self._reserved.subtract(reservation)
+            self._reserved += collections.Counter()  # retire les zeros
+            self._cond.notify_all()
+
+
+DISK = DiskSpace()
+
+
+def _move_atomic(src, dst):
+    """Deplace src vers un autre disque : copie a cote de dst (.temp, ignore
+    par le store) puis os.replace, dst n'est jamais visible tronque."""
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp = dst + ".temp"
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+    os.remove(src)
+
+
+class _ScratchMoveMixin:
+    """Post-traitement des sessions a dossier de travail (paths temp), dernier
+    avant le deplacement de yt-dlp : les fichiers sur un autre disque que leur
+    destination y sont deplaces par _move_atomic (sur le meme disque, yt-dlp
+    renomme deja)."""
+
+    def run(self, info):
+        finaldir = info.get("__finaldir")
+        moves = info.get("__files_to_move")
+        if not finaldir or moves is None:
+            return [], info
+        device = os.stat(_existing_dir(finaldir)).st_dev
+        # Le fichier principal est ajoute aux deplacements par yt-dlp
+        pending = dict(moves)
+        pending.setdefault(info["filepath"], None)
+        for old, new in pending.items():
+            new = new or os.path.join(finaldir, os.path.basename(old))
+            if not os.path.exists(old) or os.path.abspath(old) == os.path.abspath(new) \
+                    or os.stat(old).st_dev == device:
+                continue
+            _move_atomic(old, new)
+            # Deja en place : yt-dlp n'a plus rien a deplacer
+            moves.pop(old, None)
+            moves[new] = new
+            if old == info["filepath"]:
+                info["filepath"] = new
+        return [], info
+
+
+_scratch_pp_class = None
+
+
+def add_scratch_move(ydl):
+    """Ajoute le deplacement atomique a une session qui ecrit dans un dossier
+    de travail."""
+    global _scratch_pp_class
+    if not (ydl.params.get("paths") or {}).get("temp"):
+        return
+    with _load_lock:
+        if _scratch_pp_class is None:
+            _scratch_pp_class = type("ScratchMovePP",
+                                     (_ScratchMoveMixin, _yt_dlp().postprocessor.PostProcessor),
+                                     {"__module__": __name__})
+    ydl.add_post_processor(_scratch_pp_class(ydl), when="post_process")
+
+
+JOB_JOURNAL_FILE = ".jobs.jsonl"
+
+
+class JobJournal:
+    """Journal d'avancement de download_all (ecrit avant chaque etape) :
+    etat de chaque item (extracting, planned avec la sonde plate, done,
+    failed) et de chaque video (downloading avec le format choisi,
+    postprocessing, done, failed). Les videos d'un item planifie sont en
+    file implicitement. Une reprise repart des sondes journalisees sans
+    re-extraire les items, et retente les videos interrompues avec le meme
+    format (les .part de yt-dlp sont repris). Les items termines sont oublies
+    au chargement suivant."""
+
+    def __init__(self, output_dir):
+        self._journal = JsonlJournal(os.path.join(output_dir or ".", JOB_JOURNAL_FILE))
+        self._lock = threading.Lock()
+        self.items = {}   # url -> {"state": ..., "probe": {"info", "delta"}}
+        self.videos = {}  # (url, video_id) -> {"state": ..., "format": ...}
+        # Le .old n'est supprime qu'une fois reecrit : apres un crash pendant la
+        # reecriture, rotate() y ajoute le journal partiel et tout est rejoue
+        old = self._journal.rotate()
+        if not old:
+            return
+        for record in JsonlJournal(old).replay():
+            self._apply(record)
+        # Compaction : seuls les items inacheves sont reecrits
+        for url in [u for u, item in self.items.items() if item["state"] == "done"]:
+            del self.items[url]
+        self.videos = {k: v for k, v in self.videos.items() if k[0] in self.items}
+        for url, item in self.items.items():
+            if "probe" in item:
+                self._journal.append({"item": url, "state": "planned", "probe": item["probe"]})
+            if item["state"] != "planned":
+                self._journal.append({"item": url, "state": item["state"]})
+        for (url, vid), video in self.videos.items():
+            self._journal.append(dict(video, item=url, video=vid))
+        os.remove(old)
+
+    def _apply(self, record):
+        url = record["item"]
+        if "video" in record:
+            video = self.videos.setdefault((url, record["video"]), {})
+            video["state"] = record["state"]
+            if record.get("format"):
+                video["format"] = record["format"]
+            return
+        item = self.items.setdefault(url, {})
+        item["state"] = record["state"]
+        if "probe" in record:
+            item["probe"] = record["probe"]
+
+    def item(self, url, state, probe=None):
+        record = {"item": url, "state": state}
+        if probe is not None:
+            record["probe"] = probe
+        with self._lock:
+            self._apply(record)
+            self._journal.append(record)
+
+    def video(self, url, video_id, state, format_id=None):
+        if not video_id:
+            return
+        record = {"item": url, "video": video_id, "state": state}
+        if format_id:
+            record["format"] = format_id
+        with self._lock:
+            self._apply(record)
+            self._journal.append(record)
+
+    def saved_probe(self, url):
+        """Sonde journalisee d'un item inacheve, ou None."""
+        with self._lock:
+            item = self.items.get(url)
+            return item.get("probe") if item and item["state"] != "done" else None
+
+    def saved_format(self, url, video_id):
+        """Format choisi pour une video interrompue, ou None."""
+        with self._lock:
+            video = self.videos.get((url, video_id))
+            return video.get("format") if video and video["state"] != "done" else None
+
+
+QUEUE_FILE = ".queue.jsonl"
+
+
+class JobQueue:
+    """File de liens persistante, modifiable pendant download_all (qui la
+    consomme comme une liste de liens) : ajout, priorite, pause, annulation et
+    qualite par lien. Tas de (priorite, ordre d'arrivee) : une priorite plus
+    basse passe d'abord ; une entree modifiee est reempilee et l'ancienne
+    ignoree a la sortie, chaque operation coute O(log n). Etats : pending,
+    paused, running, cancelled, done, failed. Les changements sont journalises
+    dans QUEUE_FILE ; au chargement les liens interrompus en cours repassent
+    en attente (leur reprise passe par le JobJournal) et ceux en echec sont
+    oublies comme les termines. Sans keep_open, l'iteration s'arrete
+    quand plus rien n'est en attente, en pause ou en cours."""
+
+    def __init__(self, output_dir, stop_event=None, keep_open=False):
+        self._journal = JsonlJournal(os.path.join(output_dir or ".", QUEUE_FILE))
+        self._cond = threading.Condition()
+        self._items = {}  # url -> {"priority", "state", "quality", "folder"}
+        self._heap = []   # (priorite, ordre, url)
+        self._seq = itertools.count()
+        self._counts = collections.Counter()  # etat -> nombre de liens
+        self._listeners = []
+        self.keep_open = keep_open
+        self.stop_event = stop_event
+        # Meme reprise que JobJournal si la reecriture a ete interrompue
+        old = self._journal.rotate()
+        if old:
+            for record in JsonlJournal(old).replay():
+                self._apply(record)
+            # Compaction : seuls les liens a faire sont reecrits
+            for url, item in list(self._items.items()):
+                if item["state"] in ("done", "cancelled", "failed"):
+                    del self._items[url]
+                    continue
+                if item["state"] == "running":
+                    item["state"] = "pending"
+                if item.get("resume_to") == "running":
+                    item["resume_to"] = "pending"
+                self._journal.append(dict(item, url=url))
+            os.remove(old)
+            self._counts = collections.Counter(i["state"] for i in self._items.values())
+        for url, item in self._items.items():
+            if item["state"] == "pending":
+                self._push(url)
+        subscribe = getattr(stop_event, "subscribe", None)
+        if subscribe:
+            subscribe(self._wake)
+
+    def close(self):
+        unsubscribe = getattr(self.stop_event, "unsubscribe", None)
+        if unsubscribe:
+            unsubscribe(self._wake)
+
+    def _apply(self, record):
+        fields = dict(record)
+        url = fields.pop("url")
+        item = self._items.get(url)
+        if item is None:
+            item = self._items[url] = {"priority": 0, "state": "pending",
+                                       "quality": None, "folder": None}
+            self._counts["pending"] += 1
+        was = item["state"]
+        item.update(fields)
+        if item["state"] != was:
+            self._counts[was] -= 1
+            self._counts[item["state"]] += 1
+        return item
+
+    def _push(self, url):
+        heapq.heappush(self._heap, (self._items[url]["priority"], next(self._seq), url))
+
+    def _change(self, url, **fields):
+        """Applique et journalise un changement (sous self._cond)."""
+        was = self._items[url]["state"] if url in self._items else None
+        item = self._apply(dict(fields, url=url))
+        self._journal.append(dict(fields, url=url))
+        if item["state"] == "pending" and ("priority" in fields or was != "pending"):
+            self._push(url)
+        self._cond.notify_all()
+        for callback in list(self._listeners):
+            callback()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def listen(self, callback):
+        """callback() apres chaque changement (thread de l'appelant)."""
+        self._listeners.append(callback)
+
+    def unlisten(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def add(self, url, priority=0, quality=None, folder=None):
+        """Ajoute un lien (en fin de file a priorite egale : l'ordre d'arrivee
+        departage). Retourne False s'il est deja en file ou en cours."""
+        with self._cond:
+            item = self._items.get(url)
+            if item and item["state"] in ("pending", "paused", "running"):
+                return False
+            self._change(url, state="pending", quality=quality, folder=folder, priority=priority)
+            return True
+
+    def top_priority(self):
+        """Priorite qui fait passer un lien avant tous les autres."""
+        with self._cond:
+            live = [i["priority"] for i in self._items.values()
+                    if i["state"] in ("pending", "paused", "running")]
+            return min(live, default=0) - 1
+
+    def set_priority(self, url, priority):
+        with self._cond:
+            if url in self._items:
+                self._change(url, priority=priority)
+
+    def set_quality(self, url, quality):
+        """Qualite (cle de QUALITIES) : pour un lien en cours, s'applique aux
+        videos pas encore lancees (video vers video uniquement)."""
+        with self._cond:
+            if url in self._items:
+                self._change(url, quality=quality)
+
+    def pause(self, url):
+        with self._cond:
+            if self.state(url) in ("pending", "running"):
+                # Un lien en cours garde ses videos lancees
+                self._change(url, state="paused", resume_to=self._items[url]["state"])
+
+    def resume(self, url):
+        with self._cond:
+            if self.state(url) == "paused":
+                self._change(url, state=self._items[url].get("resume_to") or "pending")
+
+    def cancel(self, url):
+        """Annule un lien ; les videos deja lancees se terminent."""
+        with self._cond:
+            if self.state(url) in ("pending", "paused", "running"):
+                self._change(url, state="cancelled")
+
+    def item_finished(self, url, ok=True):
+        """Appele par download_all a la fin d'un lien."""
+        with self._cond:
+            if self.state(url) in ("running", "paused"):
+                self._change(url, state="done" if ok else "failed")
+
+    def state(self, url):
+        item = self._items.get(url)
+        return item["state"] if item else None
+
+    def status(self, url):
+        """(etat, priorite) d'un lien, pour la file des videos."""
+        item = self._items.get(url)
+        return (item["state"], item["priority"]) if item else ("running", 0)
+
+    def apply_quality(self, plan):
+        """Qualite changee apres la sonde : format des prochaines videos."""
+        quality = (self._items.get(plan.url) or {}).get("quality")
+        fmt = QUALITIES.get(quality)
+        audio = QUALITIES["Audio uniquement"]
+        if fmt and fmt != plan.opts["format"] and audio not in (fmt, plan.opts["format"]):
+            plan.opts["format"] = fmt
+
+    def waiting(self, limit):
+        """Liens en attente ou en pause, par priorite (au plus `limit`) :
+        [(url, etat, priorite, qualite)]."""
+        with self._cond:
+            live = ((i["priority"], url, i) for url, i in self._items.items()
+                    if i["state"] in ("pending", "paused"))
+            return [(url, i["state"], p, i["quality"])
+                    for p, url, i in heapq.nsmallest(limit, live, key=lambda x: x[0])]
+
+    def counts(self):
+        with self._cond:
+            return +self._counts
+
+    def _busy(self):
+        return self._counts["running"] > 0 or self._counts["paused"] > 0
+
+    def __iter__(self):
+        """(url, dossier, options de l'item) par priorite ; attend les ajouts
+        tant que des liens sont en cours (ou toujours avec keep_open)."""
+        while True:
+            with self._cond:
+                while True:
+                    if self.stop_event and self.stop_event.is_set():
+                        return
+                    url = self._pop()
+                    if url:
+                        break
+                    if not (self.keep_open or self._busy()):
+                        return
+                    self._cond.wait(1.0)
+                self._change(url, state="running")
+                item = self._items[url]
+                overrides = {}
+                if item["quality"] in QUALITIES:
+                    overrides = {"quality_fmt": QUALITIES[item["quality"]],
+                                 "is_audio": "Audio" in item["quality"]}
+            yield url, item["folder"], overrides
+
+    def _pop(self):
+        while self._heap:
+            priority, _, url = heapq.heappop(self._heap)
+            item = self._items.get(url)
+            # Entree perimee : lien modifie (reempile), en pause ou annule
+            if item and item["state"] == "pending" and item["priority"] == priority:
+                return url
+        return None
+
+
+def registry_folder(record):
+    """Dossier d'une entree du registre (ancien format : simple nom de dossier)."""
+    return record["folder"] if isinstance(record, dict) else record
+
+
+def registry_key(url):
+    """Cle du registre : l'ID de playlist, ou le lien normalise d'un onglet de
+    chaine (/videos, /shorts, /streams), pour la synchro incrementale."""
+    pid = extract_playlist_id(url)
+    if pid:
+        return pid
+    tab = url.strip().rstrip("/")
+    if any(tab.endswith(f"/{suffix}") for suffix, _ in CHANNEL_TABS):
+        return f"tab:{tab}"
+    return None
+
+
 def is_playlist_done(url, output_dir, registry):
-    """Verifie localement si une playlist a deja ete telechargee."""
+    """Verifie localement si une playlist a deja ete telechargee. Les onglets
+    de chaine ne sont jamais ignores : leurs nouvelles videos sont cherchees
+    a chaque lancement."""
     pid = extract_playlist_id(url)
     if not pid or pid not in registry:
         return False
-    folder = registry[pid]
+    folder = registry_folder(registry[pid])
     folder_path = os.path.join(output_dir or ".", folder)
-    archive = os.path.join(folder_path, ".downloaded.txt")
+    archive = os.path.join(folder_path, ARCHIVE_FILE)
     return os.path.isdir(folder_path) and os.path.isfile(archive)
 
 
-def mark_playlist_done(url, folder_name, output_dir, registry):
-    """Enregistre une playlist comme telechargee."""
+def mark_playlist_done(url, folder_name, output_dir, registry, entry_ids=None, last_index=None):
+    """Enregistre une playlist comme telechargee, avec les IDs de ses videos
+    et la derniere position vue (pour la synchro incrementale)."""
+    key = registry_key(url)
+    if key:
+        record = {"folder": folder_name}
+        if entry_ids is not None:
+            record["ids"] = list(entry_ids)
+            record["last_index"] = last_index or len(record["ids"])
+        registry.record(key, record)
+
+
+METADATA_CACHE_FILE = ".metadata_cache.db"
+CACHE_TTL = 6 * 3600
+CACHE_MAX_ENTRIES = 2000
+# Formats choisis (video, qualite) gardes au maximum, et leur duree de vie :
+# les flux proposes pour une video changent rarement, mais peuvent changer
+FORMAT_CACHE_MAX = 50000
+FORMAT_CACHE_TTL = 7 * 86400
+# "stale" : ne rafraichit que les entrees expirees, "all" : ignore le cache,
+# "none" : sert aussi les entrees expirees (reprise hors ligne)
+CACHE_REFRESH_MODES = ["stale", "all", "none"]
+
+
+def metadata_cache_key(url):
+    """Cle de cache : l'ID de playlist si present, sinon l'URL normalisee."""
     pid = extract_playlist_id(url)
     if pid:
-        registry[pid] = folder_name
-        save_registry(output_dir, registry)
+        return f"playlist:{pid}"
+    return f"url:{url.strip().rstrip('/')}"
+
+
+class MetadataCache:
+    """Cache SQLite des infos (plates) de playlists et chaines, avec TTL et
+    eviction LRU bornee, et des formats choisis pour chaque video. Partage
+    entre threads."""
+
+    def __init__(self, output_dir, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, refresh="stale"):
+        if refresh not in CACHE_REFRESH_MODES:
+            raise ValueError(f"Mode de rafraichissement inconnu : {refresh}")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(output_dir or ".", METADATA_CACHE_FILE),
+                                     check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, data TEXT NOT NULL,"
+                " fetched REAL NOT NULL, accessed REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS formats ("
+                " video_id TEXT NOT NULL, quality TEXT NOT NULL, format_id TEXT NOT NULL,"
+                " chosen REAL NOT NULL, PRIMARY KEY (video_id, quality))")
+
+    def get(self, key):
+        if self.refresh == "all":
+            return None
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT data, fetched FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            data, fetched = row
+            now = time.time()
+            if self.refresh == "stale" and now - fetched > self.ttl:
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(data)
+
+    def put(self, key, info):
+        data = json.dumps(info, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, data, now, now))
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+    def get_format(self, video_id, quality):
+        """format_id choisi pour cette video et cette qualite il y a moins de
+        FORMAT_CACHE_TTL, ou None."""
+        if self.refresh == "all" or not video_id:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT format_id, chosen FROM formats WHERE video_id = ? AND quality = ?",
+                (video_id, quality)).fetchone()
+        if row is None or (self.refresh == "stale" and time.time() - row[1] > FORMAT_CACHE_TTL):
+            return None
+        return row[0]
+
+    def put_format(self, video_id, quality, format_id):
+        if not (video_id and format_id):
+            return
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO formats VALUES (?, ?, ?, ?)",
+                               (video_id, quality, format_id, time.time()))
+            self._conn.execute(
+                "DELETE FROM formats WHERE rowid IN ("
+                " SELECT rowid FROM formats ORDER BY chosen DESC LIMIT -1 OFFSET ?)",
+                (FORMAT_CACHE_MAX,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
 
 
 def base_opts():
     opts = {}
-    if NODE_PATH:
-        opts["js_runtimes"] = {"node": {"path": NODE_PATH}}
-    opts["remote_components"] = {"ejs": "github"}
+    node = tool_path("node")
+    if node:
+        opts["js_runtimes"] = {"node": {"path": node}}
+    # Solveur de defis JS telecharge si besoin, puis garde dans le cache yt-dlp
+    opts["remote_components"] = {"ejs:github"}
     return opts
 
 
-def aria2c_opts():
-    if not ARIA2C_PATH:
+def aria2c_opts(connections=16):
+    # Le plafond de debit passe par l'option yt-dlp "ratelimit", qu'aria2c
+    # recoit en --max-overall-download-limit
+    if not tool_path("aria2c"):
         return {}
     return {
         "external_downloader": {"default": "aria2c"},
         "external_downloader_args": {
             "aria2c": [
-                "--max-connection-per-server=16",
+                f"--max-connection-per-server={connections}",
                 "--min-split-size=1M",
-                "--split=16",
-                "--max-overall-download-limit=0",
+                f"--split={connections}",
+                # Fichier alloue d'un bloc (fallocate) : pas de fragmentation,
+                # et un disque plein est detecte des le debut
+                "--file-allocation=falloc",
             ],
         },
     }
@@ -143,7 +1220,14 @@ def build_subtitle_opts(subs_enabled, sub_lang):
     }
 
 
-def fetch_channel_playlists(channel_url, cookie_opts, log_func):
+def muxed_format(quality_fmt):
+    """Selecteur des flux deja combines (audio + video) d'un preset de
+    QUALITIES, limite a sa hauteur : "best[height<=1080]". None pour l'audio."""
+    muxed = [alt for alt in quality_fmt.split("/") if "+" not in alt and "height" in alt]
+    return "/".join(muxed) or None
+
+
+def fetch_channel_playlists(channel_url, cookie_opts, log_func, cache=None):
     log_func(f"  Scan de la chaine : {channel_url}")
     log_func(f"  Recuperation des playlists...")
 
@@ -151,12 +1235,19 @@ def fetch_channel_playlists(channel_url, cookie_opts, log_func):
     if not url.endswith("/playlists"):
         url += "/playlists"
 
-    opts = base_opts()
-    opts.update({"quiet": True, "extract_flat": True})
-    opts.update(cookie_opts)
+    key = metadata_cache_key(url)
+    info = cache.get(key) if cache else None
+    if info:
+        log_func("  Liste des playlists lue depuis le cache.")
+    else:
+        opts = base_opts()
+        opts.update({"quiet": True, "extract_flat": True})
+        opts.update(cookie_opts)
 
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        info = ydl.extract_info(url, download=False)
+        with YDL_POOL.session(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+        if cache and info and "entries" in info:
+            cache.put(key, info)
 
     if not info or "entries" not in info:
         log_func("  ERREUR : impossible de recuperer les playlists.")
@@ -167,31 +1258,375 @@ def fetch_channel_playlists(channel_url, cookie_opts, log_func):
     return urls
 
 
+def channel_base_url(channel_url):
+    """Lien de la chaine sans suffixe d'onglet."""
+    url = channel_url.rstrip("/")
+    for suffix in ["/playlists", "/videos", "/shorts", "/streams", "/community", "/about"]:
+        if url.endswith(suffix):
+            return url[:-len(suffix)]
+    return url
+
+
 def fetch_channel_all_videos(channel_url, cookie_opts, log_func):
     """Recupere le lien /videos d'une chaine pour tout telecharger."""
     log_func(f"  Scan complet de la chaine : {channel_url}")
 
-    url = channel_url.rstrip("/")
-    # Retirer un eventuel suffixe et mettre /videos
-    for suffix in ["/playlists", "/videos", "/shorts", "/streams", "/community", "/about"]:
-        if url.endswith(suffix):
-            url = url[:-len(suffix)]
-            break
-    url += "/videos"
+    url = channel_base_url(channel_url) + "/videos"
 
     log_func(f"  URL : {url}")
     return url
 
 
-def make_progress_hook(tag, log_func):
-    def progress_hook(d):
-        if d["status"] == "downloading":
-            pct = d.get("_percent_str", "?")
-            speed = d.get("_speed_str", "?")
-            log_func(f"  {tag} {pct}  {speed}", replace_last=True)
-        elif d["status"] == "finished":
-            log_func(f"  {tag} Fichier termine.")
-    return progress_hook
+# Onglets video d'une chaine (suffixe, dossier) ; /playlists est traite a part
+CHANNEL_TABS = [
+    ("videos", "Videos individuelles"),
+    ("shorts", "Shorts"),
+    ("streams", "Lives"),
+]
+
+
+class ChannelScanner:
+    """Scan de chaine(s) : les onglets /videos, /shorts, /streams et
+    /playlists sont enumeres en parallele et les items (url, dossier) sont
+    fournis au fil de l'eau, pour que download_all commence avant la fin du
+    scan. Les listes plates des onglets sont deposees dans le cache de
+    metadonnees : la sonde de download_all ne les refait pas."""
+
+    def __init__(self, channel_urls, cookie_opts, log_func, cache=None, stop_event=None):
+        if isinstance(channel_urls, str):
+            channel_urls = [channel_urls]
+        self.channel_urls = list(channel_urls)
+        self.cookie_opts = cookie_opts
+        self.log_func = log_func
+        self.cache = cache
+        self.stop_event = stop_event
+        self.registry = registry
+        self._queue = queue.Queue()
+
+    def __iter__(self):
+        threads = []
+        for base in map(channel_base_url, self.channel_urls):
+            self.log_func(f"  Scan de la chaine : {base}")
+            for tab, folder in CHANNEL_TABS:
+                threads.append(threading.Thread(target=self._scan_tab, daemon=True,
+                                                args=(f"{base}/{tab}", folder)))
+            threads.append(threading.Thread(target=self._scan_playlists, daemon=True,
+                                            args=(f"{base}/playlists",)))
+        for t in threads:
+            t.start()
+        running = len(threads)
+        while running:
+            item = self._queue.get()
+            if item is None:
+                running -= 1
+            else:
+                yield item
+
+    def _scan_tab(self, url, folder):
+        try:
+            record = self.registry.get(registry_key(url)) if self.registry is not None else None
+            if isinstance(record, dict) and "ids" in record:
+                self.log_func(f"  Onglet {folder} : {len(record['ids'])} video(s) connue(s)")
+                self._queue.put((url, folder))
+                return
+            info = probe_item(url, f"[{folder}]", self.cookie_opts, self.log_func, self.stop_event)
+            count = len([e for e in (info or {}).get("entries") or [] if e])
+            if not count:
+                return
+            if self.cache:
+                self.cache.put(metadata_cache_key(url), info)
+            self.log_func(f"  Onglet {folder} : {count} video(s)")
+            self._queue.put((url, folder))
+        finally:
+            self._queue.put(None)
+
+    def _scan_playlists(self, url):
+        # Liste paresseuse : chaque page de playlists est transmise des reception
+        opts = base_opts()
+        opts.update({"quiet": True, "extract_flat": True})
+        opts.update(self.cookie_opts)
+        found = 0
+        try:
+            with YDL_POOL.session(opts, stop_event=self.stop_event) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+                if info and info.get("_type") == "url":
+                    info = ydl.extract_info(info["url"], download=False, process=False,
+                                            ie_key=info.get("ie_key"))
+                for entry in (info or {}).get("entries") or []:
+                    if self.stop_event and self.stop_event.is_set():
+                        break
+                    if entry and entry.get("url"):
+                        found += 1
+                        self._queue.put(entry["url"])
+            self.log_func(f"  {found} playlists trouvees !")
+        except Exception as e:
+            self.log_func(f"  ERREUR : impossible de recuperer les playlists : {e}")
+        finally:
+            self._queue.put(None)
+
+
+# Etapes d'une tache video : "resolving" (extraction, choix du format),
+# "downloading", "finished" (un fichier termine), "postprocessing", puis
+# "done" ou "failed"
+PROGRESS_STAGES = ("resolving", "downloading", "finished", "postprocessing", "done", "failed")
+
+# Intervalle des evenements "progress" de la ligne de commande (secondes)
+PROGRESS_EMIT_INTERVAL = 1.0
+
+STAGE_LABELS = {"resolving": "preparation...", "finished": "fichier termine",
+                "postprocessing": "post-traitement...", "done": "termine.", "failed": "echec."}
+
+
+def format_speed(speed):
+    """Debit en octets/s -> texte ("" si inconnu)."""
+    return f"{speed / 1e6:.2f} Mo/s" if speed else ""
+
+
+def format_eta(eta):
+    """Temps restant en secondes -> "m:ss" ("" si inconnu)."""
+    return "" if eta is None else f"{int(eta) // 60}:{int(eta) % 60:02d}"
+
+
+class ProgressEvent(collections.namedtuple(
+        "ProgressEvent", "job item video_id stage downloaded total speed eta")):
+    """Dernier etat d'une tache video. downloaded / total en octets, speed en
+    octets/s, eta en secondes (None si inconnus)."""
+    __slots__ = ()
+
+    def amount(self):
+        """Pourcentage, ou volume recu si la taille est inconnue."""
+        if self.total:
+            return f"{100 * self.downloaded / self.total:5.1f}%"
+        return f"{self.downloaded / 1e6:.1f} Mo"
+
+    def describe(self):
+        """Ligne de progression lisible."""
+        if self.stage != "downloading":
+            return f"  {self.job} {STAGE_LABELS.get(self.stage, self.stage)}"
+        parts = [f"  {self.job}", self.amount()]
+        if self.speed:
+            parts.append(format_speed(self.speed))
+        if self.eta is not None:
+            parts.append(f"reste {format_eta(self.eta)}")
+        return "  ".join(parts)
+
+
+class ItemProgress(collections.namedtuple("ItemProgress", "item url title total done failed")):
+    """Avancement d'un item (playlist, video...) dont les videos sont en file
+    ou en cours : total, done et failed en nombre de videos."""
+    __slots__ = ()
+
+
+class ProgressBus:
+    """Progression des taches video : les hooks yt-dlp ne font que remplacer
+    le dernier etat de leur tache (ni texte ni verrou par tick). Les
+    interfaces lisent snapshot() a leur rythme, pour un cout proportionnel au
+    nombre de taches en cours et non au nombre de ticks ; subscribe() ne
+    recoit que les changements d'etape."""
+
+    def __init__(self):
+        self._jobs = {}  # tache -> ProgressEvent
+        self._items = {}  # item -> ItemProgress, dans l'ordre de mise en file
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """callback(ProgressEvent) a chaque changement d'etape, dans le thread
+        de la tache : il doit etre rapide."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def stage(self, job, stage, item=None, video_id=None, downloaded=0, total=None):
+        last = self._jobs.get(job)
+        event = ProgressEvent(job, item or (last and last.item), video_id or (last and last.video_id),
+                              stage, downloaded, total, None, None)
+        if stage in ("done", "failed"):
+            self._jobs.pop(job, None)
+        else:
+            self._jobs[job] = event
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(event)
+
+    def hook(self, job, item, video_id, on_finished=None):
+        """Hook de progression yt-dlp pour une tache."""
+        jobs = self._jobs
+
+        def progress_hook(d):
+            if d["status"] == "downloading":
+                jobs[job] = ProgressEvent(job, item, video_id, "downloading",
+                                          d.get("downloaded_bytes") or 0,
+                                          d.get("total_bytes") or d.get("total_bytes_estimate"),
+                                          d.get("speed"), d.get("eta"))
+            elif d["status"] == "finished":
+                self.stage(job, "finished", item, video_id, d.get("downloaded_bytes") or 0,
+                           d.get("total_bytes"))
+                if on_finished:
+                    on_finished()
+        return progress_hook
+
+    def snapshot(self):
+        """Dernier etat de chaque tache en cours."""
+        return list(self._jobs.values())
+
+    def item_queued(self, item, url, title, total):
+        """Les `total` videos de l'item sont en file."""
+        with self._lock:
+            self._items[item] = ItemProgress(item, url, title, total, 0, 0)
+
+    def item_video(self, item, ok):
+        """Une video de l'item est terminee."""
+        with self._lock:
+            last = self._items.get(item)
+            if last:
+                self._items[item] = last._replace(done=last.done + ok, failed=last.failed + (not ok))
+
+    def item_done(self, item):
+        with self._lock:
+            self._items.pop(item, None)
+
+    def items(self):
+        """Items en file ou en cours, dans l'ordre de mise en file."""
+        with self._lock:
+            return list(self._items.values())
+
+    def clear(self):
+        self._jobs.clear()
+        with self._lock:
+            self._items.clear()
+
+
+PROGRESS = ProgressBus()
+PROGRESS.subscribe(METRICS.on_progress)
+
+
+# Reglage automatique de la bande passante : periode de mesure, gain minimal
+# pour continuer a monter, bornes des connexions par video, marge sous le plafond
+BW_ADJUST_INTERVAL = 8
+BW_GAIN = 0.05
+BW_CONN_MIN = 1
+BW_CONN_MAX = 16
+BW_CAP_MARGIN = 0.9
+
+
+class BandwidthController:
+    """Repartit la bande passante entre les telechargements.
+
+    Le debit total est mesure a partir des progress hooks. En mode auto, les
+    connexions par video (fragments / aria2c) puis le nombre de workers actifs
+    montent tant que le debit progresse (ou jusqu'au plafond), et redescendent
+    quand il chute. Le plafond global (octets/s) est partage entre les
+    telechargements en cours via "ratelimit"."""
+
+    def __init__(self, workers, connections, auto=False, max_rate=None, log_func=None):
+        self.max_workers = max(1, workers)
+        self.auto = auto
+        self.max_rate = max_rate
+        self.log_func = log_func
+        # En auto, on part de la moitie des workers et on laisse la mesure decider
+        self.workers = max(1, self.max_workers // 2) if auto else self.max_workers
+        self.connections = max(BW_CONN_MIN, min(connections, BW_CONN_MAX))
+        self.active = 0
+        self._cond = threading.Condition()
+        self._seen = {}  # fichier -> octets deja comptes
+        self._bytes = 0
+        self._window_start = time.monotonic()
+        self._last_rate = None
+        self._direction = 1
+
+    def enter(self, stop_event=None):
+        """Attend une place parmi les workers actifs. Retourne False sur arret
+        (l'appelant reveille l'attente avec wake())."""
+        with self._cond:
+            while self.active >= self.workers:
+                if stop_event and stop_event.is_set():
+                    return False
+                self._cond.wait()
+            self.active += 1
+            return True
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def job_opts(self):
+        """Options yt-dlp d'un telechargement qui demarre. Hors mode auto, les
+        connexions du lot (fragments, aria2c) restent celles de plan_item."""
+        with self._cond:
+            opts = {}
+            if self.auto:
+                opts["concurrent_fragment_downloads"] = self.connections
+                opts.update(aria2c_opts(self.connections))
+            if self.max_rate:
+                opts["ratelimit"] = int(self.max_rate / max(1, self.workers))
+            return opts
+
+    def progress_hook(self, d):
+        key = d.get("tmpfilename") or d.get("filename")
+        done = d.get("downloaded_bytes") or 0
+        with self._cond:
+            if d["status"] == "downloading":
+                self._bytes += max(0, done - self._seen.get(key, 0))
+                self._seen[key] = done
+            else:
+                self._seen.pop(key, None)
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed < BW_ADJUST_INTERVAL:
+                return
+            rate = self._bytes / elapsed
+            self._bytes = 0
+            self._window_start = now
+            if self.auto:
+                self._adjust(rate)
+
+    def _adjust(self, rate):
+        # Montee par paliers tant que chaque pas rapporte, sinon demi-tour
+        target = self.max_rate * BW_CAP_MARGIN if self.max_rate else None
+        if target and rate >= target:
+            self._direction = -1 if rate > self.max_rate else 0
+        elif self._last_rate is None or rate > self._last_rate * (1 + BW_GAIN):
+            self._direction = self._direction or 1
+        elif rate < self._last_rate * (1 - BW_GAIN):
+            self._direction = -self._direction or -1
+        else:
+            # Palier : une montee qui n'a rien rapporte est annulee
+            self._direction = -1 if self._direction > 0 else 0
+        self._last_rate = rate
+
+        before = (self.workers, self.connections)
+        if self._direction > 0:
+            if self.connections < BW_CONN_MAX:
+                self.connections = min(BW_CONN_MAX, self.connections * 2)
+            elif self.workers < self.max_workers:
+                self.workers += 1
+        elif self._direction < 0:
+            if self.workers > 1:
+                self.workers -= 1
+            else:
+                self.connections = max(BW_CONN_MIN, self.connections // 2)
+        self._cond.notify_all()
+        if self.log_func and (self.workers, self.connections) != before:
+            self.log_func(f"  Bande passante : {rate * 8 / 1e6:.1f} Mbps -> "
+                          f"{self.workers} video(s) x {self.connections} connexion(s)")
+
+    def describe(self):
+        with self._cond:
+            cap = f", plafond {self.max_rate * 8 / 1e6:.0f} Mbps" if self.max_rate else ""
+            if not self.auto:
+                return f"{self.workers} video(s){cap}"
+            return f"{self.workers} video(s) x {self.connections} connexion(s){cap}"
 
 
 AUTH_ERRORS = [
@@ -210,6 +1645,15 @@ PRIVATE_ERRORS = [
 MAX_RETRIES = 3
 RETRY_WAIT = 60
 
+# Limiteur global (requetes/s) : demarrage, bornes, rafale, pas AIMD
+RATE_INITIAL = 1.0
+RATE_MIN = 0.05
+RATE_MAX = 5.0
+RATE_BURST = 5
+RATE_INCREASE = 0.1
+RATE_DECREASE = 0.5
+RATE_COOLDOWN_MAX = 600
+
 
 def _is_auth_error(error_msg):
     msg = str(error_msg).lower()
@@ -221,719 +1665,1743 @@ def _is_private_error(error_msg):
     return any(e.lower() in msg for e in PRIVATE_ERRORS)
 
 
-def download_one_item(url, index, total, output_dir, cookie_opts, quality_fmt,
-                      is_audio, audio_fmt, fragments, sub_opts, playlist_range, log_func,
-                      registry=None, folder_override=None, stop_event=None):
-    """Telecharge un item (video, playlist, ou chaine). Retourne True si OK."""
-    tag = f"[{index}/{total}]"
+class RateLimiter:
+    """Token bucket AIMD partage par tous les workers pour les requetes
+    d'extraction et les debuts de telechargement. Une erreur d'auth ou un 429
+    divise le debit et met tout le monde en pause ; chaque succes le fait
+    remonter d'un pas."""
+
+    def __init__(self, rate=RATE_INITIAL, min_rate=RATE_MIN, max_rate=RATE_MAX, burst=RATE_BURST):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._cooldown = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self, stop_event=None):
+        """Bloque jusqu'a obtenir un jeton. Retourne False si stop_event est leve."""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    METRICS.inc("limiter_tokens_total")
+                    if now > start:
+                        METRICS.observe("limiter_wait", now - start)
+                    return True
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            if stop_event:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def penalize(self):
+        """Erreur de rate-limit : debit reduit et pause globale (doublee a chaque
+        erreur, remise a zero par les succes). Les erreurs arrivant pendant
+        une pause deja en cours ne comptent qu'une fois. Retourne la pause."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+            self._cooldown = min(self._cooldown * 2 or RETRY_WAIT, RATE_COOLDOWN_MAX)
+            self._tokens = 0.0
+            self._paused_until = now + self._cooldown
+            METRICS.inc("rate_limit_pauses_total")
+            METRICS.set_gauge("limiter_rate", self.rate)
+            return self._cooldown
+
+    def reward(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+            if time.monotonic() >= self._paused_until:
+                self._cooldown = 0
+            METRICS.set_gauge("limiter_rate", self.rate)
+
+    def wait_ready(self, stop_event=None):
+        """Attend la fin d'une pause globale. Retourne False si stop_event est leve."""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                METRICS.observe("cooldown", time.monotonic() - start)
+                return True
+            if stop_event:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def describe(self):
+        with self._lock:
+            pause = max(0.0, self._paused_until - time.monotonic())
+        text = f"{self.rate:.2f} req/s"
+        return f"{text}, en pause {pause:.0f}s" if pause else text
+
+
+RATE_LIMITER = RateLimiter()
+
+
+def _is_media_url(url):
+    """Requetes de flux (googlevideo) : non limitees, seul le debut du
+    telechargement de chaque video prend un jeton."""
+    return urlparse(url).netloc.endswith("googlevideo.com")
+
+
+class _LimiterLogger:
+    """Logger yt-dlp : la sortie console est ignoree, les erreurs remontent au
+    log et celles de rate-limit penalisent le limiteur."""
+
+    def __init__(self, limiter, tag="", log_func=None):
+        self.limiter = limiter
+        self.tag = tag
+        self.log_func = log_func
+        self.errors = 0
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        if "Retrying" in msg:
+            METRICS.inc("retries_total", kind="download")
+
+    def error(self, msg):
+        self.errors += 1
+        METRICS.inc("errors_total", kind="auth" if _is_auth_error(msg) else "other")
+        if _is_auth_error(msg):
+            self.limiter.penalize()
+        if self.log_func:
+            self.log_func(f"  {self.tag} {msg}")
+
+
+class _LimitedMixin:
+    """YoutubeDL dont les requetes d'extraction et les debuts de telechargement
+    passent par le limiteur global. Combine a yt_dlp.YoutubeDL par
+    _limited_ydl_class() (LimitedYoutubeDL) au premier usage."""
+
+    def __init__(self, params=None, auto_init=True, limiter=None, stop_event=None,
+                 stage=None, tag="", on_state=None):
+        self.limiter = limiter or RATE_LIMITER
+        self.stop_event = stop_event
+        # on_state(etat, info) : "downloading" (format choisi) puis "postprocessing"
+        self.on_state = on_state
+        # Etage de post-traitement (None = post-traitement dans ce thread)
+        self.stage = stage
+        self.tag = tag
+        self.postprocessing = []
+        self._deferred_archive = set()
+        self._muxed_selectors = {}
+        params = dict(params or {})
+        params.setdefault("match_filter", self._match_filter)
+        super().__init__(params, auto_init)
+        add_scratch_move(self)
+
+    def reuse(self, job, limiter=None, stop_event=None, stage=None, tag="", on_state=None):
+        """Prepare la session pour une nouvelle tache (voir YdlPool)."""
+        self.limiter = limiter or RATE_LIMITER
+        self.stop_event = stop_event
+        self.on_state = on_state
+        self.stage = stage
+        self.tag = tag
+        self.postprocessing = []
+        self._deferred_archive = set()
+        self._download_retcode = 0
+        for k in YDL_JOB_PARAMS:
+            if k in job:
+                self.params[k] = job[k]
+            else:
+                self.params.pop(k, None)
+        self._progress_hooks = list(job.get("progress_hooks") or [])
+        fmt = self.params.get("format")
+        self.format_selector = fmt if fmt in (None, "-") or callable(fmt) \
+            else self.build_format_selector(fmt)
+
+    def _select_formats(self, formats, selector):
+        # prefer_muxed (selecteur de muxed_format) : un flux deja combine
+        # remplace video + audio s'il est au moins aussi haut, sans fusion
+        chosen = super()._select_formats(formats, selector)
+        muxed_spec = self.params.get("prefer_muxed")
+        if not (muxed_spec and chosen and chosen[0].get("requested_formats")):
+            return chosen
+        if muxed_spec not in self._muxed_selectors:
+            self._muxed_selectors[muxed_spec] = self.build_format_selector(muxed_spec)
+        muxed = super()._select_formats(formats, self._muxed_selectors[muxed_spec])
+        if muxed and (muxed[0].get("height") or 0) >= (chosen[0].get("height") or 0):
+            METRICS.inc("formats_total", kind="muxed")
+            return muxed
+        METRICS.inc("formats_total", kind="merged")
+        return chosen
+
+    def add_info_extractor(self, ie):
+        super().add_info_extractor(ie)
+        if not isinstance(ie, type):
+            PLAYER_CACHE.attach(ie, self.cache)
+
+    def add_default_info_extractors(self):
+        if self.params.get("allowed_extractors"):
+            return super().add_default_info_extractors()
+        # Classes seules, comme yt-dlp : instanciees a la premiere URL reconnue
+        self._ies.update(default_extractors())
+
+    def _match_filter(self, info_dict, incomplete=False):
+        # Appele juste avant chaque telechargement (info complete)
+        if incomplete:
+            return None
+        if not self.limiter.acquire(self.stop_event):
+            return "Arrete par l'utilisateur"
+        if self.on_state:
+            self.on_state("downloading", info_dict)
+        return None
+
+    def urlopen(self, req):
+        url = req if isinstance(req, str) else getattr(req, "url", "")
+        if not _is_media_url(url) and not self.limiter.acquire(self.stop_event):
+            # Arret : l'extraction en cours s'interrompt a sa prochaine requete
+            raise _yt_dlp().utils.DownloadCancelled("Arrete par l'utilisateur")
+        try:
+            return super().urlopen(req)
+        except Exception as e:
+            if getattr(e, "status", None) == 429:
+                METRICS.inc("http_429_total")
+                self.limiter.penalize()
+            raise
+
+    def post_process(self, filename, info, files_to_move=None):
+        # Fusion / extraction audio / corrections confiees a l'etage de
+        # post-traitement ; le worker repart aussitot sur le reseau
+        if self.on_state:
+            self.on_state("postprocessing", info)
+        pp_names = [type(pp).__name__ for pp in info.get("__postprocessors") or []]
+        # Le seul deplacement hors du dossier de travail (video deja combinee)
+        # se fait ici : pas de processus pour une copie
+        converts = any(not isinstance(pp, _ScratchMoveMixin) for pp in self._pps["post_process"])
+        if not self.stage or not (pp_names or converts):
+            return super().post_process(filename, info, files_to_move)
+        job = dict(info)
+        job.pop("__postprocessors", None)
+        params = {k: self.params[k] for k in POSTPROCESS_PARAMS if k in self.params}
+        try:
+            pickle.dumps((params, job, files_to_move))
+        except Exception:
+            return super().post_process(filename, info, files_to_move)
+
+        # L'archive n'est ecrite qu'une fois le fichier final produit
+        archive_id = self._make_archive_id(info)
+        if archive_id:
+            self._deferred_archive.add(archive_id)
+        archive = self.archive
+
+        def on_done(ok):
+            if ok and archive_id and archive is not None:
+                archive.add(archive_id)
+
+        self.postprocessing.append(self.stage.submit(
+            self.tag, params, filename, job, files_to_move or {}, pp_names, on_done))
+        info["filepath"] = filename
+        return info
+
+    def record_download_archive(self, info_dict):
+        if self._make_archive_id(info_dict) in self._deferred_archive:
+            return
+        super().record_download_archive(info_dict)
 
-    if stop_event and stop_event.is_set():
-        log_func(f"  {tag} Arrete par l'utilisateur.")
-        return False
 
-    log_func(f"\n{'='*50}")
-    log_func(f"  {tag} {url}")
-    log_func(f"{'='*50}\n")
+def _limited_ydl_class():
+    """Classe LimitedYoutubeDL, construite (et yt-dlp importe) une seule fois."""
+    global _ydl_class
+    with _load_lock:
+        if _ydl_class is None:
+            _ydl_class = type("LimitedYoutubeDL", (_LimitedMixin, _yt_dlp().YoutubeDL),
+                              {"__module__": __name__})
+        return _ydl_class
+
+
+def limited_ydl(params=None, **kwargs):
+    """Nouveau LimitedYoutubeDL (memes arguments que son constructeur)."""
+    return _limited_ydl_class()(params, **kwargs)
+
+
+# Options propres a chaque tache, appliquees a chaque emprunt d'une session ;
+# toutes les autres forment la cle de la session
+YDL_JOB_PARAMS = ("logger", "progress_hooks", "playlist_items", "format", "ratelimit",
+                  "external_downloader_args")
+
+
+class YdlPool:
+    """Sessions LimitedYoutubeDL reutilisees d'une tache a l'autre, par jeu
+    d'options : extracteurs deja instancies, connexions HTTP gardees ouvertes
+    et cookies (fichier ou navigateur, dechiffres une seule fois) partages
+    par toutes les sessions. Une session n'est pretee qu'a un thread a la
+    fois ; il y en a au plus autant par jeu d'options que de threads qui
+    s'en servent en meme temps."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(list)  # cle -> sessions libres
+        self._cookie_jars = {}  # (cookiefile, cookiesfrombrowser) -> jar partage
+        self._cookie_lock = threading.Lock()
+        self._generation = 0
+
+    @contextlib.contextmanager
+    def session(self, params=None, **kwargs):
+        """Prete une session configuree pour `params` (memes arguments que
+        limited_ydl). Une session sortie sur une exception est fermee."""
+        params = dict(params or {})
+        job = {k: params.pop(k) for k in YDL_JOB_PARAMS if k in params}
+        key = repr(sorted(params.items()))
+        with self._lock:
+            idle = self._idle[key]
+            ydl = idle.pop() if idle else None
+            generation = self._generation
+        if ydl is None:
+            ydl = self._create(params, job, kwargs)
+            METRICS.inc("ydl_sessions_total", result="created")
+        else:
+            ydl.reuse(job, **kwargs)
+            METRICS.inc("ydl_sessions_total", result="reused")
+        try:
+            yield ydl
+        except BaseException:
+            ydl.close()
+            raise
+        with self._lock:
+            if generation == self._generation:
+                self._idle[key].append(ydl)
+                return
+        ydl.close()
+
+    def _create(self, params, job, kwargs):
+        ydl = limited_ydl(dict(params, **job), **kwargs)
+        cookies = (params.get("cookiefile"), repr(params.get("cookiesfrombrowser")))
+        with self._cookie_lock:
+            if cookies in self._cookie_jars:
+                # cached_property de yt-dlp : remplace avant la premiere requete
+                ydl.__dict__["cookiejar"] = self._cookie_jars[cookies]
+            else:
+                self._cookie_jars[cookies] = ydl.cookiejar
+        return ydl
+
+    def close_idle(self):
+        """Ferme les sessions libres (et les cookies partages sont oublies) ;
+        celles pretees en ce moment seront fermees a leur retour."""
+        with self._lock:
+            sessions = [ydl for idle in self._idle.values() for ydl in idle]
+            self._idle.clear()
+            self._generation += 1
+        with self._cookie_lock:
+            self._cookie_jars.clear()
+        if sessions:
+            PLAYER_CACHE.save(sessions[0].cache)
+        for ydl in sessions:
+            ydl.close()
+
+
+YDL_POOL = YdlPool()
+
+
+# Resultats des defis du lecteur YouTube gardes d'un lancement a l'autre
+# (signatureTimestamp et defis n), dans le cache disque de yt-dlp
+PLAYER_CACHE_SECTION = "ytpd-player"
+PLAYER_CACHE_PERSISTED = ("youtube-sts", "youtube-n")
+PLAYER_CACHE_MAX = 5000
+# Versions du lecteur gardees en memoire (code JS et resultats)
+PLAYER_CACHE_VERSIONS = 3
+
+
+class _PlayerDict(dict):
+    """dict rempli par les extracteurs yt-dlp : chaque acces signale la
+    version du lecteur concernee a PlayerCache, pour l'eviction."""
+
+    def __init__(self, on_access, version_of):
+        super().__init__()
+        self._on_access = on_access
+        self._version_of = version_of
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self._on_access(self._version_of(key))
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._on_access(self._version_of(key), key)
+
+
+class PlayerCache:
+    """Caches du lecteur YouTube communs a toutes les sessions et tous les
+    threads. yt-dlp en garde un par instance d'extracteur : chaque session
+    retelechargeait le code JS du lecteur et resolvait a nouveau ses defis.
+    Les cles commencent par la version du lecteur : seules les max_versions
+    dernieres utilisees restent en memoire (LRU), un lecteur plus ancien
+    emporte son code et ses resultats. yt-dlp garde deja sur disque le
+    lecteur pretraite et les fonctions de signature."""
+
+    def __init__(self, max_versions=PLAYER_CACHE_VERSIONS):
+        self.max_versions = max_versions
+        self.code = _PlayerDict(self._access, lambda key: key)  # version -> code JS
+        # (nom, version du lecteur, cles...) -> resultat
+        self.data = _PlayerDict(self._access, lambda key: key[1])
+        self._versions = collections.OrderedDict()  # version -> ses cles (code et data)
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._lru_lock = threading.Lock()
+
+    def _access(self, version, key=None):
+        """Version utilisee (et cle ajoutee) : les plus anciennes sont oubliees."""
+        with self._lru_lock:
+            keys = self._versions.get(version)
+            if keys is None:
+                keys = self._versions[version] = set()
+            else:
+                self._versions.move_to_end(version)
+            if key is not None:
+                keys.add(key)
+            while len(self._versions) > self.max_versions:
+                _, old_keys = self._versions.popitem(last=False)
+                for old in old_keys:
+                    self.code.pop(old, None)
+                    self.data.pop(old, None)
+
+    def attach(self, ie, cache):
+        """Branche les caches sur une instance d'extracteur qui en a."""
+        if not (isinstance(getattr(ie, "_code_cache", None), dict)
+                and isinstance(getattr(ie, "_player_cache", None), dict)):
+            return
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                entries = cache.load(PLAYER_CACHE_SECTION, "results") or []
+                for *key, value in entries:
+                    if tuple(key) not in self.data:
+                        self.data[tuple(key)] = value
+        ie._code_cache = self.code
+        ie._player_cache = self.data
+
+    def save(self, cache):
+        """Ecrit les resultats les plus recents dans le cache de yt-dlp."""
+        with self._lock:
+            if not self._loaded:
+                return
+            # Copie d'un bloc : les autres threads peuvent continuer d'ecrire
+            data = dict(self.data)
+        entries = [[*key, value] for key, value in data.items()
+                   if key[0] in PLAYER_CACHE_PERSISTED]
+        cache.store(PLAYER_CACHE_SECTION, "results", entries[-PLAYER_CACHE_MAX:])
+
+
+PLAYER_CACHE = PlayerCache()
+
+
+# Post-traitement FFmpeg (fusion, extraction audio, corrections) dans un pool
+# de processus : un processus par CPU, file bornee a POSTPROCESS_QUEUE
+# fichiers en attente par processus
+POSTPROCESS_WORKERS = os.cpu_count() or 2
+POSTPROCESS_QUEUE = 2
+
+# Options transmises au processus de post-traitement (les autres ne sont pas
+# serialisables ou ne concernent que le telechargement)
+POSTPROCESS_PARAMS = ("postprocessors", "merge_output_format", "ffmpeg_location", "keepvideo",
+                      "outtmpl", "paths", "final_ext", "fixup", "subtitlesformat")
+
 
-    # Recuperer les infos avec retry sur erreurs d'auth
-    info = None
+def _run_postprocess(params, filename, info, files_to_move, pp_names):
+    """Execute dans un processus du pool : rejoue post_process de yt-dlp."""
+    yt_dlp = _yt_dlp()
+    ydl = yt_dlp.YoutubeDL(dict(params, quiet=True, no_warnings=True, noprogress=True))
+    add_scratch_move(ydl)
+    info["__postprocessors"] = [getattr(yt_dlp.postprocessor, name)(ydl) for name in pp_names]
+    info = ydl.post_process(filename, info, files_to_move)
+    return info.get("filepath")
+
+
+def _when_all(futures, callback):
+    """Appelle callback(ok) quand toutes les futures sont terminees."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        callback(all(not f.exception() for f in futures))
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+class PostProcessStage:
+    """Etage de post-traitement : les workers de telechargement y deposent
+    leurs fichiers et repartent sur le reseau pendant que les CPU travaillent.
+    La file est bornee : un telechargement attend si le CPU est en retard."""
+
+    def __init__(self, log_func, workers=POSTPROCESS_WORKERS):
+        self.log_func = log_func
+        # spawn : pas de fork d'un processus qui a deja des threads (GUI, workers)
+        self._pool = ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(workers * POSTPROCESS_QUEUE)
+        self._lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+
+    def submit(self, tag, params, filename, info, files_to_move, pp_names, on_done):
+        """on_done(ok) est appele a la fin du post-traitement."""
+        with METRICS.span("postprocess_wait", tag=tag):
+            self._slots.acquire()
+        try:
+            future = self._pool.submit(_run_postprocess, params, filename, info,
+                                       files_to_move, pp_names)
+        except Exception:
+            self._slots.release()
+            raise
+        METRICS.gauge("queue_depth", 1, queue="postprocess")
+        submitted = time.monotonic()
+        future.add_done_callback(lambda f: self._finished(f, tag, on_done, submitted, info))
+        return future
+
+    def _finished(self, future, tag, on_done, submitted, info):
+        self._slots.release()
+        METRICS.gauge("queue_depth", -1, queue="postprocess")
+        METRICS.observe("postprocess", time.monotonic() - submitted, tag=tag, id=info.get("id"))
+        error = future.exception()
+        with self._lock:
+            if error:
+                self.failed += 1
+            else:
+                self.done += 1
+        if error:
+            self.log_func(f"  {tag} ERREUR post-traitement : {error}")
+        else:
+            self.log_func(f"  {tag} Post-traitement termine.", key=tag)
+        on_done(not error)
+
+    def shutdown(self):
+        """Attend la fin des post-traitements en cours."""
+        self._pool.shutdown(wait=True)
+
+
+def _is_playlist_info(info):
+    return info.get("_type") in ("playlist", "multi_video") or "entries" in info
+
+
+def probe_item(url, tag, cookie_opts, log_func, stop_event=None, limiter=None):
+    """Sonde legere avec retry sur erreurs d'auth : titre, type et liste plate
+    des entrees, sans resoudre chaque video. Retourne None en cas d'echec."""
+    limiter = limiter or RATE_LIMITER
     for attempt in range(1, MAX_RETRIES + 1):
         if stop_event and stop_event.is_set():
             log_func(f"  {tag} Arrete par l'utilisateur.")
-            return False
+            return None
         log_func(f"  {tag} Recuperation des infos...")
         info_opts = base_opts()
-        info_opts["quiet"] = True
+        info_opts.update({"quiet": True, "extract_flat": "in_playlist"})
         info_opts.update(cookie_opts)
 
-        with yt_dlp.YoutubeDL(info_opts) as ydl:
+        with YDL_POOL.session(info_opts, limiter=limiter, stop_event=stop_event) as ydl:
             try:
-                info = ydl.extract_info(url, download=False)
-                break
+                with METRICS.span("extract", tag=tag, url=url):
+                    info = ydl.extract_info(url, download=False)
+                limiter.reward()
+                return info
             except Exception as e:
                 error_msg = str(e)
                 if _is_private_error(error_msg):
                     log_func(f"  {tag} Video privee — ignoree.")
-                    return False
+                    return None
                 if _is_auth_error(error_msg) and attempt < MAX_RETRIES:
-                    wait = RETRY_WAIT * attempt
-                    log_func(f"  {tag} Rate-limit detecte ! Pause de {wait}s avant retry ({attempt}/{MAX_RETRIES})...")
-                    # Attente interruptible
-                    for _ in range(wait):
-                        if stop_event and stop_event.is_set():
-                            log_func(f"  {tag} Arrete par l'utilisateur.")
-                            return False
-                        time.sleep(1)
+                    METRICS.inc("retries_total", kind="extract")
+                    wait = limiter.penalize()
+                    log_func(f"  {tag} Rate-limit detecte ! Pause globale de {wait:.0f}s, "
+                             f"limiteur a {limiter.describe()} ({attempt}/{MAX_RETRIES})...")
+                    # Attente interruptible, commune a tous les workers
+                    if not limiter.wait_ready(stop_event):
+                        log_func(f"  {tag} Arrete par l'utilisateur.")
+                        return None
                     continue
                 log_func(f"  {tag} ERREUR : {e}")
-                return False
+                return None
+    return None
+
+
+SYNC_KNOWN_STREAK = 5
+
+
+def sync_playlist(url, record, tag, cookie_opts, log_func, stop_event=None, limiter=None):
+    """Enumere a plat une playlist deja connue : les nouvelles entrees sont
+    cherchees en tete (jusqu'aux entrees connues) et, si la liste a grandi,
+    apres la derniere position vue. Retourne (info, [(index, entree), ...]) avec
+    uniquement les nouvelles entrees, ou None en cas d'echec."""
+    known = set(record.get("ids") or [])
+    log_func(f"  {tag} Synchro incrementale ({len(known)} video(s) connue(s))...")
+    opts = base_opts()
+    opts.update({"quiet": True, "extract_flat": "in_playlist"})
+    opts.update(cookie_opts)
+
+    new = []
+    with YDL_POOL.session(opts, limiter=limiter, stop_event=stop_event) as ydl, \
+            METRICS.span("extract", tag=tag, url=url):
+        try:
+            # process=False : les pages de la playlist sont chargees a la demande
+            info = ydl.extract_info(url, download=False, process=False)
+            while info and info.get("_type") in ("url", "url_transparent"):
+                info = ydl.extract_info(info["url"], download=False, process=False,
+                                        ie_key=info.get("ie_key"))
+            if not info or "entries" not in info:
+                log_func(f"  {tag} ERREUR : aucune info trouvee.")
+                return None
+
+            # Tete de liste : les flux (chaines, onglets) ajoutent en haut, on
+            # s'arrete apres une serie d'entrees deja connues. Le nombre total
+            # ne sert que de borne : des videos supprimees ou privees le
+            # faussent par rapport aux ids enregistres.
+            count = info.get("playlist_count")
+            entries = info["entries"]
+            if not isinstance(entries, (list, _yt_dlp().utils.LazyList)):
+                # Pages gardees en memoire : la liste peut etre relue
+                entries = _yt_dlp().utils.LazyList(entries)
+            found = {}
+
+            def scan(start, end, streak_stop=False):
+                # Parcourt les positions [start, end] ; retourne la derniere
+                # position lue, ou None si l'utilisateur arrete
+                streak, last = 0, start - 1
+                for index, entry in enumerate(itertools.islice(entries, start - 1, end), start):
+                    if stop_event and stop_event.is_set():
+                        return None
+                    last = index
+                    if not entry:
+                        continue
+                    if entry.get("id") in known:
+                        streak += 1
+                        if streak_stop and streak >= SYNC_KNOWN_STREAK:
+                            break
+                    else:
+                        streak = 0
+                        found[index] = entry
+                return last
+
+            head = scan(1, count, streak_stop=True)
+            # Liste plus longue que les ids connus : des videos ont ete
+            # ajoutees en fin de liste. Reprise apres la derniere position
+            # vue, en relisant celle-ci : si elle n'est plus connue, des
+            # suppressions ont decale la liste et tout le milieu est relu.
+            if head is not None and count is not None and count > len(known) and head < count:
+                resume = min(max(record.get("last_index") or len(known), head + 1), count)
+                boundary = next(itertools.islice(entries, resume - 1, resume), None)
+                tail = scan(resume, count)
+                shifted = not boundary or boundary.get("id") not in known
+                if tail is not None and (shifted or len(found) < count - len(known)):
+                    tail = scan(head + 1, resume - 1)
+                head = tail
+            if head is None:
+                log_func(f"  {tag} Arrete par l'utilisateur.")
+                return None
+            new = sorted(found.items(), key=lambda item: item[0])
+        except Exception as e:
+            log_func(f"  {tag} ERREUR : {e}")
+            return None
+
+    return dict(info, entries=[]), new
+
+
+def _indexed_playlist_info(info, indexed_entries):
+    """Copie d'une info de playlist restreinte a certaines entrees, qui gardent
+    leur position d'origine (pour %(playlist_index)s). A utiliser avec
+    l'option playlist_items correspondante."""
+    return dict(info,
+                entries=[e for _, e in indexed_entries],
+                requested_entries=[i for i, _ in indexed_entries])
+
+
+def _indexed_entries(info):
+    """[(position dans la playlist, entree), ...] d'une info de playlist plate."""
+    entries = info.get("entries") or []
+    indices = info.get("requested_entries") or range(1, len(entries) + 1)
+    return [(i, e) for i, e in zip(indices, entries) if e]
+
+
+def _archive_id(info):
+    """Identifiant au format de l'archive yt-dlp ("youtube <id>")."""
+    extractor = info.get("extractor_key") or info.get("ie_key")
+    if not extractor or not info.get("id"):
+        return None
+    return f"{extractor.lower()} {info['id']}"
+
+
+def _share_key(entry):
+    """Cle commune a une meme video vue dans plusieurs liens du lot."""
+    return _archive_id(entry) or entry.get("id")
+
+
+class ItemPlan:
+    """Un item (video, playlist ou chaine) developpe en taches par video a
+    partir d'une seule sonde plate."""
+
+    def __init__(self, url, tag, title, folder, info, opts, jobs, is_playlist,
+                 out_path=None, store=None):
+        self.url = url
+        self.tag = tag
+        self.title = title
+        self.folder = folder
+        self.info = info
+        self.opts = opts
+        self.jobs = jobs  # [(position ou None pour une video seule, entree)]
+        self.is_playlist = is_playlist
+        self.out_path = out_path
+        self.store = store
+        self.entry_ids = None
+        self.last_index = None
+        self.remaining = len(jobs)
+        self.failed = 0
+        self.shared = 0  # videos confiees a un autre item du lot
+        self.shared_failed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def link(self, index, entry):
+        """Lie une video du store dans le dossier de l'item, sous le nom que lui
+        donnait l'ancien outtmpl. Retourne le nombre de fichiers lies."""
+        title = _yt_dlp().utils.sanitize_filename(entry.get("title") or entry.get("id") or "video")
+        name = title if index is None else f"{index:03d} - {title}"
+        return self.store.link(entry.get("id"), os.path.join(self.out_path, name))
+
+    def job_tag(self, index):
+        """Etiquette d'une tache video de l'item dans les journaux."""
+        return self.tag if index is None else f"{self.tag} #{index}"
+
+    def retain(self, jobs, shared=0):
+        """Restreint les taches de l'item (avant leur lancement) ; `shared`
+        videos sont attendues d'un autre item du lot."""
+        self.jobs = jobs
+        self.shared = shared
+        self.remaining = len(jobs) + shared
+
+    def job_done(self, ok, shared=False):
+        """Retourne True quand la derniere video de l'item vient de se terminer
+        (y compris celles telechargees par un autre item)."""
+        with self._lock:
+            self.remaining -= 1
+            if not ok:
+                self.failed += 1
+                self.shared_failed += shared
+            return self.remaining == 0
+
+
+def plan_item(url, index, total, output_dir, cookie_opts, quality_fmt,
+              is_audio, audio_fmt, fragments, sub_opts, playlist_range, log_func,
+              registry=None, folder_override=None, stop_event=None, cache=None,
+              incremental=False, limiter=None, journal=None, prefer_muxed=False,
+              scratch_dir=None):
+    """Sonde un item et le developpe en taches par video. Retourne un ItemPlan
+    (eventuellement sans tache s'il est deja a jour) ou None en cas d'echec.
+    journal : JobJournal ; la sonde d'un item inacheve y est reprise.
+    prefer_muxed : flux deja combine plutot que video + audio a fusionner,
+    a hauteur egale. scratch_dir : dossier de travail (disque rapide) des
+    fichiers intermediaires."""
+    started = time.monotonic()
+    tag = f"[{index}/{total}]"
+    limiter = limiter or RATE_LIMITER
+
+    if stop_event and stop_event.is_set():
+        log_func(f"  {tag} Arrete par l'utilisateur.")
+        return None
+
+    log_func(f"\n{'='*50}")
+    log_func(f"  {tag} {url}")
+    log_func(f"{'='*50}\n")
+
+    # Archive globale dans le dossier de destination (partagee entre tous les modes)
+    archive = get_download_archive(output_dir)
+    vid = None if extract_playlist_id(url) else extract_video_id(url)
+    if vid and f"youtube {vid}" in archive:
+        log_func(f"  {tag} Video deja telechargee — ignoree.")
+        return ItemPlan(url, tag, url, None, None, None, [], False)
+
+    key = registry_key(url)
+    record = registry.get(key) if registry is not None and key else None
+    delta = None
+    saved = journal.saved_probe(url) if journal else None
+
+    if saved:
+        # Reprise apres interruption : pas de nouvelle extraction
+        info = saved["info"]
+        if saved.get("delta") is not None:
+            delta = [(i, e) for i, e in saved["delta"]]
+            folder_override = folder_override or registry_folder(record)
+        log_func(f"  {tag} Reprise : infos lues depuis le journal.")
+    elif incremental and isinstance(record, dict) and "ids" in record:
+        # Playlist deja connue : seulement les nouvelles entrees
+        if journal:
+            journal.item(url, "extracting")
+        synced = sync_playlist(url, record, tag, cookie_opts, log_func, stop_event, limiter)
+        if synced is None:
+            return None
+        info, delta = synced
+        folder_override = folder_override or record["folder"]
+    else:
+        # Sonde legere (ou cache) : le resultat est reutilise tel quel pour le
+        # telechargement, chaque video n'est resolue qu'une fois.
+        key = metadata_cache_key(url)
+        info = cache.get(key) if cache else None
+        if info:
+            log_func(f"  {tag} Infos lues depuis le cache.")
+        else:
+            if journal:
+                journal.item(url, "extracting")
+            info = probe_item(url, tag, cookie_opts, log_func, stop_event, limiter)
+            if info and cache and _is_playlist_info(info):
+                cache.put(key, info)
 
     if not info:
         log_func(f"  {tag} ERREUR : aucune info trouvee.")
-        return False
+        return None
+    # Seules les listes plates sont journalisees : les liens de flux d'une
+    # video seule expirent
+    if journal and not saved and _is_playlist_info(info):
+        journal.item(url, "planned", probe={"info": info, "delta": delta})
 
     # Determiner le nom et le template de sortie
-    is_playlist = "entries" in info
+    is_playlist = _is_playlist_info(info)
     title = info.get("title") or info.get("playlist_title") or "download"
     folder = clean_folder_name(folder_override or title)
 
     if is_playlist:
-        video_count = sum(1 for e in info.get("entries", []) if e)
         log_func(f"  {tag} Playlist : {title}")
-        log_func(f"  {tag} Videos   : {video_count}")
+        if delta is not None:
+            entries = delta
+            log_func(f"  {tag} Nouvelles videos : {len(entries)}")
+        else:
+            entries = _indexed_entries(info)
+            log_func(f"  {tag} Videos   : {len(entries)}")
+        # Plage de videos appliquee aux positions d'origine
+        if playlist_range:
+            start, end = playlist_range
+            entries = [(i, e) for i, e in entries if i >= (start or 1) and (not end or i <= end)]
+            log_func(f"  {tag} Plage : videos {start or 1} a {end or 'fin'}")
+        jobs = [(i, e) for i, e in entries if _archive_id(e) not in archive]
+        archived = [(i, e) for i, e in entries if _archive_id(e) in archive]
         log_func(f"  {tag} Dossier  : {folder}/\n")
         out_path = f"{output_dir}/{folder}" if output_dir else folder
-        outtmpl = f"{out_path}/%(playlist_index)03d - %(title)s.%(ext)s"
     else:
         log_func(f"  {tag} Video : {title}\n")
+        jobs = [(None, info)]
+        archived = []
         out_path = output_dir if output_dir else "."
-        outtmpl = f"{out_path}/%(title)s.%(ext)s"
+    # Telechargement dans le store, puis lien sous le nom de l'item
+    store = ContentStore(output_dir)
 
-    # Archive globale dans le dossier de destination (partagee entre tous les modes)
-    global_archive = os.path.join(output_dir or ".", ".downloaded.txt")
-
-    # Construire les options
+    # Options communes aux videos de l'item (le rythme des requetes est donne
+    # par le limiteur global, les hooks sont ajoutes par video)
     opts = base_opts()
     opts.update({
         "format": quality_fmt,
-        "outtmpl": outtmpl,
         "ignoreerrors": True,
-        "progress_hooks": [make_progress_hook(tag, log_func)],
         "concurrent_fragment_downloads": fragments,
-        "sleep_interval": 3,
-        "max_sleep_interval": 5,
-        "sleep_interval_requests": 1,
         "sleep_interval_subtitles": 2,
-        "download_archive": global_archive,
+        "download_archive": archive,
     })
+    opts.update(store.ydl_opts(scratch_dir))
     opts.update(aria2c_opts())
 
-    # Plage de videos (playlist uniquement)
-    if is_playlist and playlist_range:
-        start, end = playlist_range
-        if start:
-            opts["playliststart"] = start
-        if end:
-            opts["playlistend"] = end
-        log_func(f"  {tag} Plage : videos {start or 1} a {end or 'fin'}")
-
     # Audio ou video
     if is_audio:
         opts["postprocessors"] = build_audio_postprocessor(audio_fmt)
     else:
         opts["merge_output_format"] = "mp4"
+        if prefer_muxed and muxed_format(quality_fmt):
+            opts["prefer_muxed"] = muxed_format(quality_fmt)
 
     # Sous-titres
     opts.update(sub_opts)
 
     opts.update(cookie_opts)
 
-    with yt_dlp.YoutubeDL(opts) as ydl:
+    plan = ItemPlan(url, tag, title, folder, dict(info, entries=[]) if is_playlist else None,
+                    opts, jobs, is_playlist, out_path, store)
+    plan.started = started
+
+    # Videos deja telechargees (ailleurs) : simples liens, pas de trou
+    if archived:
+        linked = len([1 for i, e in archived if plan.link(i, e)])
+        log_func(f"  {tag} Deja telechargees : {len(archived)} ({linked} liee(s) depuis le store)")
+
+    # IDs des entrees pour le registre
+    if delta is not None:
+        plan.entry_ids = record["ids"] + [e["id"] for _, e in delta if e.get("id")]
+        plan.last_index = max([record.get("last_index", 0)] + [i for i, _ in delta])
+    elif is_playlist:
+        plan.entry_ids = [e["id"] for e in info.get("entries") or [] if e and e.get("id")]
+        plan.last_index = max(info.get("requested_entries") or [len(plan.entry_ids)])
+    return plan
+
+
+def download_video_job(plan, index, entry, log_func, stop_event=None, limiter=None,
+                       bandwidth=None, stage=None, pending=None, journal=None, formats=None):
+    """Telecharge une video d'un item, sous son nom numerote d'origine pour une
+    playlist. Retourne True si OK.
+    stage : etage de post-traitement ; les futures des post-traitements
+    lances sont ajoutees a `pending`. journal : JobJournal des etats.
+    formats : MetadataCache ou le format choisi pour la video est garde, et
+    repris en priorite la fois suivante."""
+    limiter = limiter or RATE_LIMITER
+    tag = plan.job_tag(index)
+    if stop_event and stop_event.is_set():
+        return False
+    PROGRESS.stage(tag, "resolving", item=plan.tag, video_id=entry.get("id"))
+
+    logger = _LimiterLogger(limiter, tag, log_func)
+    opts = dict(plan.opts)
+    opts["logger"] = logger
+    opts["progress_hooks"] = [PROGRESS.hook(tag, plan.tag, entry.get("id"),
+                                            on_finished=limiter.reward)]
+    if bandwidth:
+        opts.update(bandwidth.job_opts())
+        opts["progress_hooks"].append(bandwidth.progress_hook)
+    # Video interrompue : meme format, pour reprendre ses .part ; sinon
+    # format deja choisi lors d'un lancement precedent
+    quality = opts["format"] + ("|muxed" if opts.get("prefer_muxed") else "")
+    saved_format = journal.saved_format(plan.url, entry.get("id")) if journal else None
+    if not saved_format and formats:
+        saved_format = formats.get_format(entry.get("id"), quality)
+    if saved_format:
+        opts["format"] = f"{saved_format}/{opts['format']}"
+
+    # Phases de la video : choix du format (jeton compris), telechargement
+    phase = ["resolve", time.monotonic()]
+
+    def end_phase(next_phase):
+        now = time.monotonic()
+        if phase[0]:
+            METRICS.observe(phase[0], now - phase[1], tag=tag, id=entry.get("id"))
+        phase[:] = [next_phase, now]
+
+    reservations = []
+
+    def admit(info):
+        # Place reservee avant le premier octet (morceaux + fichier final s'il
+        # y a fusion ou conversion), dans le dossier de travail s'il y en a un
+        size = estimate_size(info)
+        converted = len(info.get("requested_formats") or ()) > 1 or bool(opts.get("postprocessors"))
+        temp = (opts.get("paths") or {}).get("temp")
+        needs = collections.Counter({temp or plan.store.path: size * (2 if converted else 1)})
+        if temp:
+            needs[plan.store.path] += size
+        waited = time.monotonic()
+        reservation = DISK.reserve(needs, stop_event, on_wait=lambda: log_func(
+            f"  {tag} Espace disque insuffisant pour {size / 1e9:.2f} Go : attente..."))
+        METRICS.observe("disk_wait", time.monotonic() - waited, tag=tag, id=info.get("id"))
+        if reservation is None:
+            raise _yt_dlp().utils.DownloadError(
+                f"Espace disque insuffisant ({size / 1e9:.2f} Go necessaires)")
+        reservations.append(reservation)
+
+    def on_state(state, info):
+        if state == "downloading":
+            admit(info)
+        # Post-traitement dans ce thread s'il n'y a pas d'etage
+        end_phase("download" if state == "downloading" else None if stage else "postprocess")
+        PROGRESS.stage(tag, state)
+        if formats and state == "downloading" and info.get("format_id") != saved_format:
+            formats.put_format(info.get("id"), quality, info.get("format_id"))
+        if journal:
+            journal.video(plan.url, info.get("id"), state, info.get("format_id"))
+    if index is None:
+        info = entry
+    else:
+        info = _indexed_playlist_info(plan.info, [(index, entry)])
+        opts["playlist_items"] = str(index)
+
+    with YDL_POOL.session(opts, limiter=limiter, stop_event=stop_event, stage=stage, tag=tag,
+                          on_state=on_state) as ydl:
         try:
-            ydl.download([url])
+            ydl.process_ie_result(info, download=True)
         except Exception as e:
             log_func(f"  {tag} Erreur durant le telechargement : {e}")
-            log_func(f"  {tag} Telechargement partiel — on continue.")
+            return False
+        finally:
+            end_phase(None)
+            if pending is not None:
+                pending.extend(ydl.postprocessing)
+            # Reservations rendues une fois les fichiers finaux ecrits
+            for reservation in reservations:
+                if ydl.postprocessing:
+                    _when_all(list(ydl.postprocessing), lambda ok, r=reservation: DISK.release(r))
+                else:
+                    DISK.release(reservation)
+    return not logger.errors
+
+
+def complete_item(plan, output_dir, registry, log_func):
+    """Fin d'un item : enregistre la playlist comme telechargee."""
+    METRICS.observe("item", time.monotonic() - plan.started, tag=plan.tag, url=plan.url,
+                    videos=len(plan.jobs), failed=plan.failed)
+    if plan.shared_failed:
+        # Videos partagees manquantes : la playlist sera reprise au prochain lancement
+        log_func(f"  {plan.tag} {plan.shared_failed} video(s) partagee(s) en echec, "
+                 f"playlist non enregistree.")
+    elif plan.is_playlist and registry is not None:
+        mark_playlist_done(plan.url, plan.folder, output_dir, registry, plan.entry_ids, plan.last_index)
+    if plan.jobs or plan.shared:
+        failed = f" ({plan.failed} video(s) en echec)" if plan.failed else ""
+        log_func(f"\n  {plan.tag} '{plan.title}' OK !{failed}")
+    elif plan.is_playlist:
+        log_func(f"  {plan.tag} '{plan.title}' deja a jour.")
+
+
+# Orchestration asyncio : sondes simultanees (leur rythme reel est donne par
+# le limiteur) et taches video en attente au maximum (memoire bornee)
+PROBE_CONCURRENCY = 4
+VIDEO_BACKLOG = 1000
+
+
+class StopSignal(threading.Event):
+    """Evenement d'arret qui previent aussi ses abonnes, pour reveiller sans
+    attente les boucles asyncio et le daemon."""
 
-    # Enregistrer la playlist comme telechargee
-    if is_playlist and registry is not None:
-        mark_playlist_done(url, folder, output_dir, registry)
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.RLock()
+
+    def set(self):
+        super().set()
+        with self._callbacks_lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def subscribe(self, callback):
+        with self._callbacks_lock:
+            self._callbacks.append(callback)
+        if self.is_set():
+            callback()
+
+    def unsubscribe(self, callback):
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class VideoQueue:
+    """File asyncio des taches video, servie en tourniquet entre les items pour
+    qu'une grosse playlist n'accapare pas les workers. Bornee : les sondes
+    attendent tant que `backlog` taches sont deja en attente.
+    status(item) -> (etat, priorite) : les items de plus basse priorite sont
+    servis d'abord, ceux en pause sont sautes et ceux annules retires (leurs
+    taches passees a on_drop(item, taches))."""
+
+    def __init__(self, backlog=VIDEO_BACKLOG, status=None, on_drop=None):
+        import asyncio
+        self.backlog = backlog
+        self.status = status
+        self.on_drop = on_drop
+        self._items = collections.OrderedDict()  # item -> deque de taches
+        self._size = 0
+        self._closed = False
+        self._changed = asyncio.Condition()
+
+    def _next_item(self):
+        if not self.status:
+            return next(iter(self._items), None)
+        best = best_priority = None
+        for item in list(self._items):
+            state, priority = self.status(item)
+            if state == "cancelled":
+                tasks = self._items.pop(item)
+                self._size -= len(tasks)
+                METRICS.gauge("queue_depth", -len(tasks), queue="videos")
+                if self.on_drop:
+                    self.on_drop(item, list(tasks))
+            elif state != "paused" and (best is None or priority < best_priority):
+                best, best_priority = item, priority
+        return best
+
+    async def poke(self):
+        """Reevalue la file apres un changement d'etat ou de priorite."""
+        async with self._changed:
+            self._next_item()
+            self._changed.notify_all()
+
+    async def wait_room(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._size < self.backlog)
+
+    async def put(self, item, tasks):
+        async with self._changed:
+            self._items.setdefault(item, collections.deque()).extend(tasks)
+            self._size += len(tasks)
+            METRICS.gauge("queue_depth", len(tasks), queue="videos")
+            self._changed.notify_all()
+
+    async def close(self):
+        """Plus aucune tache ne sera ajoutee."""
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    async def get(self):
+        """Prochaine tache, ou None quand la file est fermee et vide."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._next_item() or (self._closed and not self._items))
+            item = self._next_item()
+            if item is None:
+                return None
+            tasks = self._items[item]
+            task = tasks.popleft()
+            # L'item repasse en fin de tourniquet
+            del self._items[item]
+            if tasks:
+                self._items[item] = tasks
+            self._size -= 1
+            METRICS.gauge("queue_depth", -1, queue="videos")
+            self._changed.notify_all()
+            return task
+
+
+async def _wait_stop(stop_event):
+    """Se termine quand stop_event est leve."""
+    import asyncio
+    subscribe = getattr(stop_event, "subscribe", None)
+    if subscribe is None:
+        # threading.Event simple : pas de notification possible
+        while not stop_event.is_set():
+            await asyncio.sleep(0.2)
+        return
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
 
-    log_func(f"\n  {tag} '{title}' OK !")
-    return True
+    def on_stop():
+        loop.call_soon_threadsafe(stopped.set)
+
+    subscribe(on_stop)
+    try:
+        await stopped.wait()
+    finally:
+        stop_event.unsubscribe(on_stop)
 
 
 def download_all(items, output_dir, cookie_mode, cookie_value, quality_fmt,
                  is_audio, audio_fmt, fragments, parallel, sub_opts, playlist_range,
-                 log_func, on_done, stop_event=None):
-    """items : liste de URLs (str) ou tuples (url, folder_override)."""
+                 log_func, on_done, stop_event=None, cache_ttl=CACHE_TTL, cache_refresh="stale",
+                 incremental=False, auto_tune=False, max_rate=None, prefer_muxed=False,
+                 scratch_dir=None):
+    """items : liste de URLs (str) ou tuples (url, folder_override[, options
+    de l'item]), ou tout autre iterable (ChannelScanner...) consomme au fil de
+    l'eau. Avec une JobQueue, les liens ajoutes pendant le lot sont pris en
+    compte et priorites, pauses, annulations et qualites s'appliquent aux
+    videos pas encore lancees.
+    Les items sont sondes puis developpes en taches par video ; une boucle
+    asyncio repartit sondes et videos sur des pools de threads bornes
+    (PROBE_CONCURRENCY sondes, `parallel` videos) et s'arrete des que
+    stop_event est leve (StopSignal pour un reveil immediat).
+    incremental : les playlists deja telechargees sont re-synchronisees
+    (nouvelles videos seulement) au lieu d'etre ignorees.
+    auto_tune : `parallel` et `fragments` deviennent des maximums ajustes selon
+    le debit mesure. max_rate : plafond global en octets/s (None = aucun).
+    prefer_muxed, scratch_dir : voir plan_item. Chaque video reserve sa place
+    sur le disque (DISK) avant d'etre telechargee.
+    Retourne (reussies, echouees, ignorees)."""
+    import asyncio
     cookie_opts = build_cookie_opts(cookie_mode, cookie_value)
 
-    # Normaliser : chaque item devient (url, folder_override)
-    normalized = []
-    for item in items:
-        if isinstance(item, tuple):
-            normalized.append(item)
-        else:
-            normalized.append((item, None))
-
     # Charger le registre et filtrer les playlists deja telechargees
     registry = load_registry(output_dir)
-    new_items = []
     skipped = 0
-    for url, folder_ov in normalized:
-        if is_playlist_done(url, output_dir, registry):
-            skipped += 1
-        else:
-            new_items.append((url, folder_ov))
-
-    if skipped:
-        log_func(f"  {skipped} playlist(s) deja telechargee(s) — ignoree(s)")
-
-    if not new_items:
-        log_func("  Rien a telecharger, tout est deja a jour !")
-        on_done()
-        return
 
-    total = len(new_items)
-    log_func(f"  {total} lien(s) a telecharger")
-    log_func(f"  {fragments} fragments simultanes par video")
-    log_func(f"  {parallel} telechargement(s) en parallele\n")
-
-    ok = 0
-    fail = 0
-    stopped = False
-
-    if parallel <= 1:
-        for i, (url, folder_ov) in enumerate(new_items, 1):
-            if stop_event and stop_event.is_set():
-                stopped = True
-                break
-            if i > 1:
-                log_func("  Pause anti rate-limit (5s)...")
-                for _ in range(5):
-                    if stop_event and stop_event.is_set():
-                        stopped = True
-                        break
-                    time.sleep(1)
-                if stopped:
-                    break
-            if download_one_item(url, i, total, output_dir, cookie_opts, quality_fmt,
-                                 is_audio, audio_fmt, fragments, sub_opts, playlist_range, log_func,
-                                 registry=registry, folder_override=folder_ov, stop_event=stop_event):
-                ok += 1
+    # File de liens modifiable pendant le lot (priorites, pause, annulation)
+    control = items if isinstance(items, JobQueue) else None
+
+    def pending(source):
+        # Normaliser : chaque item devient (url, folder_override, options)
+        nonlocal skipped
+        for item in source:
+            url, folder_ov, *item_opts = item if isinstance(item, tuple) else (item, None)
+            if not incremental and is_playlist_done(url, output_dir, registry):
+                skipped += 1
+                if control:
+                    control.item_finished(url)
             else:
-                fail += 1
+                yield url, folder_ov, (item_opts[0] if item_opts else {})
+
+    if isinstance(items, (list, tuple)):
+        new_items = list(pending(items))
+        if skipped:
+            log_func(f"  {skipped} playlist(s) deja telechargee(s) — ignoree(s)")
+
+        if not new_items:
+            log_func("  Rien a telecharger, tout est deja a jour !")
+            on_done()
+            return 0, 0, skipped
+        total = len(new_items)
+        log_func(f"  {total} lien(s) a telecharger")
     else:
-        with ThreadPoolExecutor(max_workers=parallel) as pool:
-            futures = {}
-            for i, (url, folder_ov) in enumerate(new_items, 1):
-                if stop_event and stop_event.is_set():
-                    break
-                f = pool.submit(download_one_item, url, i, total, output_dir, cookie_opts,
-                                quality_fmt, is_audio, audio_fmt, fragments, sub_opts, playlist_range, log_func,
-                                registry, folder_ov, stop_event)
-                futures[f] = url
+        # Items fournis au fil de l'eau : total inconnu
+        new_items = pending(items)
+        total = "?"
+        log_func("  Liens pris dans la file au fur et a mesure" if control
+                 else "  Liens telecharges au fil du scan")
+
+    cache = MetadataCache(output_dir, ttl=cache_ttl, refresh=cache_refresh)
+    journal = JobJournal(output_dir)
+    if auto_tune:
+        log_func(f"  Reglage automatique : jusqu'a {parallel} video(s) x {BW_CONN_MAX} connexions")
+    else:
+        log_func(f"  {fragments} fragments simultanes par video")
+        log_func(f"  {parallel} telechargement(s) en parallele")
+    if max_rate:
+        log_func(f"  Debit max : {max_rate * 8 / 1e6:.0f} Mbps")
+    log_func("")
+    bandwidth = None
+    if auto_tune or max_rate:
+        bandwidth = BandwidthController(parallel, fragments, auto_tune, max_rate, log_func)
+    stage = PostProcessStage(log_func)
+    metrics_start = METRICS.snapshot()
+
+    counts = {"ok": 0, "fail": 0, "videos": 0, "videos_failed": 0}
+    counts_lock = threading.Lock()
+
+    def count(key):
+        with counts_lock:
+            counts[key] += 1
+
+    def finish_video(plan, index, entry, ok):
+        PROGRESS.stage(plan.job_tag(index), "done" if ok else "failed",
+                       item=plan.tag, video_id=entry.get("id"))
+        PROGRESS.item_video(plan.tag, ok)
+        journal.video(plan.url, entry.get("id"), "done" if ok else "failed")
+        METRICS.inc("videos_total", result="ok" if ok else "failed")
+        if ok:
+            try:
+                plan.link(index, entry)
+            except OSError as e:
+                log_func(f"  {plan.tag} ERREUR lien : {e}")
+        count("videos" if ok else "videos_failed")
+        item_done(plan, ok)
+        settle(_share_key(entry), ok)
+
+    def item_done(plan, ok, shared=False):
+        if plan.job_done(ok, shared):
+            PROGRESS.item_done(plan.tag)
+            if control and control.state(plan.url) == "cancelled":
+                return
+            complete_item(plan, output_dir, registry, log_func)
+            journal.item(plan.url, "done")
+            METRICS.inc("items_total", result="ok")
+            count("ok")
+            if control:
+                control.item_finished(plan.url, ok=not plan.failed)
+
+    # Videos presentes dans plusieurs liens du lot : telechargees par le premier
+    # item (proprietaire), liees dans les autres une fois reussies
+    claimed = set()
+    settled = {}  # cle -> succes de la video du proprietaire
+    waiters = {}  # cle -> [(plan, index, entree)] en attente du proprietaire
+    shared_lock = threading.Lock()
+
+    def finish_shared(plan, index, entry, ok):
+        PROGRESS.item_video(plan.tag, ok)
+        if ok:
+            try:
+                plan.link(index, entry)
+            except OSError as e:
+                log_func(f"  {plan.tag} ERREUR lien : {e}")
+        item_done(plan, ok, shared=True)
 
-            for f in as_completed(futures):
-                if stop_event and stop_event.is_set():
-                    stopped = True
-                    break
+    def settle(key, ok):
+        if not key:
+            return
+        with shared_lock:
+            settled[key] = ok
+            pending = waiters.pop(key, [])
+        for plan, index, entry in pending:
+            finish_shared(plan, index, entry, ok)
+
+    def claim(plan):
+        # Une video presente dans plusieurs liens n'est telechargee qu'une fois
+        jobs, done = [], []
+        shared = 0
+        with shared_lock:
+            for index, entry in plan.jobs:
+                key = _share_key(entry)
+                if not key or key not in claimed:
+                    claimed.add(key)
+                    jobs.append((index, entry))
+                    continue
+                shared += 1
+                if key in settled:
+                    done.append((plan, index, entry, settled[key]))
+                else:
+                    waiters.setdefault(key, []).append((plan, index, entry))
+        if shared:
+            log_func(f"  {plan.tag} Partagees avec un autre lien : {shared}")
+            plan.retain(jobs, shared)
+        return done
+
+    def drop_videos(plan, tasks):
+        # Item annule : ses videos pas encore lancees sont retirees ; les items
+        # qui les attendaient les comptent en echec, les suivants les reprendront
+        log_func(f"  {plan.tag} Annule : {len(tasks)} video(s) retiree(s) de la file.")
+        PROGRESS.item_done(plan.tag)
+        for _plan, _index, entry in tasks:
+            key = _share_key(entry)
+            with shared_lock:
+                claimed.discard(key)
+                pending = waiters.pop(key, [])
+            for waiter in pending:
+                finish_shared(*waiter, False)
+
+    def run_video(plan, index, entry):
+        if bandwidth and not bandwidth.enter(stop_event):
+            return
+        if control:
+            control.apply_quality(plan)
+        pending = []
+        METRICS.gauge("active", 1, stage="download")
+        try:
+            ok = download_video_job(plan, index, entry, log_func, stop_event,
+                                    bandwidth=bandwidth, stage=stage, pending=pending,
+                                    journal=journal, formats=cache)
+        except Exception as e:
+            log_func(f"  {plan.tag} ERREUR : {e}")
+            ok = False
+        finally:
+            METRICS.gauge("active", -1, stage="download")
+            if bandwidth:
+                bandwidth.leave()
+        # La video n'est terminee qu'apres son post-traitement
+        if ok and pending:
+            _when_all(pending, lambda pp_ok: finish_video(plan, index, entry, pp_ok))
+        else:
+            finish_video(plan, index, entry, ok)
+
+    probe_pool = ThreadPoolExecutor(PROBE_CONCURRENCY)
+    video_pool = ThreadPoolExecutor(max(1, parallel))
+
+    async def orchestrate():
+        loop = asyncio.get_running_loop()
+        if control:
+            videos = VideoQueue(status=lambda plan: control.status(plan.url), on_drop=drop_videos)
+
+            def poke():
+                asyncio.run_coroutine_threadsafe(videos.poke(), loop)
+            control.listen(poke)
+        else:
+            videos = VideoQueue()
+            poke = None
+        numbered = enumerate(new_items, 1)
+        numbered_lock = threading.Lock()
+
+        def next_item():
+            # Les sondes se partagent l'iterateur (qui peut attendre un scan)
+            with numbered_lock:
+                return next(numbered, None)
+
+        async def prober():
+            while True:
+                await videos.wait_room()
+                item = await loop.run_in_executor(probe_pool, next_item)
+                if item is None:
+                    return
+                i, (url, folder_ov, item_opts) = item
+                METRICS.gauge("active", 1, stage="probe")
                 try:
-                    if f.result():
-                        ok += 1
-                    else:
-                        fail += 1
+                    plan = await loop.run_in_executor(probe_pool, functools.partial(
+                        plan_item, url, i, total, output_dir, cookie_opts,
+                        item_opts.get("quality_fmt", quality_fmt),
+                        item_opts.get("is_audio", is_audio), audio_fmt, fragments, sub_opts, playlist_range, log_func,
+                        registry, folder_ov, stop_event, cache, incremental, journal=journal,
+                        prefer_muxed=prefer_muxed, scratch_dir=scratch_dir))
                 except Exception as e:
                     log_func(f"  ERREUR : {e}")
-                    fail += 1
+                    plan = None
+                finally:
+                    METRICS.gauge("active", -1, stage="probe")
+                shared = claim(plan) if plan is not None else []
+                if plan is None:
+                    if not (stop_event and stop_event.is_set()):
+                        journal.item(url, "failed")
+                        if control:
+                            control.item_finished(url, ok=False)
+                    METRICS.inc("items_total", result="failed")
+                    count("fail")
+                elif plan.remaining:
+                    PROGRESS.item_queued(plan.tag, plan.url, plan.title, plan.remaining)
+                    for waiter in shared:
+                        finish_shared(*waiter)
+                    if plan.jobs:
+                        await videos.put(plan, [(plan, index, entry) for index, entry in plan.jobs])
+                else:
+                    complete_item(plan, output_dir, registry, log_func)
+                    journal.item(url, "done")
+                    METRICS.inc("items_total", result="ok")
+                    count("ok")
+                    if control:
+                        control.item_finished(url)
+
+        async def downloader():
+            while True:
+                task = await videos.get()
+                if task is None:
+                    return
+                await loop.run_in_executor(video_pool, run_video, *task)
+
+        async def probe_all():
+            await asyncio.gather(*(prober() for _ in range(PROBE_CONCURRENCY)))
+            await videos.close()
 
+        work = asyncio.gather(probe_all(), *(downloader() for _ in range(max(1, parallel))))
+        watch = asyncio.ensure_future(_wait_stop(stop_event)) if stop_event else None
+        try:
+            await asyncio.wait([f for f in (work, watch) if f], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Arret : plus rien n'est distribue, les appels yt-dlp en cours
+            # voient stop_event et se terminent d'eux-memes
+            for future in (work, watch):
+                if future:
+                    future.cancel()
+            await asyncio.gather(*(f for f in (work, watch) if f), return_exceptions=True)
+            if bandwidth:
+                bandwidth.wake()
+            if poke:
+                control.unlisten(poke)
+
+    try:
+        asyncio.run(orchestrate())
+    finally:
+        probe_pool.shutdown(wait=True, cancel_futures=True)
+        video_pool.shutdown(wait=True, cancel_futures=True)
+    stage.shutdown()
+    YDL_POOL.close_idle()
+    # Taches abandonnees a l'arret
+    PROGRESS.clear()
+    METRICS.set_gauge("queue_depth", 0, queue="videos")
+
+    unlinked = sum(len(pending) for pending in waiters.values())
+    if unlinked:
+        log_func(f"  {unlinked} video(s) partagee(s) non liee(s) : telechargement interrompu")
+
+    stopped = bool(stop_event and stop_event.is_set())
+    ok, fail = counts["ok"], counts["fail"]
+    cache.close()
+    log_func(f"\n  Limiteur de requetes : {RATE_LIMITER.describe()}")
+    if bandwidth:
+        log_func(f"  Bande passante : {bandwidth.describe()}")
     log_func(f"\n{'='*50}")
     if stopped:
         log_func(f"  ARRETE — {ok} reussie(s), {fail} echouee(s), {skipped} ignoree(s)")
     else:
         log_func(f"  TERMINE — {ok} reussie(s), {fail} echouee(s), {skipped} ignoree(s)")
+    log_func(f"  {counts['videos']} video(s) telechargee(s), {counts['videos_failed']} en echec")
+    if stage.done or stage.failed:
+        log_func(f"  {stage.done} post-traitement(s), {stage.failed} en echec")
+    phases = METRICS.phase_summary(metrics_start)
+    if phases:
+        log_func(f"  Temps cumule : {phases}")
     log_func(f"{'='*50}")
     on_done()
+    return ok, fail, skipped
 
 
-# --- Interface graphique ---
+# --- Ligne de commande ---
 
-BG = "#1e1e2e"
-SURFACE = "#2a2a3d"
-COOKIE_BG = "#252538"
-ACCENT = "#7c3aed"
-ACCENT_HOVER = "#6d28d9"
-TEXT_COLOR = "#e2e8f0"
-MUTED = "#94a3b8"
-GREEN = "#22c55e"
-ORANGE = "#f59e0b"
-BLUE = "#3b82f6"
+CLI_MODES = {"video": "Video(s)", "playlist": "Playlist(s)", "channel": "Chaine complete"}
 
+# "1080p (Full HD)" -> "1080p", "Audio uniquement" -> "audio"
+CLI_QUALITIES = {key.split()[0].lower(): key for key in QUALITIES}
 
-class App(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("YouTube Downloader")
-        self.geometry("750x820")
-        self.configure(bg=BG)
-        self.resizable(True, True)
-        self.minsize(600, 700)
-
-        self.output_dir = tk.StringVar(value="")
-        self.cookie_mode = tk.StringVar(value="file")
-        self.browser_var = tk.StringVar(value="chrome")
-        self.cookie_file = tk.StringVar(value="")
-        self.quality_var = tk.StringVar(value="1080p (Full HD)")
-        self.audio_fmt_var = tk.StringVar(value="mp3")
-        self.fragments_var = tk.StringVar(value="4")
-        self.parallel_var = tk.StringVar(value="3")
-        self.mode_var = tk.StringVar(value="Video(s)")
-        self.subs_var = tk.BooleanVar(value=False)
-        self.sub_lang_var = tk.StringVar(value="fr")
-        self.range_start_var = tk.StringVar(value="")
-        self.range_end_var = tk.StringVar(value="")
-        self.channel_url = tk.StringVar(value="")
-        self.downloading = False
-        self.fetching = False
-        self.stop_event = threading.Event()
-
-        self._setup_styles()
-        self._build_ui()
-        self._on_mode_change()
-
-    def _setup_styles(self):
-        style = ttk.Style(self)
-        style.theme_use("clam")
-        style.configure("TFrame", background=BG)
-        style.configure("TLabel", background=BG, foreground=TEXT_COLOR, font=("Segoe UI", 10))
-        style.configure("Title.TLabel", background=BG, foreground=TEXT_COLOR, font=("Segoe UI", 16, "bold"))
-        style.configure("Muted.TLabel", background=BG, foreground=MUTED, font=("Segoe UI", 9))
-        style.configure("Accent.TButton", background=ACCENT, foreground="white",
-                         font=("Segoe UI", 11, "bold"), padding=(20, 10))
-        style.map("Accent.TButton", background=[("active", ACCENT_HOVER), ("disabled", "#4a4a5e")])
-        style.configure("Dir.TButton", background=SURFACE, foreground=TEXT_COLOR,
-                         font=("Segoe UI", 9), padding=(10, 5))
-        style.map("Dir.TButton", background=[("active", "#3a3a4d")])
-        style.configure("Channel.TButton", background="#1e3a5f", foreground=TEXT_COLOR,
-                         font=("Segoe UI", 9), padding=(10, 5))
-        style.map("Channel.TButton", background=[("active", "#254a6f"), ("disabled", "#4a4a5e")])
-        style.configure("Stop.TButton", background="#dc2626", foreground="white",
-                         font=("Segoe UI", 11, "bold"), padding=(20, 10))
-        style.map("Stop.TButton", background=[("active", "#b91c1c"), ("disabled", "#4a4a5e")])
-        style.configure("Mode.TRadiobutton", background=BG, foreground=TEXT_COLOR, font=("Segoe UI", 10))
-        style.map("Mode.TRadiobutton", background=[("active", BG)])
-
-    def _build_ui(self):
-        # Canvas scrollable pour les petits ecrans
-        canvas = tk.Canvas(self, bg=BG, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
-        canvas.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
-
-        main = ttk.Frame(canvas, padding=20)
-        canvas.create_window((0, 0), window=main, anchor="nw")
-
-        main.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.bind_all("<MouseWheel>", lambda e: canvas.yview_scroll(-1 * (e.delta // 120), "units"))
-
-        # Titre
-        ttk.Label(main, text="YouTube Downloader", style="Title.TLabel").pack(pady=(0, 5))
-        ttk.Label(main, text="Telecharge des videos, playlists ou chaines completes",
-                  style="Muted.TLabel").pack()
-
-        # === MODE DE TELECHARGEMENT ===
-        ttk.Label(main, text="Mode :").pack(anchor="w", pady=(14, 5))
-        mode_frame = ttk.Frame(main)
-        mode_frame.pack(fill="x")
-        for m in MODES:
-            ttk.Radiobutton(mode_frame, text=m, variable=self.mode_var, value=m,
-                            style="Mode.TRadiobutton", command=self._on_mode_change).pack(side="left", padx=(0, 20))
-
-        # === CHAINE (visible seulement en mode Chaine/Playlist) ===
-        self.channel_frame = tk.Frame(main, bg="#1a1a2e", bd=0, highlightthickness=1,
-                                      highlightbackground="#3a3a5e")
-        channel_pad = tk.Frame(self.channel_frame, bg="#1a1a2e")
-        channel_pad.pack(fill="x", padx=10, pady=8)
-
-        tk.Label(channel_pad, text="Lien de la chaine :", bg="#1a1a2e", fg=ORANGE,
-                 font=("Segoe UI", 10, "bold")).pack(anchor="w")
-
-        channel_row = tk.Frame(channel_pad, bg="#1a1a2e")
-        channel_row.pack(fill="x", pady=(5, 0))
-
-        self.channel_entry = tk.Entry(channel_row, textvariable=self.channel_url, bg=SURFACE, fg=TEXT_COLOR,
-                                      insertbackground=TEXT_COLOR, font=("Consolas", 10), bd=0,
-                                      selectbackground=ACCENT)
-        self.channel_entry.pack(side="left", fill="x", expand=True, ipady=5, padx=(0, 8))
-
-        self.fetch_btn = ttk.Button(channel_row, text="Recuperer les playlists", style="Channel.TButton",
-                                    command=self._fetch_channel)
-        self.fetch_btn.pack(side="right")
-
-        # === ZONE DE LIENS ===
-        self.links_label = ttk.Label(main, text="Liens :")
-        input_frame = tk.Frame(main, bg=SURFACE, bd=0, highlightthickness=1, highlightbackground="#3a3a5e")
-        self.input_frame_ref = input_frame
-        self.input_text = tk.Text(input_frame, height=5, bg=SURFACE, fg=TEXT_COLOR, insertbackground=TEXT_COLOR,
-                                  font=("Consolas", 10), bd=0, padx=10, pady=10,
-                                  selectbackground=ACCENT, wrap="word")
-        self.input_text.pack(fill="x")
-
-        self.link_count_label = tk.Label(main, text="0 lien(s)", bg=BG, fg=MUTED, font=("Segoe UI", 9))
-        self.input_text.bind("<KeyRelease>", self._update_link_count)
-
-        # === QUALITE + VITESSE ===
-        settings_frame = ttk.Frame(main)
-        self.settings_frame_ref = settings_frame
-
-        ttk.Label(settings_frame, text="Qualite :").pack(side="left")
-        self.quality_combo = ttk.Combobox(settings_frame, textvariable=self.quality_var,
-                                          values=list(QUALITIES.keys()), state="readonly", width=20)
-        self.quality_combo.pack(side="left", padx=(8, 0))
-        self.quality_combo.bind("<<ComboboxSelected>>", self._on_quality_change)
-
-        # Format audio (visible seulement si Audio uniquement)
-        self.audio_fmt_label = ttk.Label(settings_frame, text="  Format :")
-        self.audio_fmt_combo = ttk.Combobox(settings_frame, textvariable=self.audio_fmt_var,
-                                            values=AUDIO_FORMATS, state="readonly", width=6)
-
-        ttk.Label(settings_frame, text="  Parallele :").pack(side="left", padx=(12, 0))
-        ttk.Spinbox(settings_frame, from_=1, to=10, textvariable=self.parallel_var,
-                    width=3, font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
-
-        ttk.Label(settings_frame, text="  Fragments :").pack(side="left", padx=(12, 0))
-        ttk.Spinbox(settings_frame, from_=1, to=16, textvariable=self.fragments_var,
-                    width=3, font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
-
-        # === SOUS-TITRES ===
-        self.subs_frame = ttk.Frame(main)
-        tk.Checkbutton(self.subs_frame, text="Telecharger les sous-titres", variable=self.subs_var,
-                       bg=BG, fg=TEXT_COLOR, selectcolor="#3a3a5e", activebackground=BG,
-                       activeforeground=TEXT_COLOR, font=("Segoe UI", 10)).pack(side="left")
-        ttk.Label(self.subs_frame, text="  Langue :").pack(side="left")
-        ttk.Combobox(self.subs_frame, textvariable=self.sub_lang_var,
-                     values=SUBTITLE_LANGS, state="readonly", width=5).pack(side="left", padx=(4, 0))
-
-        # === PLAGE DE VIDEOS (playlist uniquement) ===
-        self.range_frame = ttk.Frame(main)
-        ttk.Label(self.range_frame, text="Plage de videos :").pack(side="left")
-        ttk.Label(self.range_frame, text="  De :").pack(side="left", padx=(8, 0))
-        ttk.Entry(self.range_frame, textvariable=self.range_start_var, width=5,
-                  font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
-        ttk.Label(self.range_frame, text="  A :").pack(side="left", padx=(8, 0))
-        ttk.Entry(self.range_frame, textvariable=self.range_end_var, width=5,
-                  font=("Segoe UI", 10)).pack(side="left", padx=(4, 0))
-        ttk.Label(self.range_frame, text="  (vide = tout)", style="Muted.TLabel").pack(side="left", padx=(8, 0))
-
-        # === COOKIES ===
-        ttk.Label(main, text="Authentification YouTube :").pack(anchor="w", pady=(10, 5))
-        cookie_frame = tk.Frame(main, bg=COOKIE_BG, bd=0, highlightthickness=1, highlightbackground="#3a3a5e")
-        cookie_frame.pack(fill="x")
-        cookie_pad = tk.Frame(cookie_frame, bg=COOKIE_BG)
-        cookie_pad.pack(fill="x", padx=12, pady=8)
-
-        row1 = tk.Frame(cookie_pad, bg=COOKIE_BG)
-        row1.pack(fill="x", pady=(0, 3))
-        tk.Radiobutton(row1, text="Fichier cookies.txt (recommande)", variable=self.cookie_mode,
-                       value="file", bg=COOKIE_BG, fg=TEXT_COLOR, selectcolor="#3a3a5e",
-                       activebackground=COOKIE_BG, activeforeground=TEXT_COLOR,
-                       font=("Segoe UI", 10), command=self._update_cookie_ui).pack(side="left")
-        self.cookie_file_btn = ttk.Button(row1, text="Choisir le fichier", style="Dir.TButton",
-                                          command=self._pick_cookie_file)
-        self.cookie_file_btn.pack(side="right")
-
-        self.cookie_file_label = tk.Label(cookie_pad, text="  Aucun fichier selectionne",
-                                          bg=COOKIE_BG, fg=MUTED, font=("Segoe UI", 9))
-        self.cookie_file_label.pack(anchor="w", pady=(0, 6))
-
-        row2 = tk.Frame(cookie_pad, bg=COOKIE_BG)
-        row2.pack(fill="x", pady=(0, 3))
-        tk.Radiobutton(row2, text="Depuis le navigateur", variable=self.cookie_mode,
-                       value="browser", bg=COOKIE_BG, fg=TEXT_COLOR, selectcolor="#3a3a5e",
-                       activebackground=COOKIE_BG, activeforeground=TEXT_COLOR,
-                       font=("Segoe UI", 10), command=self._update_cookie_ui).pack(side="left")
-        self.browser_combo = ttk.Combobox(row2, textvariable=self.browser_var,
-                                          values=BROWSERS, state="disabled", width=10)
-        self.browser_combo.pack(side="right")
-        tk.Label(cookie_pad, text="  Fermer le navigateur avant de lancer !",
-                 bg=COOKIE_BG, fg=MUTED, font=("Segoe UI", 9)).pack(anchor="w")
-
-        # === DOSSIER ===
-        dir_frame = ttk.Frame(main)
-        dir_frame.pack(fill="x", pady=(10, 0))
-        ttk.Label(dir_frame, text="Dossier de destination :").pack(side="left")
-        ttk.Button(dir_frame, text="Choisir un dossier", style="Dir.TButton",
-                   command=self._pick_dir).pack(side="right")
-        self.dir_label = ttk.Label(main, text="Dossier courant (par defaut)", style="Muted.TLabel")
-        self.dir_label.pack(anchor="w", pady=(3, 0))
-
-        # === BOUTONS ===
-        btn_frame = ttk.Frame(main)
-        btn_frame.pack(pady=12)
-        self.btn = ttk.Button(btn_frame, text="Telecharger", style="Accent.TButton", command=self._start)
-        self.btn.pack(side="left", padx=(0, 8))
-        self.stop_btn = ttk.Button(btn_frame, text="Arreter", style="Stop.TButton", command=self._stop)
-        self.stop_btn.pack(side="left")
-        self.stop_btn.config(state="disabled")
-
-        # === CONSOLE ===
-        ttk.Label(main, text="Progression :").pack(anchor="w", pady=(0, 5))
-        log_frame = tk.Frame(main, bg=SURFACE, bd=0, highlightthickness=1, highlightbackground="#3a3a5e")
-        log_frame.pack(fill="both", expand=True)
-        self.log = scrolledtext.ScrolledText(log_frame, bg=SURFACE, fg="#a0f0a0", font=("Consolas", 9),
-                                             bd=0, padx=10, pady=10, state="disabled",
-                                             insertbackground=TEXT_COLOR, wrap="word", height=10)
-        self.log.pack(fill="both", expand=True)
-
-        # Sauvegarder la ref du main frame pour le placement dynamique
-        self.main_frame = main
-
-    def _on_mode_change(self):
-        mode = self.mode_var.get()
-
-        # Cacher tout
-        self.channel_frame.pack_forget()
-        self.links_label.pack_forget()
-        self.input_frame_ref.pack_forget()
-        self.link_count_label.pack_forget()
-        self.settings_frame_ref.pack_forget()
-        self.subs_frame.pack_forget()
-        self.range_frame.pack_forget()
-
-        if mode == "Chaine complete":
-            self.channel_frame.pack(in_=self.main_frame, fill="x", pady=(10, 0), after=self._get_mode_frame())
-            self.fetch_btn.config(text="Tout telecharger")
-        elif mode == "Playlist(s)":
-            self.channel_frame.pack(in_=self.main_frame, fill="x", pady=(10, 0), after=self._get_mode_frame())
-            self.fetch_btn.config(text="Recuperer les playlists")
-            self.links_label.pack(in_=self.main_frame, anchor="w", pady=(10, 5), after=self.channel_frame)
-            self.input_frame_ref.pack(in_=self.main_frame, fill="x", after=self.links_label)
-            self.link_count_label.pack(in_=self.main_frame, anchor="e", after=self.input_frame_ref)
-            self.links_label.config(text="Liens des playlists (un par ligne) :")
-            # Plage
-            self.range_frame.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.link_count_label)
-            # Settings apres range
-            self.settings_frame_ref.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.range_frame)
-        else:
-            # Video(s)
-            self.links_label.pack(in_=self.main_frame, anchor="w", pady=(10, 5), after=self._get_mode_frame())
-            self.input_frame_ref.pack(in_=self.main_frame, fill="x", after=self.links_label)
-            self.link_count_label.pack(in_=self.main_frame, anchor="e", after=self.input_frame_ref)
-            self.links_label.config(text="Liens des videos (un par ligne) :")
-            self.settings_frame_ref.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.link_count_label)
-
-        if mode != "Chaine complete":
-            # Sous-titres apres settings
-            last = self.settings_frame_ref
-            self.subs_frame.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=last)
-
-        if mode == "Chaine complete":
-            self.settings_frame_ref.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.channel_frame)
-            self.subs_frame.pack(in_=self.main_frame, fill="x", pady=(8, 0), after=self.settings_frame_ref)
-
-    def _get_mode_frame(self):
-        """Retourne le widget frame du mode radio pour le placement."""
-        for w in self.main_frame.winfo_children():
-            if isinstance(w, ttk.Frame):
-                for child in w.winfo_children():
-                    if isinstance(child, ttk.Radiobutton):
-                        return w
-        return self.main_frame.winfo_children()[1]
-
-    def _on_quality_change(self, event=None):
-        is_audio = "Audio" in self.quality_var.get()
-        if is_audio:
-            self.audio_fmt_label.pack(in_=self.settings_frame_ref, side="left", padx=(12, 0),
-                                      after=self.quality_combo)
-            self.audio_fmt_combo.pack(in_=self.settings_frame_ref, side="left", padx=(4, 0),
-                                      after=self.audio_fmt_label)
-        else:
-            self.audio_fmt_label.pack_forget()
-            self.audio_fmt_combo.pack_forget()
-
-    def _update_link_count(self, event=None):
-        raw = self.input_text.get("1.0", "end").strip()
-        count = len([u for u in raw.splitlines() if u.strip()])
-        self.link_count_label.config(text=f"{count} lien(s)")
-
-    def _get_cookie_opts(self):
-        mode = self.cookie_mode.get()
-        if mode == "file":
-            return build_cookie_opts("file", self.cookie_file.get())
-        else:
-            return build_cookie_opts("browser", self.browser_var.get())
 
-    def _fetch_channel(self):
-        if self.fetching:
-            return
-        url = self.channel_url.get().strip()
-        if not url:
-            self._log("Colle le lien de la chaine YouTube d'abord.")
-            return
+class JsonLinesReporter:
+    """Sortie de la ligne de commande : un objet JSON par ligne."""
 
-        cookie_opts = self._get_cookie_opts()
-        mode = self.mode_var.get()
-        self.fetching = True
-        self.fetch_btn.config(state="disabled")
-
-        if mode == "Chaine complete":
-            # Pas besoin de fetcher, on lance le telechargement directement
-            self._log("Chaine complete selectionnee — le lien sera utilise directement.")
-            video_url = fetch_channel_all_videos(url, cookie_opts, self._log)
-            self.input_text.delete("1.0", "end")
-            self.input_text.insert("1.0", video_url)
-            self._update_link_count()
-            self.fetching = False
-            self.fetch_btn.config(state="normal")
-            return
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
 
-        self._log("Scan de la chaine en cours...")
+    def emit(self, event, **fields):
+        line = json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
 
-        def _do_fetch():
-            try:
-                urls = fetch_channel_playlists(url, cookie_opts, self._log)
-                if urls:
-                    def _fill():
-                        self.input_text.delete("1.0", "end")
-                        self.input_text.insert("1.0", "\n".join(urls))
-                        self._update_link_count()
-                        self._log(f"\n  {len(urls)} liens ajoutes dans la zone de texte.")
-                    self.after(0, _fill)
-            except Exception as e:
-                self._log(f"  ERREUR : {e}")
-            finally:
-                self.after(0, lambda: (
-                    self.fetch_btn.config(state="normal"),
-                    setattr(self, "fetching", False),
-                ))
-
-        threading.Thread(target=_do_fetch, daemon=True).start()
-
-    def _update_cookie_ui(self):
-        if self.cookie_mode.get() == "file":
-            self.cookie_file_btn.config(state="normal")
-            self.browser_combo.config(state="disabled")
-        else:
-            self.cookie_file_btn.config(state="disabled")
-            self.browser_combo.config(state="readonly")
-
-    def _pick_cookie_file(self):
-        f = filedialog.askopenfilename(filetypes=[("Cookies TXT", "*.txt"), ("Tous", "*.*")])
-        if f:
-            self.cookie_file.set(f)
-            self.cookie_file_label.config(text=f"  {os.path.basename(f)}", fg=GREEN)
-
-    def _pick_dir(self):
-        d = filedialog.askdirectory()
-        if d:
-            self.output_dir.set(d)
-            short = d if len(d) < 55 else "..." + d[-52:]
-            self.dir_label.config(text=short)
-
-    def _log(self, msg, replace_last=False):
-        def _write():
-            self.log.config(state="normal")
-            if replace_last:
-                self.log.delete("end-2l linestart", "end-1l lineend")
-            self.log.insert("end", msg + "\n")
-            self.log.see("end")
-            self.log.config(state="disabled")
-        self.after(0, _write)
-
-    def _stop(self):
-        if self.downloading:
-            self.stop_event.set()
-            self.stop_btn.config(state="disabled")
-            self._log("\n  Arret demande... les telechargements en cours vont se terminer.")
-
-    def _on_done(self):
-        self.after(0, lambda: (
-            self.btn.config(text="Telecharger", state="normal"),
-            self.stop_btn.config(state="disabled"),
-            setattr(self, "downloading", False),
-        ))
-
-    def _start(self):
-        if self.downloading:
+    def log(self, msg, replace_last=False, key=None):
+        """log_func pour download_all (separateurs et lignes vides ignores)."""
+        text = msg.strip()
+        if not text.strip("="):
             return
+        fields = {"msg": text}
+        if key is not None:
+            fields["key"] = key
+        self.emit("progress" if replace_last else "log", **fields)
+
+    def on_stage(self, event):
+        """Abonne de PROGRESS : un evenement "stage" par changement d'etape."""
+        self.emit("stage", job=event.job, item=event.item, id=event.video_id, stage=event.stage,
+                  **({"bytes": event.total or event.downloaded} if event.stage == "finished" else {}))
+
+    def follow(self, bus, stop_event):
+        """Emet la progression des taches modifiees toutes les
+        PROGRESS_EMIT_INTERVAL secondes, jusqu'a stop_event."""
+        bus.subscribe(self.on_stage)
+
+        def run():
+            last = {}
+            while not stop_event.wait(PROGRESS_EMIT_INTERVAL):
+                current = {}
+                for event in bus.snapshot():
+                    current[event.job] = event
+                    if event.stage == "downloading" and last.get(event.job) is not event:
+                        self.emit("progress", job=event.job, item=event.item, id=event.video_id,
+                                  downloaded=event.downloaded, total=event.total,
+                                  speed=event.speed and round(event.speed),
+                                  eta=event.eta)
+                last = current
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+def read_url_lines(lines):
+    """URLs non vides, hors commentaires (#)."""
+    return [u.strip() for u in lines if u.strip() and not u.strip().startswith("#")]
+
+
+def parse_range(value):
+    """'10-50', '10-' ou '-50' -> (debut, fin)."""
+    start, sep, end = value.partition("-")
+    if not sep or not (start.isdigit() or end.isdigit()) or (start and not start.isdigit()) \
+            or (end and not end.isdigit()):
+        raise argparse.ArgumentTypeError(f"plage invalide : {value!r} (ex: 10-50)")
+    return int(start) if start else None, int(end) if end else None
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="download_playlist.py",
+        description="Telecharge des videos, playlists ou chaines YouTube. "
+                    "Sans argument, ouvre l'interface graphique.")
+    parser.add_argument("urls", nargs="*", help="liens a telecharger")
+    parser.add_argument("--gui", action="store_true", help="ouvrir l'interface graphique")
+    parser.add_argument("-i", "--input", action="append", default=[], metavar="FICHIER",
+                        help="fichier de liens (un par ligne), '-' pour l'entree standard")
+    parser.add_argument("-m", "--mode", choices=CLI_MODES, default="playlist",
+                        help="video, playlist ou channel (liens de chaines : videos + playlists)")
+    parser.add_argument("-o", "--output", default=None, metavar="DOSSIER", help="dossier de destination")
+    parser.add_argument("-q", "--quality", choices=CLI_QUALITIES, default="1080p")
+    parser.add_argument("--audio-format", choices=AUDIO_FORMATS, default="mp3",
+                        help="format si --quality audio")
+    cookies = parser.add_mutually_exclusive_group()
+    cookies.add_argument("--cookies", metavar="FICHIER", help="fichier cookies.txt")
+    cookies.add_argument("--browser", choices=BROWSERS, help="lire les cookies du navigateur")
+    parser.add_argument("-p", "--parallel", type=int, default=3)
+    parser.add_argument("-f", "--fragments", type=int, default=4)
+    parser.add_argument("--auto-tune", action="store_true",
+                        help="ajuster parallele et connexions selon le debit mesure")
+    parser.add_argument("--max-rate", type=float, metavar="MBPS",
+                        help="debit total maximum en Mbit/s")
+    parser.add_argument("--prefer-muxed", action="store_true",
+                        help="flux deja combine plutot que video + audio a fusionner, "
+                             "a qualite egale")
+    parser.add_argument("--scratch-dir", metavar="DOSSIER",
+                        help="dossier de travail (disque rapide) des .part et fichiers avant fusion")
+    parser.add_argument("--min-free", type=float, default=DISK_MARGIN / 1e9, metavar="GO",
+                        help="espace a laisser libre sur chaque disque (defaut : %(default).1f)")
+    parser.add_argument("--subs", metavar="LANGUE", help="telecharger les sous-titres (ex: fr)")
+    parser.add_argument("--range", type=parse_range, metavar="A-B", help="plage de videos (playlists)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="re-synchroniser les playlists deja telechargees")
+    parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL, metavar="SECONDES")
+    parser.add_argument("--cache-refresh", choices=CACHE_REFRESH_MODES, default="stale")
+    parser.add_argument("--daemon", action="store_true",
+                        help="tourner en continu : relancer les listes toutes les --interval "
+                             "secondes, traiter l'entree standard au fil de l'eau")
+    parser.add_argument("--interval", type=int, default=3600, metavar="SECONDES")
+    parser.add_argument("--metrics", metavar="FICHIER",
+                        help="mesures au format texte Prometheus, reecrites pendant le "
+                             "telechargement (collecteur textfile)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="servir les mesures sur http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--trace", metavar="FICHIER",
+                        help="duree de chaque phase (spans) en JSON lines")
+    parser.add_argument("--otel", action="store_true",
+                        help="envoyer les spans au TracerProvider OpenTelemetry")
+    return parser
+
+
+def run_cli(args, stop_event):
+    """Telechargement sans interface. Retourne le code de sortie."""
+    # yt-dlp se charge pendant la lecture des listes et du registre
+    preload()
+    reporter = JsonLinesReporter()
+    log_func = reporter.log
+    reporter.follow(PROGRESS, stop_event)
+    if args.cookies:
+        cookie_mode, cookie_value = "file", args.cookies
+        if not os.path.isfile(cookie_value):
+            log_func(f"ERREUR : fichier cookies introuvable : {cookie_value}")
+            return 2
+    elif args.browser:
+        cookie_mode, cookie_value = "browser", args.browser
+    else:
+        cookie_mode, cookie_value = "file", ""
+    quality_key = CLI_QUALITIES[args.quality]
+    is_audio = args.quality == "audio"
+    settings = {
+        "output_dir": args.output,
+        "cookie_mode": cookie_mode,
+        "cookie_value": cookie_value,
+        "quality_fmt": QUALITIES[quality_key],
+        "is_audio": is_audio,
+        "audio_fmt": args.audio_format,
+        "fragments": max(1, args.fragments),
+        "parallel": max(1, args.parallel),
+        "sub_opts": build_subtitle_opts(bool(args.subs), args.subs),
+        "playlist_range": args.range if args.mode == "playlist" else None,
+        "auto_tune": args.auto_tune,
+        "max_rate": args.max_rate * 1e6 / 8 if args.max_rate else None,
+        "prefer_muxed": args.prefer_muxed,
+        "scratch_dir": args.scratch_dir,
+    }
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    if args.scratch_dir:
+        os.makedirs(args.scratch_dir, exist_ok=True)
+    DISK.margin = args.min_free * 1e9
+
+    if not METRICS.configure(args.trace, args.otel):
+        log_func("OpenTelemetry n'est pas installe : --otel ignore.")
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+    if args.metrics:
+        def write_metrics():
+            while not stop_event.wait(METRICS_WRITE_INTERVAL):
+                METRICS.write(args.metrics)
+
+        threading.Thread(target=write_metrics, daemon=True).start()
+
+    def run_batch(urls):
+        cache = None
+        items = urls
+        if args.mode == "channel":
+            # Onglets et playlists des chaines scannes pendant le telechargement
+            cache = MetadataCache(args.output, ttl=args.cache_ttl, refresh=args.cache_refresh)
+            items = ChannelScanner(urls, build_cookie_opts(cookie_mode, cookie_value), log_func,
+                                   cache=cache, stop_event=stop_event,
+                                   registry=load_registry(args.output) if args.incremental else None)
+        try:
+            ok, fail, skipped = download_all(items, log_func=log_func, on_done=lambda: None,
+                                             stop_event=stop_event, cache_ttl=args.cache_ttl,
+                                             cache_refresh=args.cache_refresh,
+                                             incremental=args.incremental, **settings)
+        finally:
+            if cache:
+                cache.close()
+            if args.metrics:
+                METRICS.write(args.metrics)
+        reporter.emit("summary", ok=ok, failed=fail, skipped=skipped)
+        return fail
+
+    use_stdin = "-" in args.input
+    fixed_urls = list(args.urls)
+    for path in args.input:
+        if path != "-":
+            with open(path, "r", encoding="utf-8") as f:
+                fixed_urls += read_url_lines(f)
+
+    if not args.daemon:
+        urls = fixed_urls + (read_url_lines(sys.stdin) if use_stdin else [])
+        if not urls:
+            log_func("Aucun lien fourni.")
+            return 2
+        failed = run_batch(urls)
+        if stop_event.is_set():
+            return 130
+        return 1 if failed else 0
+
+    # Mode daemon : l'entree standard est lue au fil de l'eau dans un thread,
+    # les listes fixes sont relancees toutes les --interval secondes.
+    incoming = []
+    incoming_lock = threading.Lock()
+    wake = threading.Event()
+    stdin_closed = threading.Event()
+
+    def read_stdin():
+        for line in sys.stdin:
+            urls = read_url_lines([line])
+            if urls:
+                with incoming_lock:
+                    incoming.extend(urls)
+                wake.set()
+        stdin_closed.set()
+        wake.set()
+
+    if use_stdin:
+        threading.Thread(target=read_stdin, daemon=True).start()
+    else:
+        stdin_closed.set()
+    # StopSignal reveille l'attente ; un Event simple est verifie chaque seconde
+    subscribe = getattr(stop_event, "subscribe", None)
+    if subscribe:
+        subscribe(wake.set)
+
+    log_func(f"Daemon demarre (intervalle {args.interval}s).")
+    next_run = time.monotonic()
+    while not stop_event.is_set():
+        if fixed_urls and time.monotonic() >= next_run:
+            run_batch(fixed_urls)
+            next_run = time.monotonic() + args.interval
+        with incoming_lock:
+            batch, incoming[:] = list(incoming), []
+        if batch:
+            run_batch(batch)
+            continue
+        if not fixed_urls and stdin_closed.is_set():
+            break
+        timeout = max(0.0, next_run - time.monotonic()) if fixed_urls else None
+        if not subscribe:
+            timeout = min(timeout or 1.0, 1.0)
+        wake.wait(timeout)
+        wake.clear()
+    log_func("Daemon arrete.")
+    return 0
 
-        mode = self.mode_var.get()
 
-        # Recuperer les URLs
-        if mode == "Chaine complete":
-            url = self.channel_url.get().strip()
-            if not url:
-                self._log("Colle le lien de la chaine YouTube d'abord.")
-                return
-            cookie_opts_check = self._get_cookie_opts()
-            self._log("Recuperation des videos individuelles et playlists...")
-            video_url = fetch_channel_all_videos(url, cookie_opts_check, self._log)
-            playlist_urls = fetch_channel_playlists(url, cookie_opts_check, self._log)
-            # Stocker les deux phases pour _start_channel
-            self._channel_videos = [(video_url, "Videos individuelles")]
-            self._channel_playlists = list(playlist_urls)
-            self._log(f"  Videos individuelles + {len(playlist_urls)} playlist(s)")
-        else:
-            raw = self.input_text.get("1.0", "end").strip()
-            urls = [u.strip() for u in raw.splitlines() if u.strip()]
-            if not urls:
-                self._log("Aucun lien fourni.")
-                return
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.gui or not (args.urls or args.input):
+        # Tkinter n'est importe que pour l'interface graphique. Lance en script,
+        # ce module est __main__ : download_gui le reprend tel quel au lieu d'en
+        # executer une seconde copie (METRICS, PROGRESS, YDL_POOL...)
+        sys.modules.setdefault("download_playlist", sys.modules[__name__])
+        from download_gui import App
+        App().mainloop()
+        return 0
 
-        # Cookies
-        cookie_mode = self.cookie_mode.get()
-        if cookie_mode == "file":
-            cookie_value = self.cookie_file.get()
-            if not cookie_value or not os.path.isfile(cookie_value):
-                self._log("Selectionne un fichier cookies.txt d'abord !")
-                return
-        else:
-            cookie_value = self.browser_var.get()
-
-        # Options
-        quality_key = self.quality_var.get()
-        quality_fmt = QUALITIES.get(quality_key, QUALITIES["1080p (Full HD)"])
-        is_audio = "Audio" in quality_key
-        audio_fmt = self.audio_fmt_var.get() if is_audio else "mp3"
-        fragments = max(1, int(self.fragments_var.get() or 4))
-        parallel = max(1, int(self.parallel_var.get() or 3))
-
-        sub_opts = build_subtitle_opts(self.subs_var.get(), self.sub_lang_var.get())
-
-        # Plage
-        playlist_range = None
-        if mode == "Playlist(s)":
-            start = self.range_start_var.get().strip()
-            end = self.range_end_var.get().strip()
-            if start or end:
-                playlist_range = (int(start) if start.isdigit() else None,
-                                  int(end) if end.isdigit() else None)
-
-        self.downloading = True
-        self.stop_event.clear()
-        self.btn.config(text="Telechargement en cours...", state="disabled")
-        self.stop_btn.config(state="normal")
-        self.log.config(state="normal")
-        self.log.delete("1.0", "end")
-        self.log.config(state="disabled")
-        if mode == "Chaine complete":
-            nb = len(self._channel_videos) + len(self._channel_playlists)
-        else:
-            nb = len(urls)
-        self._log(f"Mode : {mode} | {nb} lien(s) | {quality_key}")
-
-        out = self.output_dir.get() or None
-
-        if mode == "Chaine complete":
-            # Deux phases : videos individuelles d'abord, puis playlists
-            def _channel_download():
-                self._log(f"\n{'='*50}")
-                self._log("  PHASE 1 : Videos individuelles")
-                self._log(f"{'='*50}")
-                download_all(self._channel_videos, out, cookie_mode, cookie_value, quality_fmt,
-                             is_audio, audio_fmt, fragments, parallel, sub_opts, playlist_range,
-                             self._log, lambda: None, self.stop_event)
-                if self.stop_event.is_set():
-                    self._on_done()
-                    return
-                self._log(f"\n{'='*50}")
-                self._log("  PHASE 2 : Playlists")
-                self._log(f"{'='*50}")
-                download_all(self._channel_playlists, out, cookie_mode, cookie_value, quality_fmt,
-                             is_audio, audio_fmt, fragments, parallel, sub_opts, playlist_range,
-                             self._log, self._on_done, self.stop_event)
-
-            t = threading.Thread(target=_channel_download, daemon=True)
-        else:
-            t = threading.Thread(target=download_all,
-                                 args=(urls, out, cookie_mode, cookie_value, quality_fmt, is_audio,
-                                       audio_fmt, fragments, parallel, sub_opts, playlist_range,
-                                       self._log, self._on_done, self.stop_event),
-                                 daemon=True)
-        t.start()
+    stop_event = StopSignal()
+
+    def _on_signal(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, _on_signal)
+    signal.signal(signal.SIGTERM, _on_signal)
+    return run_cli(args, stop_event)
 
 
 if __name__ == "__main__":
-    App().mainloop()
+    # Processus de post-traitement dans l'executable PyInstaller
+    multiprocessing.freeze_support()
+    sys.exit(main())
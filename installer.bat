@@ -31,7 +31,7 @@ echo.
 
 :: Installer yt-dlp
 echo [2/5] Installation de yt-dlp...
-pip install --upgrade yt-dlp >nul 2>&1
+pip install --upgrade "yt-dlp[default]" >nul 2>&1
 if %errorlevel% equ 0 (
     echo    yt-dlp installe avec succes
 ) else (
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class DownloadArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, dp.ARCHIVE_FILE)
+
+    def write(self, text, mode="a"):
+        # Ecriture d'un autre processus
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.write(text)
+
+    def test_missing_file(self):
+        archive = dp.DownloadArchive(self.path)
+        self.assertEqual(len(archive), 0)
+        archive.add("youtube a")
+        self.assertIn("youtube a", dp.DownloadArchive(self.path))
+
+    def test_refresh_reads_appended_lines(self):
+        self.write("youtube a\n")
+        archive = dp.DownloadArchive(self.path)
+        self.write("youtube b\nyoutube c")  # derniere ligne pas encore terminee
+        archive.refresh()
+        self.assertIn("youtube b", archive)
+        self.assertNotIn("youtube c", archive)
+        self.write("\n")
+        archive.refresh()
+        self.assertEqual(sorted(archive), ["youtube a", "youtube b", "youtube c"])
+
+    def test_refresh_after_concurrent_add(self):
+        archive = dp.DownloadArchive(self.path)
+        archive.add("youtube a")
+        self.write("youtube b\n")
+        archive.add("youtube c")
+        archive.refresh()
+        self.assertEqual(sorted(archive), ["youtube a", "youtube b", "youtube c"])
+
+    def test_refresh_after_truncate(self):
+        self.write("youtube a\nyoutube b\n")
+        archive = dp.DownloadArchive(self.path)
+        self.write("youtube c\n", mode="w")
+        archive.refresh()
+        self.assertEqual(sorted(archive), ["youtube c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class BandwidthControllerTest(unittest.TestCase):
+
+    def state(self, controller):
+        return controller.workers, controller.connections
+
+    def adjust(self, controller, rate):
+        # Appele par progress_hook, verrou tenu
+        with controller._cond:
+            controller._adjust(rate)
+
+    def test_increase(self):
+        # Connexions par video d'abord, puis un worker de plus
+        controller = dp.BandwidthController(4, 4, auto=True)
+        self.assertEqual(self.state(controller), (2, 4))
+        for rate, state in ((100, (2, 8)), (200, (2, 16)), (300, (3, 16)), (400, (4, 16)), (500, (4, 16))):
+            self.adjust(controller, rate)
+            self.assertEqual(self.state(controller), state)
+
+    def test_decrease(self):
+        controller = dp.BandwidthController(4, 16, auto=True)
+        self.adjust(controller, 1000)
+        self.assertEqual(self.state(controller), (3, 16))
+        self.adjust(controller, 500)
+        self.assertEqual(self.state(controller), (2, 16))
+        # Nouvelle chute : la baisse n'a pas aide, demi-tour
+        self.adjust(controller, 200)
+        self.assertEqual(self.state(controller), (3, 16))
+
+    def test_decrease_connections(self):
+        controller = dp.BandwidthController(1, 16, auto=True)
+        self.adjust(controller, 1000)
+        self.adjust(controller, 500)
+        self.assertEqual(self.state(controller), (1, 8))
+
+    def test_plateau_undoes_step(self):
+        controller = dp.BandwidthController(4, 8, auto=True)
+        self.adjust(controller, 100)
+        self.assertEqual(self.state(controller), (2, 16))
+        self.adjust(controller, 102)
+        self.assertEqual(self.state(controller), (1, 16))
+        self.adjust(controller, 101)
+        self.assertEqual(self.state(controller), (1, 16))
+
+    def test_cap(self):
+        controller = dp.BandwidthController(4, 4, auto=True, max_rate=1000)
+        self.adjust(controller, 950)
+        self.assertEqual(self.state(controller), (2, 4))
+        self.adjust(controller, 1200)
+        self.assertEqual(self.state(controller), (1, 4))
+        self.assertEqual(controller.job_opts()["ratelimit"], 1000)
+
+    def test_manual(self):
+        controller = dp.BandwidthController(4, 4, max_rate=1000)
+        self.assertEqual(controller.job_opts(), {"ratelimit": 250})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class MetadataCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.now = time.time()
+        patcher = mock.patch.object(dp.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self, **kwargs):
+        cache = dp.MetadataCache(self.tmp.name, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+
+class MetadataCacheTest(MetadataCacheTestCase):
+
+    def test_put_get(self):
+        cache = self.cache()
+        cache.put("playlist:PL1", {"entries": [{"id": "a"}]})
+        self.assertEqual(cache.get("playlist:PL1"), {"entries": [{"id": "a"}]})
+        self.assertIsNone(cache.get("playlist:PL2"))
+
+    def test_ttl(self):
+        self.cache(ttl=60).put("k", {"a": 1})
+        self.now += 61
+        self.assertIsNone(self.cache(ttl=60).get("k"))
+        self.assertEqual(self.cache(ttl=60, refresh="none").get("k"), {"a": 1})
+        self.assertEqual(self.cache(ttl=120).get("k"), {"a": 1})
+
+    def test_refresh_all(self):
+        cache = self.cache(refresh="all")
+        cache.put("k", {"a": 1})
+        self.assertIsNone(cache.get("k"))
+
+    def test_lru_eviction(self):
+        cache = self.cache(max_entries=2)
+        for key in ("a", "b"):
+            self.now += 1
+            cache.put(key, {})
+        self.now += 1
+        cache.get("a")  # "b" devient la moins recemment utilisee
+        self.now += 1
+        cache.put("c", {})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {})
+        self.assertEqual(cache.get("c"), {})
+
+    def test_bad_refresh_mode(self):
+        with self.assertRaises(ValueError):
+            self.cache(refresh="jamais")
+
+
+class FormatCacheTest(MetadataCacheTestCase):
+
+    def test_format_reused(self):
+        cache = self.cache()
+        cache.put_format("vid", "best", "18")
+        self.assertEqual(cache.get_format("vid", "best"), "18")
+        self.assertIsNone(cache.get_format("vid", "best|muxed"))
+        self.assertIsNone(cache.get_format(None, "best"))
+
+    def test_format_expires(self):
+        cache = self.cache()
+        cache.put_format("vid", "best", "18")
+        self.now += dp.FORMAT_CACHE_TTL + 1
+        self.assertIsNone(cache.get_format("vid", "best"))
+        # Hors ligne : les formats expires restent servis
+        self.assertEqual(self.cache(refresh="none").get_format("vid", "best"), "18")
+
+    def test_format_bounded(self):
+        cache = self.cache()
+        with mock.patch.object(dp, "FORMAT_CACHE_MAX", 2):
+            for i in range(3):
+                self.now += 1
+                cache.put_format(f"v{i}", "best", "18")
+        self.assertIsNone(cache.get_format("v0", "best"))
+        self.assertEqual(cache.get_format("v2", "best"), "18")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import collections
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+Usage = collections.namedtuple("Usage", "total used free")
+
+
+class DiskSpaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.disk = dp.DiskSpace(margin=100)
+        patcher = mock.patch.object(dp.shutil, "disk_usage", return_value=Usage(0, 0, 1100))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_reserve_release(self):
+        first = self.disk.reserve({self.tmp.name: 600})
+        self.assertIsNotNone(first)
+        self.disk.release(first)
+        self.assertIsNotNone(self.disk.reserve({self.tmp.name: 1000}))
+
+    def test_same_disk(self):
+        # Dossier pas encore cree : compte sur le disque de son parent
+        needs = collections.Counter({self.tmp.name: 400, os.path.join(self.tmp.name, "neuf"): 400})
+        self.assertEqual(sum(self.disk.reserve(needs).values()), 800)
+
+    def test_too_large(self):
+        self.assertIsNone(self.disk.reserve({self.tmp.name: 1001}))
+
+    def test_wait_for_release(self):
+        first = self.disk.reserve({self.tmp.name: 600})
+        waits = []
+        timer = threading.Timer(0.05, self.disk.release, (first,))
+        timer.start()
+        second = self.disk.reserve({self.tmp.name: 600}, on_wait=lambda: waits.append(1))
+        timer.join()
+        self.assertIsNotNone(second)
+        self.assertEqual(waits, [1])
+
+    def test_stop(self):
+        self.disk.reserve({self.tmp.name: 600})
+        stop = threading.Event()
+        stop.set()
+        self.assertIsNone(self.disk.reserve({self.tmp.name: 600}, stop))
+
+
+class EstimateSizeTest(unittest.TestCase):
+
+    def test_sizes(self):
+        info = {"duration": 100, "requested_formats": [{"filesize": 1000}, {"filesize_approx": 500}]}
+        self.assertEqual(dp.estimate_size(info), 1500)
+
+    def test_bitrate(self):
+        self.assertEqual(dp.estimate_size({"duration": 10, "tbr": 800}), 1000000)
+
+    def test_fallback(self):
+        self.assertEqual(dp.estimate_size({"duration": 10}), 10 * dp.DISK_FALLBACK_RATE)
+        self.assertEqual(dp.estimate_size({}), dp.DISK_FALLBACK_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class JsonlJournalTest(JournalTestCase):
+
+    def test_append_replay(self):
+        journal = dp.JsonlJournal(os.path.join(self.out, "j.jsonl"))
+        journal.append({"a": 1})
+        journal.append({"a": 2})
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"a": 3')  # ligne tronquee par un crash
+        self.assertEqual(list(journal.replay()), [{"a": 1}, {"a": 2}])
+
+    def test_rotate(self):
+        journal = dp.JsonlJournal(os.path.join(self.out, "j.jsonl"))
+        self.assertIsNone(journal.rotate())
+        journal.append({"a": 1})
+        old = journal.rotate()
+        self.assertEqual(list(dp.JsonlJournal(old).replay()), [{"a": 1}])
+        self.assertFalse(os.path.exists(journal.path))
+
+    def test_rotate_keeps_leftover(self):
+        journal = dp.JsonlJournal(os.path.join(self.out, "j.jsonl"))
+        journal.append({"a": 1})
+        journal.rotate()
+        with open(journal.old_path, "a", encoding="utf-8") as f:
+            f.write('{"a": 2')
+        journal.append({"a": 3})
+        old = journal.rotate()
+        self.assertEqual(list(dp.JsonlJournal(old).replay()), [{"a": 1}, {"a": 3}])
+
+
+class PlaylistRegistryTest(JournalTestCase):
+
+    def test_reload(self):
+        registry = dp.PlaylistRegistry(self.out)
+        registry.record("PL1", {"folder": "Un"})
+        self.assertEqual(dp.PlaylistRegistry(self.out), {"PL1": {"folder": "Un"}})
+
+    def test_compact(self):
+        registry = dp.PlaylistRegistry(self.out)
+        registry.record("PL1", {"folder": "Un"})
+        registry.compact()
+        registry.record("PL2", {"folder": "Deux"})
+        self.assertEqual(sorted(dp.PlaylistRegistry(self.out)), ["PL1", "PL2"])
+
+    def test_interrupted_compaction(self):
+        registry = dp.PlaylistRegistry(self.out)
+        registry.record("PL1", {"folder": "Un"})
+        registry._journal.rotate()  # crash avant l'ecriture du snapshot
+        registry = dp.PlaylistRegistry(self.out)
+        self.assertEqual(registry, {"PL1": {"folder": "Un"}})
+        self.assertFalse(os.path.exists(registry._journal.old_path))
+
+
+class JobJournalTest(JournalTestCase):
+
+    def test_resume(self):
+        journal = dp.JobJournal(self.out)
+        journal.item("u1", "planned", probe={"info": {"id": "PL1"}})
+        journal.video("u1", "v1", "downloading", format_id="137+140")
+        journal.item("u2", "done")
+        journal = dp.JobJournal(self.out)
+        self.assertEqual(journal.saved_probe("u1"), {"info": {"id": "PL1"}})
+        self.assertEqual(journal.saved_format("u1", "v1"), "137+140")
+        self.assertNotIn("u2", journal.items)
+
+    def test_interrupted_compaction(self):
+        journal = dp.JobJournal(self.out)
+        journal.item("u1", "planned", probe={"info": {"id": "PL1"}})
+        journal.video("u1", "v1", "downloading", format_id="22")
+        # Crash pendant la reecriture : .old complet, journal partiel
+        journal._journal.rotate()
+        journal._journal.append({"item": "u1", "state": "planned", "probe": {"info": {"id": "PL1"}}})
+        journal = dp.JobJournal(self.out)
+        self.assertEqual(journal.saved_format("u1", "v1"), "22")
+        journal = dp.JobJournal(self.out)
+        self.assertEqual(journal.saved_format("u1", "v1"), "22")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_burst(self):
+        limiter = dp.RateLimiter(rate=1.0, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            self.assertTrue(limiter.acquire())
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_penalize(self):
+        limiter = dp.RateLimiter(rate=2.0, min_rate=0.5, burst=3)
+        self.assertEqual(limiter.penalize(), dp.RETRY_WAIT)
+        self.assertEqual(limiter.rate, 1.0)
+        # Erreur pendant la pause : comptee une seule fois
+        self.assertLessEqual(limiter.penalize(), dp.RETRY_WAIT)
+        self.assertEqual(limiter.rate, 1.0)
+        stop = threading.Event()
+        stop.set()
+        self.assertFalse(limiter.acquire(stop))
+        self.assertFalse(limiter.wait_ready(stop))
+
+    def test_reward(self):
+        limiter = dp.RateLimiter(rate=1.0, max_rate=1.15)
+        limiter.reward()
+        limiter.reward()
+        self.assertEqual(limiter.rate, 1.15)
+
+
+if __name__ == "__main__":
+    unittest.main()
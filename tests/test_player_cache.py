@@ -0,0 +1,64 @@
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class FakeDiskCache:
+    """Cache disque de yt-dlp (load/store par section et cle)."""
+
+    def __init__(self, results=None):
+        self.stored = {(dp.PLAYER_CACHE_SECTION, "results"): results}
+
+    def load(self, section, key):
+        return self.stored.get((section, key))
+
+    def store(self, section, key, data):
+        self.stored[(section, key)] = data
+
+
+class PlayerCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = dp.PlayerCache(max_versions=2)
+
+    def use(self, version):
+        self.cache.code[version] = f"js {version}"
+        self.cache.data[("youtube-n", version, "x")] = f"n {version}"
+
+    def test_evicts_oldest_version(self):
+        for version in ("v1", "v2", "v3"):
+            self.use(version)
+        self.assertEqual(sorted(self.cache.code), ["v2", "v3"])
+        self.assertEqual(sorted(key[1] for key in self.cache.data), ["v2", "v3"])
+
+    def test_read_refreshes_version(self):
+        self.use("v1")
+        self.use("v2")
+        self.cache.code["v1"]  # v2 devient la plus ancienne
+        self.use("v3")
+        self.assertEqual(sorted(self.cache.code), ["v1", "v3"])
+
+    def test_attach_and_save(self):
+        disk = FakeDiskCache([["youtube-n", "v1", "x", "n v1"]])
+        ie = types.SimpleNamespace(_code_cache={}, _player_cache={})
+        self.cache.attach(ie, disk)
+        self.assertIs(ie._player_cache, self.cache.data)
+        self.assertEqual(ie._player_cache[("youtube-n", "v1", "x")], "n v1")
+        # Seuls les resultats de defis sont gardes sur disque, pas le code JS
+        self.cache.data[("other", "v1")] = "non garde"
+        self.cache.save(disk)
+        self.assertEqual(disk.load(dp.PLAYER_CACHE_SECTION, "results"), [["youtube-n", "v1", "x", "n v1"]])
+
+    def test_attach_ignores_other_extractors(self):
+        ie = types.SimpleNamespace()
+        self.cache.attach(ie, FakeDiskCache())
+        self.assertFalse(hasattr(ie, "_player_cache"))
+
+
+if __name__ == "__main__":
+    unittest.main()
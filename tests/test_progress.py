@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class ProgressBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = dp.ProgressBus()
+        self.events = []
+        self.bus.subscribe(self.events.append)
+
+    def test_hook_keeps_last_tick(self):
+        hook = self.bus.hook("[1] #1", "[1]", "a")
+        self.bus.stage("[1] #1", "resolving", item="[1]", video_id="a")
+        for done in (100, 200, 300):
+            hook({"status": "downloading", "downloaded_bytes": done, "total_bytes": 1000, "speed": 50.0})
+        (event,) = self.bus.snapshot()
+        self.assertEqual((event.stage, event.downloaded, event.total, event.speed),
+                         ("downloading", 300, 1000, 50.0))
+        # Les ticks ne sont pas publies, seulement les etapes
+        self.assertEqual([e.stage for e in self.events], ["resolving"])
+
+    def test_finished_and_done(self):
+        finished = []
+        hook = self.bus.hook("[1] #1", "[1]", "a", on_finished=lambda: finished.append(1))
+        hook({"status": "finished", "downloaded_bytes": 1000, "total_bytes": 1000})
+        self.assertEqual(finished, [1])
+        self.assertEqual(self.bus.snapshot()[0].item, "[1]")
+        self.bus.stage("[1] #1", "done")
+        self.assertEqual(self.bus.snapshot(), [])
+        self.assertEqual([(e.stage, e.video_id) for e in self.events], [("finished", "a"), ("done", "a")])
+
+    def test_items(self):
+        self.bus.item_queued("[1]", "u1", "Un", 3)
+        self.bus.item_queued("[2]", "u2", "Deux", 1)
+        self.bus.item_video("[1]", True)
+        self.bus.item_video("[1]", False)
+        self.bus.item_video("[3]", True)  # item inconnu : ignore
+        self.assertEqual([(i.item, i.done, i.failed) for i in self.bus.items()],
+                         [("[1]", 1, 1), ("[2]", 0, 0)])
+        self.bus.item_done("[2]")
+        self.assertEqual([i.item for i in self.bus.items()], ["[1]"])
+
+    def test_unsubscribe(self):
+        self.bus.unsubscribe(self.events.append)
+        self.bus.stage("[1] #1", "resolving")
+        self.assertEqual(self.events, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
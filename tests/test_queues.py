@@ -0,0 +1,173 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def take(self, queue, count):
+        it = iter(queue)
+        return [next(it)[0] for _ in range(count)]
+
+    def test_arrival_order(self):
+        queue = dp.JobQueue(self.out)
+        for url in ("a", "b", "c"):
+            self.assertTrue(queue.add(url))
+        self.assertFalse(queue.add("a"))
+        self.assertEqual(self.take(queue, 3), ["a", "b", "c"])
+        self.assertEqual(queue.counts(), {"running": 3})
+
+    def test_priority(self):
+        queue = dp.JobQueue(self.out)
+        for url in ("a", "b", "c"):
+            queue.add(url)
+        queue.set_priority("c", queue.top_priority())
+        queue.add("d", priority=queue.top_priority())
+        self.assertEqual(self.take(queue, 4), ["d", "c", "a", "b"])
+
+    def test_pause_resume(self):
+        queue = dp.JobQueue(self.out)
+        queue.add("a")
+        queue.add("b")
+        queue.pause("a")
+        it = iter(queue)
+        self.assertEqual(next(it)[0], "b")
+        queue.item_finished("b")
+        queue.resume("a")
+        self.assertEqual(next(it)[0], "a")
+        queue.item_finished("a")
+        self.assertIsNone(next(it, None))
+
+    def test_pause_running(self):
+        queue = dp.JobQueue(self.out)
+        queue.add("a")
+        self.take(queue, 1)
+        queue.pause("a")
+        self.assertEqual(queue.status("a"), ("paused", 0))
+        queue.resume("a")
+        self.assertEqual(queue.state("a"), "running")
+
+    def test_cancel(self):
+        queue = dp.JobQueue(self.out)
+        queue.add("a")
+        queue.add("b")
+        queue.cancel("a")
+        it = iter(queue)
+        self.assertEqual(next(it)[0], "b")
+        queue.item_finished("b", ok=False)
+        self.assertIsNone(next(it, None))
+        self.assertEqual(queue.counts(), {"cancelled": 1, "failed": 1})
+
+    def test_quality(self):
+        queue = dp.JobQueue(self.out)
+        queue.add("a", quality="720p (HD)")
+        url, folder, overrides = next(iter(queue))
+        self.assertEqual(overrides, {"quality_fmt": dp.QUALITIES["720p (HD)"], "is_audio": False})
+
+    def test_listen(self):
+        queue = dp.JobQueue(self.out)
+        calls = []
+        queue.listen(lambda: calls.append(1))
+        queue.add("a")
+        queue.pause("a")
+        self.assertEqual(len(calls), 2)
+
+    def test_reload(self):
+        queue = dp.JobQueue(self.out)
+        for url in ("a", "b", "c", "d", "e"):
+            queue.add(url)
+        queue.set_priority("d", -5)
+        self.take(queue, 4)  # d, a, b, c
+        queue.item_finished("b")
+        queue.item_finished("c", ok=False)
+        queue.pause("e")
+        queue.close()
+
+        queue = dp.JobQueue(self.out)
+        # a et d interrompus : repris ; b termine et c en echec : oublies
+        self.assertEqual(queue.counts(), {"pending": 2, "paused": 1})
+        self.assertEqual(queue.waiting(10), [("d", "pending", -5, None),
+                                             ("a", "pending", 0, None),
+                                             ("e", "paused", 0, None)])
+        self.assertEqual(self.take(queue, 2), ["d", "a"])
+
+    def test_compaction(self):
+        queue = dp.JobQueue(self.out)
+        for url in ("a", "b", "c"):
+            queue.add(url)
+        it = iter(queue)
+        next(it)
+        queue.item_finished("a")
+        queue.cancel("b")
+        queue.close()
+        dp.JobQueue(self.out).close()
+        with open(os.path.join(self.out, dp.QUEUE_FILE), encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.out, dp.QUEUE_FILE + ".old")))
+
+
+class VideoQueueTest(unittest.TestCase):
+
+    def drain(self, queue):
+        async def run():
+            await queue.close()
+            tasks = []
+            while True:
+                task = await queue.get()
+                if task is None:
+                    return tasks
+                tasks.append(task)
+        return run()
+
+    def test_round_robin(self):
+        async def run():
+            queue = dp.VideoQueue()
+            await queue.put("A", ["a1", "a2", "a3"])
+            await queue.put("B", ["b1"])
+            return await self.drain(queue)
+        self.assertEqual(asyncio.run(run()), ["a1", "b1", "a2", "a3"])
+
+    def test_status(self):
+        states = {"A": ("pending", 0), "B": ("pending", -1), "C": ("paused", -2), "D": ("cancelled", 0)}
+        dropped = []
+
+        async def run():
+            queue = dp.VideoQueue(status=states.get,
+                                  on_drop=lambda item, tasks: dropped.append((item, tasks)))
+            await queue.put("A", ["a1"])
+            await queue.put("B", ["b1", "b2"])
+            await queue.put("C", ["c1"])
+            await queue.put("D", ["d1"])
+            first = [await queue.get() for _ in range(3)]
+            states["C"] = ("pending", 0)
+            await queue.poke()
+            return first + await self.drain(queue)
+        self.assertEqual(asyncio.run(run()), ["b1", "b2", "a1", "c1"])
+        self.assertEqual(dropped, [("D", ["d1"])])
+
+    def test_backlog(self):
+        async def run():
+            queue = dp.VideoQueue(backlog=2)
+            await queue.put("A", ["a1", "a2"])
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(queue.wait_room(), 0.05)
+            await queue.get()
+            await asyncio.wait_for(queue.wait_room(), 0.05)
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
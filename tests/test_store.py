@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class StorePartialTest(unittest.TestCase):
+
+    def test_final_files(self):
+        for suffix in ("mp4", "webm", "mp3", "fr.srt", "en.vtt", "info.json", "webp"):
+            self.assertIsNone(dp.STORE_PARTIAL.search(suffix), suffix)
+
+    def test_intermediate_files(self):
+        for suffix in ("mp4.part", "mp4.ytdl", "mp4.aria2", "mp4.part.aria2",
+                       "mp4.part-Frag3", "mp4.part-Frag", "temp.mp4",
+                       "f137.mp4", "f251.webm.part"):
+            self.assertIsNotNone(dp.STORE_PARTIAL.search(suffix), suffix)
+
+
+class ContentStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = dp.ContentStore(self.tmp.name)
+        os.makedirs(self.store.path)
+        for name in ("abc.mp4", "abc.fr.srt", "abc.mp4.part.aria2", "abc.temp.mp4",
+                     "abc.f137.mp4", "abcd.mp4"):
+            open(os.path.join(self.store.path, name), "w").close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_files(self):
+        self.assertEqual(sorted(s for s, _ in self.store.files("abc")), ["fr.srt", "mp4"])
+
+    def test_link(self):
+        dest = os.path.join(self.tmp.name, "Playlist", "001 - Titre")
+        self.assertEqual(self.store.link("abc", dest), 2)
+        self.assertTrue(os.path.isfile(dest + ".mp4"))
+        self.assertTrue(os.path.isfile(dest + ".fr.srt"))
+        self.assertEqual(self.store.link("absent", dest), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
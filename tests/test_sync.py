@@ -0,0 +1,105 @@
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import download_playlist as dp
+
+
+class FakeYDL:
+    """Extraction plate d'une playlist : les entrees sont un generateur,
+    comme les pages chargees a la demande de yt-dlp."""
+
+    def __init__(self, ids, count):
+        self.ids = ids
+        self.count = count
+        self.read = 0
+
+    def entries(self):
+        for video_id in self.ids:
+            self.read += 1
+            yield {"id": video_id, "url": video_id}
+
+    def extract_info(self, url, download=False, process=True, ie_key=None):
+        return {"_type": "playlist", "id": "PL", "playlist_count": self.count,
+                "entries": self.entries()}
+
+
+class SyncPlaylistTest(unittest.TestCase):
+
+    def sync(self, ids, known, count=None, last_index=None, stop_event=None):
+        self.ydl = FakeYDL(ids, len(ids) if count is None else count)
+        record = {"folder": "PL", "ids": known}
+        if last_index is not None:
+            record["last_index"] = last_index
+        session = mock.Mock(side_effect=lambda *a, **k: contextlib.nullcontext(self.ydl))
+        with mock.patch.object(dp.YDL_POOL, "session", session):
+            synced = dp.sync_playlist("u", record, "[t]", {}, lambda *a, **k: None, stop_event)
+        return None if synced is None else [(i, e["id"]) for i, e in synced[1]]
+
+    def test_appended(self):
+        known = [f"k{i}" for i in range(50)]
+        new = self.sync(known + ["n1", "n2", "n3"], known, last_index=50)
+        self.assertEqual(new, [(51, "n1"), (52, "n2"), (53, "n3")])
+
+    def test_appended_without_last_index(self):
+        known = [f"k{i}" for i in range(50)]
+        new = self.sync(known + ["n1"], known)
+        self.assertEqual(new, [(51, "n1")])
+
+    def test_prepended(self):
+        known = [f"k{i}" for i in range(50)]
+        new = self.sync(["n1", "n2"] + known, known, last_index=50)
+        self.assertEqual(new, [(1, "n1"), (2, "n2")])
+
+    def test_prepended_stops_on_known(self):
+        known = [f"k{i}" for i in range(50)]
+        self.sync(["n1"] + known, known, count=len(known))
+        self.assertEqual(self.ydl.read, 1 + dp.SYNC_KNOWN_STREAK)
+
+    def test_appended_after_deletions(self):
+        # Deux videos supprimees : les ajouts prennent leurs positions
+        known = [f"k{i}" for i in range(50)]
+        new = self.sync(known[:48] + ["n1", "n2", "n3", "n4"], known, last_index=50)
+        self.assertEqual(new, [(49, "n1"), (50, "n2"), (51, "n3"), (52, "n4")])
+
+    def test_inserted_in_middle(self):
+        known = [f"k{i}" for i in range(50)]
+        new = self.sync(known[:20] + ["n1"] + known[20:], known, last_index=50)
+        self.assertEqual(new, [(21, "n1")])
+
+    def test_nothing_new(self):
+        known = [f"k{i}" for i in range(50)]
+        self.assertEqual(self.sync(known, known, last_index=50), [])
+
+    def test_stop(self):
+        stop = threading.Event()
+        stop.set()
+        self.assertIsNone(self.sync(["n1", "k0"], ["k0"], stop_event=stop))
+
+
+class RegistryKeyTest(unittest.TestCase):
+
+    def test_keys(self):
+        self.assertEqual(dp.registry_key("https://www.youtube.com/playlist?list=PL1"), "PL1")
+        self.assertEqual(dp.registry_key("https://www.youtube.com/@chaine/videos/"),
+                         "tab:https://www.youtube.com/@chaine/videos")
+        self.assertIsNone(dp.registry_key("https://www.youtube.com/watch?v=abc"))
+
+    def test_channel_tab_recorded(self):
+        url = "https://www.youtube.com/@chaine/shorts"
+        with tempfile.TemporaryDirectory() as out:
+            registry = dp.PlaylistRegistry(out)
+            dp.mark_playlist_done(url, "Shorts", out, registry, ["a", "b"])
+            self.assertEqual(registry[dp.registry_key(url)],
+                             {"folder": "Shorts", "ids": ["a", "b"], "last_index": 2})
+            # Jamais ignore hors synchro : les nouvelles videos sont cherchees
+            self.assertFalse(dp.is_playlist_done(url, out, registry))
+
+if __name__ == "__main__":
+    unittest.main()